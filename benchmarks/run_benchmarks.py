@@ -0,0 +1,204 @@
+"""
+Benchmarks every stage of the lawn pipeline on synthetic images.
+
+Times preprocess_image, detect_objects, extract_features, train_model and recommend_services,
+reports throughput, p50/p99 latency and peak traced memory per stage, and saves the results as
+JSON so two runs can be compared for regressions:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --compare bench.json
+
+Run it as a module from the repository root so that src is imported as a package.
+
+Detection uses a small stand-in ONNX model with the YOLOv8 output layout, built with the `onnx`
+package from requirements.txt.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from src import feature_extraction, model_trainer, preprocess, recommendation
+
+RESOLUTIONS = [(256, 256), (1024, 768), (2048, 1536)]
+STANDIN_CLASSES = 4  # Number of classes the stand-in detector scores
+
+
+def synthetic_lawn(width, height, seed=0):
+    """Generate a BGR lawn-like image: green grass noise with a few bare brown patches."""
+    rng = np.random.default_rng(seed)
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[..., 0] = rng.integers(20, 60, (height, width))  # Blue
+    img[..., 1] = rng.integers(90, 180, (height, width))  # Green
+    img[..., 2] = rng.integers(30, 80, (height, width))  # Red
+    for _ in range(3):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(width // 20 + 1, width // 6 + 2)), int(rng.integers(height // 20 + 1, height // 6 + 2)))
+        cv2.ellipse(img, center, axes, 0, 0, 360, (40, 80, 120), -1)
+    return img
+
+
+def build_standin_detector(model_path, input_size=640):
+    """
+    Write a tiny ONNX network with YOLOv8's output layout (batch, 4 + n_classes, n_anchors).
+
+    A single strided convolution turns the input into one anchor per 32x32 cell, which is enough to
+    exercise blob creation, the forward pass and decoding.
+    """
+    try:
+        import onnx
+        from onnx import TensorProto, helper, numpy_helper
+    except ImportError as e:
+        raise ImportError("The detection benchmark needs the onnx package; install requirements.txt.") from e
+
+    rng = np.random.default_rng(0)
+    channels = 4 + STANDIN_CLASSES
+    weights = rng.normal(0, 0.01, (channels, 3, 32, 32)).astype(np.float32)
+    nodes = [
+        helper.make_node("Conv", ["images", "W"], ["conv"], kernel_shape=[32, 32], strides=[32, 32]),
+        helper.make_node("Sigmoid", ["conv"], ["scores"]),
+        helper.make_node("Reshape", ["scores", "shape"], ["output0"]),
+    ]
+    graph = helper.make_graph(
+        nodes, "standin_yolo",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, input_size, input_size])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", channels, None])],
+        initializer=[numpy_helper.from_array(weights, "W"),
+                     numpy_helper.from_array(np.array([0, channels, -1], dtype=np.int64), "shape")],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, model_path)
+
+
+def measure(func, inputs, repeat=1):
+    """
+    Call func on every input, returning per-call latency stats, throughput and peak traced memory.
+
+    Memory is traced in a separate pass over the inputs after the timed loop, so tracemalloc's
+    bookkeeping does not inflate the latencies.
+    """
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in inputs:
+            call_start = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - call_start)
+    total = time.perf_counter() - start
+
+    tracemalloc.start()
+    for item in inputs:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies) * 1000
+    return {
+        "calls": len(latencies),
+        "throughput_per_s": len(latencies) / total if total > 0 else float("inf"),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "peak_mem_mb": peak / 1024 ** 2,
+    }
+
+
+def run(images_per_resolution=5, workdir=None):
+    """
+    Run every stage benchmark and return the results as a dict. The images and models are written to
+    workdir, or to a temporary directory that is removed afterwards.
+    """
+    if workdir is None:
+        with tempfile.TemporaryDirectory(prefix="lawn_bench_") as tmp_dir:
+            return run(images_per_resolution, tmp_dir)
+
+    results = {}
+
+    for width, height in RESOLUTIONS:
+        label = f"{width}x{height}"
+        paths = []
+        for i in range(images_per_resolution):
+            path = os.path.join(workdir, f"lawn_{label}_{i}.png")
+            cv2.imwrite(path, synthetic_lawn(width, height, seed=i))
+            paths.append(path)
+
+        results[f"preprocess_image/{label}"] = measure(preprocess.preprocess_image, paths)
+        results[f"extract_features/{label}"] = measure(lambda p: feature_extraction.extract_features(p, ["bare_patch"]), paths)
+
+    detector_path = os.path.join(workdir, "standin_yolo.onnx")
+    build_standin_detector(detector_path)
+    images = [preprocess.preprocess_image(p) for p in paths]
+    preprocess.get_detector(detector_path)  # Load once so the benchmark times inference only
+    results["detect_objects/single"] = measure(lambda img: preprocess.detect_objects(img, detector_path), images)
+    detector = preprocess.get_detector(detector_path)
+    results[f"detect_objects/batch{len(images)}"] = measure(detector.detect, [images])
+
+    rng = np.random.default_rng(0)
+    X = rng.random((500, len(feature_extraction.DEFAULT_SCHEMA)), dtype=np.float32)
+    y = rng.random(500) * 100
+    model_dir = os.path.join(workdir, "models")
+    results["train_model/500x300"] = measure(lambda _: model_trainer.train_model(X, y, model_dir=model_dir), [None])
+
+    scores = rng.random(10000) * 100
+    feature_lists = [["bare_patch"] if i % 3 == 0 else ["weed_growth", "large_object"] for i in range(len(scores))]
+    results["recommend_services/single"] = measure(
+        lambda i: recommendation.recommend_services(scores[i], feature_lists[i]), range(len(scores)))
+    results["recommend_services/batch10000"] = measure(
+        lambda _: recommendation.DEFAULT_RECOMMENDER.recommend_batch(scores, feature_lists), [None])
+
+    return {
+        "timestamp": time.strftime("%Y%m%d-%H%M%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "stages": results,
+    }
+
+
+def compare(current, previous, tolerance=0.10):
+    """Print how each stage's p50 latency changed against a previous run; returns the regressed stages."""
+    regressions = []
+    for stage, stats in current["stages"].items():
+        old = previous["stages"].get(stage)
+        if old is None:
+            continue
+        ratio = stats["p50_ms"] / old["p50_ms"] if old["p50_ms"] > 0 else float("inf")
+        flag = " REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{stage:40s} p50 {old['p50_ms']:10.3f} -> {stats['p50_ms']:10.3f} ms ({ratio:5.2f}x){flag}")
+        if flag:
+            regressions.append(stage)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every stage of the lawn pipeline.")
+    parser.add_argument("--images", type=int, default=5, help="Synthetic images per resolution")
+    parser.add_argument("--output", default=None, help="Path to save the JSON results to")
+    parser.add_argument("--compare", default=None, help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    results = run(args.images)
+    for stage, stats in results["stages"].items():
+        print(f"{stage:40s} {stats['throughput_per_s']:10.1f}/s  p50 {stats['p50_ms']:9.3f} ms  "
+              f"p99 {stats['p99_ms']:9.3f} ms  peak {stats['peak_mem_mb']:8.2f} MB")
+
+    output = args.output or f"bench_{results['timestamp']}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=4)
+    print(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            sys.exit(1 if compare(results, json.load(f)) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+Lawn scoring and landscaping recommendation system.
+
+The modules import each other relative to this package, and submodules are only imported when first
+accessed (e.g. src.recommendation), keeping `import src` cheap. Run the entry points as modules from
+the repository root, e.g. `python -m src` for the CLI or `python -m src.main` for the nightly run.
+"""
+
+import importlib
+import os
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def __getattr__(name):
+    if name.startswith("_") or not os.path.exists(os.path.join(_SRC_DIR, f"{name}.py")):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{name}")
+    globals()[name] = module
+    return module
@@ -0,0 +1,89 @@
+import threading
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+class Arena:
+    """
+    A preallocated block of equally shaped slots that pipeline stages hand to each other by index.
+
+    Stages write an image (or feature row) into a slot once and pass the slot index on, so nothing
+    is copied between stages. With shared=True the block lives in multiprocessing.shared_memory and
+    worker processes attach to it by name, writing their results where the parent can read them.
+    """
+
+    def __init__(self, capacity, shape, dtype=np.uint8, shared=False, name=None):
+        """
+        Args:
+            capacity (int): Number of slots.
+            shape (tuple): Shape of one slot, e.g. (256, 256, 3) for a preprocessed image.
+            dtype (numpy.dtype, optional): Slot element type. Defaults to uint8.
+            shared (bool, optional): Allocate the block in shared memory. Defaults to False.
+            name (str, optional): Attach to an existing shared block instead of creating one.
+        """
+        self.capacity = capacity
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self._shm = None
+        self._owner = name is None
+
+        nbytes = max(1, capacity * int(np.prod(self.shape)) * self.dtype.itemsize)
+        if name is not None:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Only the creating process should unlink the block; stop this process's tracker from doing it
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        elif shared:
+            self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+        if self._shm is not None:
+            self.buffer = np.ndarray((capacity,) + self.shape, dtype=self.dtype, buffer=self._shm.buf)
+        else:
+            self.buffer = np.empty((capacity,) + self.shape, dtype=self.dtype)
+
+        self._free = list(range(capacity - 1, -1, -1))
+        self._available = threading.Condition()
+
+    @classmethod
+    def attach(cls, name, capacity, shape, dtype=np.uint8):
+        """Attach to a shared arena created in another process."""
+        return cls(capacity, shape, dtype, name=name)
+
+    @property
+    def name(self):
+        """Name of the shared memory block, or None for a process-local arena."""
+        return self._shm.name if self._shm is not None else None
+
+    def __getitem__(self, index):
+        return self.buffer[index]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def acquire(self, timeout=None):
+        """Take a free slot index, blocking until one is released if the arena is full."""
+        with self._available:
+            if not self._available.wait_for(lambda: self._free, timeout=timeout):
+                raise TimeoutError("No free slot in the arena.")
+            return self._free.pop()
+
+    def release(self, index):
+        """Return a slot to the arena once its last consumer is done with it."""
+        with self._available:
+            self._free.append(index)
+            self._available.notify()
+
+    def close(self):
+        """Release the memory; the creating process also unlinks a shared block."""
+        self.buffer = None
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                pass  # Slot views are still referenced elsewhere; the mapping is released when they are
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
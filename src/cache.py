@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from . import metrics
+
+DEFAULT_CACHE_DIR = "data/cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # Evict least recently used entries once the cache grows past 2 GiB
+LOW_WATER_FRACTION = 0.9  # Eviction frees space down to this fraction of max_bytes, so saves do not evict every time
+LARGE_ARRAY_BYTES = 64 * 1024  # Arrays above this (preprocessed images) are evicted before feature rows and detections
+HASH_INDEX_FILE = "hash_index.json"
+
+
+def pipeline_params(model_path="yolov8n.onnx", schema=None):
+    """Return the pipeline parameters that change preprocessed images, detections or features."""
+    # Imported here so that hashing files with this module does not load OpenCV
+    from . import feature_extraction
+    from . import preprocess
+
+    schema = feature_extraction.DEFAULT_SCHEMA if schema is None else schema
+    return {
+        "resize": list(preprocess.PREPROCESS_SIZE),
+        "model_path": model_path,
+        "radius": feature_extraction.RADIUS,
+        "n_points": feature_extraction.N_POINTS,
+        "glcm_levels": feature_extraction.GLCM_LEVELS,
+        "glcm_distance": feature_extraction.GLCM_DISTANCE,
+        "preprocessed_dtype": "uint8",
+        "features": list(schema.names),
+        "detector_classes": list(feature_extraction.DETECTOR_CLASS_NAMES),
+    }
+
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove(path):
+    """Delete a file, returning False if another process already deleted it."""
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+class FeatureCache:
+    """
+    Content-addressed on-disk cache of preprocessed images, detections and feature rows.
+
+    Entries are keyed by a hash of the image contents plus the pipeline parameters, so a changed photo or a
+    changed parameter never hits a stale entry. Arrays are stored as .npy files that are memory-mapped on
+    read. Each read touches the entry's mtime, and once the cache grows past max_bytes the least recently
+    used data is deleted: large arrays such as preprocessed images go first, and whole entries (with their
+    small feature rows and detections) only once no large arrays are left.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, params=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir (str, optional): Directory the cache lives in. Defaults to DEFAULT_CACHE_DIR.
+            params (dict, optional): Pipeline parameters mixed into every key. Defaults to pipeline_params().
+            max_bytes (int, optional): Size above which least recently used entries are evicted.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        params = pipeline_params() if params is None else params
+        self.params_digest = hashlib.sha256(json.dumps(params, sort_keys=True).encode('utf-8')).hexdigest()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Maps image path -> [size, mtime_ns, content digest] so unchanged files are not hashed again
+        self._hash_index_path = os.path.join(cache_dir, HASH_INDEX_FILE)
+        self._hash_index = self._load_hash_index()
+        self._hash_index_dirty = False
+        self._hash_updates = {}  # Digests computed since the last hash_updates() call
+        self._size = None
+
+    def _load_hash_index(self):
+        try:
+            with open(self._hash_index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def key(self, image_path):
+        """Return the cache key of an image: its content digest combined with the pipeline parameters."""
+        stat = os.stat(image_path)
+        known = self._hash_index.get(image_path)
+        if known is not None and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            content_digest = known[2]
+        else:
+            content_digest = file_digest(image_path)
+            self._hash_index[image_path] = [stat.st_size, stat.st_mtime_ns, content_digest]
+            self._hash_updates[image_path] = self._hash_index[image_path]
+            self._hash_index_dirty = True
+        return self.key_for_digest(content_digest)
+
+    def key_for_digest(self, content_digest):
+        """Return the cache key for image contents whose SHA-256 hex digest is already known."""
+        return hashlib.sha256(f"{content_digest}:{self.params_digest}".encode('utf-8')).hexdigest()
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def load(self, key, name):
+        """
+        Load a cached array.
+
+        Args:
+            key (str): Cache key from key().
+            name (str): Name of the array within the entry, e.g. "preprocessed" or "features".
+
+        Returns:
+            numpy.ndarray: Read-only memory-mapped array, or None on a cache miss.
+        """
+        path = os.path.join(self._entry_dir(key), f"{name}.npy")
+        try:
+            array = np.load(path, mmap_mode='r')
+            os.utime(self._entry_dir(key))  # Mark the entry as recently used
+            metrics.increment("cache_hits_total")
+            return array
+        except (OSError, ValueError):
+            metrics.increment("cache_misses_total")
+            return None
+
+    def save(self, key, name, array):
+        """Store an array under a key, writing to a temporary file first so readers never see partial data."""
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        path = os.path.join(entry_dir, f"{name}.npy")
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.asarray(array))
+            added = os.path.getsize(tmp_path)
+            try:
+                added -= os.path.getsize(path)  # An overwritten array no longer takes up space
+            except FileNotFoundError:
+                pass
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if self._size is not None:
+            self._size += added
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    def _entries(self):
+        """Return (mtime, [(size, path), ...], entry_dir) for every entry in the cache."""
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                try:
+                    files = [(f.stat().st_size, f.path) for f in os.scandir(entry.path)]
+                    entries.append((entry.stat().st_mtime, files, entry.path))
+                except FileNotFoundError:
+                    continue  # Evicted by another process while scanning
+        return entries
+
+    def size(self):
+        """Return the total size of the cached arrays in bytes."""
+        if self._size is None:
+            self._size = sum(size for _, files, _ in self._entries() for size, _ in files)
+        return self._size
+
+    def evict(self, max_bytes=None):
+        """
+        Delete least recently used data until the cache fits in max_bytes.
+
+        Large arrays are deleted first, oldest entry first; only if that is not enough are whole entries
+        deleted. Without max_bytes the cache is trimmed to LOW_WATER_FRACTION of self.max_bytes, so the
+        next saves have room before another scan of the cache is needed.
+        """
+        max_bytes = int(self.max_bytes * LOW_WATER_FRACTION) if max_bytes is None else max_bytes
+        entries = sorted(self._entries())
+        total = sum(size for _, files, _ in entries for size, _ in files)
+
+        for _, files, _ in entries:
+            for size, path in files:
+                if total <= max_bytes:
+                    break
+                if size > LARGE_ARRAY_BYTES and _remove(path):
+                    total -= size
+
+        for _, files, entry_dir in entries:
+            if total <= max_bytes:
+                break
+            for size, path in files:
+                if size <= LARGE_ARRAY_BYTES and _remove(path):
+                    total -= size
+            try:
+                os.rmdir(entry_dir)
+            except OSError:
+                pass
+        self._size = total
+
+    def hash_updates(self):
+        """Return and forget the file digests computed since the last call, e.g. to send them from a worker."""
+        updates, self._hash_updates = self._hash_updates, {}
+        return updates
+
+    def merge_hash_index(self, updates):
+        """Add file digests computed by another process (see hash_updates) to the hash index."""
+        if updates:
+            self._hash_index.update(updates)
+            self._hash_index_dirty = True
+
+    def flush(self):
+        """Write the file hash index back to disk so the next run can skip hashing unchanged files."""
+        if not self._hash_index_dirty:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._hash_index, f)
+        os.replace(tmp_path, self._hash_index_path)
+        self._hash_index_dirty = False
@@ -0,0 +1,279 @@
+import argparse
+import importlib
+import os
+import sys
+import time
+
+from .model_trainer import MODEL_DIR  # Imports nothing heavy; scikit-learn and joblib load only for training
+
+# Third-party libraries that dominate startup time; --timings reports which of them a command loaded
+HEAVY_MODULES = ("cv2", "sklearn", "skimage", "pandas", "pyarrow", "praw", "requests", "PIL", "joblib")
+
+# Default detector model, repeated here because preprocess loads OpenCV
+DETECTOR_MODEL_PATH = "yolov8n.onnx"
+# Default scraped tips dataset and similarity index, repeated here because their modules load PyArrow
+TIPS_PARQUET_DIR = "reddit_tips"
+SIMILARITY_INDEX_DIR = "data/similarity_index"
+# forest_export.DEFAULT_TOLERANCE, repeated here so parsing the arguments does not load NumPy
+EXPORT_TOLERANCE = 1e-4
+
+_import_times = []  # (module name, seconds) for every module loaded through _load
+
+
+def _load(name):
+    """Import a module of this package (or a library) on first use and record how long the import took."""
+    if os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"{name}.py")):
+        qualified = f"{__package__}.{name}"
+    else:
+        qualified = name
+    if qualified in sys.modules:
+        return sys.modules[qualified]
+    start = time.perf_counter()
+    module = importlib.import_module(qualified)
+    _import_times.append((name, time.perf_counter() - start))
+    return module
+
+
+def cmd_index(args):
+    """Index an image folder and add new images to the features CSV."""
+    generate_features_csv = _load("generate_features_csv")
+    delta = generate_features_csv.generate_features_csv(args.image_folder, args.csv_path)
+    print(f"Indexed {args.image_folder}: {len(delta.added)} added, {len(delta.changed)} changed, "
+          f"{len(delta.deleted)} deleted")
+
+
+def cmd_preprocess(args):
+    """Preprocess and run detection on an image folder, filling the feature cache."""
+    cache = _load("cache")
+    preprocess = _load("preprocess")
+    feature_cache = cache.FeatureCache(args.cache_dir, params=cache.pipeline_params(args.detector))
+    processed = preprocess.batch_process_images(args.image_folder, args.detector, workers=args.workers,
+                                                cache=feature_cache)
+    feature_cache.flush()
+    print(f"Preprocessed {len(processed)} images")
+
+
+def cmd_train(args):
+    """Extract features for an image folder and train a lawn score model on the scores in the CSV."""
+    np = _load("numpy")
+    pd = _load("pandas")
+    cache = _load("cache")
+    feature_extraction = _load("feature_extraction")
+    indexer = _load("indexer")
+    jobs = _load("jobs")
+    model_trainer = _load("model_trainer")
+    pipeline = _load("pipeline")
+
+    # Features are extracted as a resumable job on the worker pool, so an interrupted run continues where it stopped
+    schema = feature_extraction.DEFAULT_SCHEMA
+    feature_cache = cache.FeatureCache(args.cache_dir, params=cache.pipeline_params(args.detector, schema))
+    runner = jobs.JobRunner(args.job_dir, "features")
+    image_paths = sorted(image_path for image_path, _, _ in indexer.scan_images(args.image_folder))
+    image_paths, X, _ = pipeline.run_feature_job(image_paths, runner, schema, args.detector, feature_cache,
+                                                 workers=args.workers)
+    feature_cache.flush()
+    runner.finish()
+    if len(image_paths) == 0:
+        print(f"No images could be processed; see {runner.error_log_path}")
+        return
+
+    scores = pd.read_csv(args.csv_path).set_index("Image Path")["Initial Score"]
+    y = scores.reindex(image_paths).fillna(0).to_numpy(dtype=np.float32)
+    model_trainer.train_model(X, y, schema=schema, model_dir=args.model_dir, n_jobs=args.workers)
+
+
+def cmd_score(args):
+    """Score an image folder with the latest trained model."""
+    scoring = _load("scoring")
+    scoring.score_images(args.image_folder, scoring.ModelRegistry(args.model_dir, compact=args.compact), args.detector)
+
+
+def cmd_export(args):
+    """Export the latest trained model as a compact NumPy forest, checked against an image folder."""
+    np = _load("numpy")
+    cache = _load("cache")
+    feature_extraction = _load("feature_extraction")
+    forest_export = _load("forest_export")
+    indexer = _load("indexer")
+    pipeline = _load("pipeline")
+    scoring = _load("scoring")
+    registry = scoring.ModelRegistry(args.model_dir)
+    model = registry.get()
+
+    # The export must predict like the model on real feature rows before it is shipped
+    schema = getattr(model, "feature_schema", None) or feature_extraction.DEFAULT_SCHEMA
+    feature_cache = cache.FeatureCache(args.cache_dir, params=cache.pipeline_params(args.detector, schema))
+    image_paths = sorted(image_path for image_path, _, _ in indexer.scan_images(args.image_folder))
+    features, valid, _, _ = pipeline.process_images_shared(image_paths, schema, args.detector, args.workers,
+                                                           cache=feature_cache)
+    feature_cache.flush()
+    if not valid.any():
+        print(f"No validation images could be processed in {args.image_folder}; not exporting")
+        return
+
+    path = os.path.splitext(registry.model_path)[0] + forest_export.COMPACT_SUFFIX
+    try:
+        forest = forest_export.export_forest(model, path, np.float16 if args.float16 else np.float32,
+                                             args.max_depth, X=features[valid], tolerance=args.tolerance)
+    except ValueError as e:
+        print(f"Not exporting: {e}")
+        return
+    print(f"Exported {len(forest.roots)} trees, {forest.nbytes / 1024:.0f} KiB of node arrays")
+
+
+def cmd_recommend(args):
+    """Print the recommendations for a lawn score and detected features."""
+    recommendation = _load("recommendation")
+    for service in recommendation.recommend_services(args.score, args.features):
+        print(service)
+
+
+def cmd_scrape(args):
+    """Scrape landscaping tips from a subreddit."""
+    scrape_reddit = _load("scrape_reddit")
+    scrape_reddit.scrape_reddit(args.subreddit, args.num_lines, output_format=args.format)
+
+
+def cmd_similar(args):
+    """Build the index of similar past lawns from the scored photos and the scraped Reddit posts."""
+    cache = _load("cache")
+    feature_extraction = _load("feature_extraction")
+    similarity = _load("similarity")
+    schema = feature_extraction.DEFAULT_SCHEMA
+    feature_cache = cache.FeatureCache(args.cache_dir, params=cache.pipeline_params(args.detector, schema))
+    index = similarity.build_archive_index(args.index_dir, args.csv_path, args.tips_dir, args.image_folder, schema,
+                                           args.detector, args.workers, feature_cache, args.lists)
+    feature_cache.flush()
+    print(f"Indexed {len(index)} past lawns in {args.index_dir}")
+
+
+def cmd_serve(args):
+    """Serve the latest trained model over HTTP."""
+    asyncio = _load("asyncio")
+    preprocess = _load("preprocess")
+    scoring = _load("scoring")
+    service = _load("service")
+    model = scoring.ModelRegistry(args.model_dir, compact=args.compact).get()
+    similarity_index = None
+    if args.similarity_index:
+        similarity = _load("similarity")
+        similarity_index = similarity.SimilarityIndex(args.similarity_index)
+    asyncio.run(service.serve(model, preprocess.load_detector(args.detector), args.host, args.port,
+                              similarity_index=similarity_index))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="lawn", description="Lawn scoring and landscaping recommendations.")
+    parser.add_argument("--timings", action="store_true",
+                        help="Report startup, import and command times (use python -X importtime for detail).")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    index = subcommands.add_parser("index", help=cmd_index.__doc__)
+    index.add_argument("image_folder", nargs="?", default="data/images")
+    index.add_argument("--csv-path", default="data/features.csv")
+    index.set_defaults(func=cmd_index)
+
+    for name, func in (("preprocess", cmd_preprocess), ("train", cmd_train)):
+        command = subcommands.add_parser(name, help=func.__doc__)
+        command.add_argument("image_folder", nargs="?", default="data/images")
+        command.add_argument("--detector", default=DETECTOR_MODEL_PATH)
+        command.add_argument("--cache-dir", default="data/cache")
+        command.add_argument("--workers", type=int, default=None)
+        command.set_defaults(func=func)
+    train = subcommands.choices["train"]
+    train.add_argument("--csv-path", default="data/features.csv")
+    train.add_argument("--model-dir", default=MODEL_DIR)
+    train.add_argument("--job-dir", default="data/jobs", help="Checkpoint and error log of the feature job.")
+
+    score = subcommands.add_parser("score", help=cmd_score.__doc__)
+    score.add_argument("image_folder", nargs="?", default="data/images")
+    score.add_argument("--detector", default=DETECTOR_MODEL_PATH)
+    score.add_argument("--model-dir", default=MODEL_DIR)
+    score.add_argument("--compact", action="store_true", help="Score with the exported NumPy forest.")
+    score.set_defaults(func=cmd_score)
+
+    export = subcommands.add_parser("export", help=cmd_export.__doc__)
+    export.add_argument("image_folder", nargs="?", default="data/images", help="Validation images.")
+    export.add_argument("--model-dir", default=MODEL_DIR)
+    export.add_argument("--detector", default=DETECTOR_MODEL_PATH)
+    export.add_argument("--cache-dir", default="data/cache")
+    export.add_argument("--workers", type=int, default=None)
+    export.add_argument("--tolerance", type=float, default=EXPORT_TOLERANCE,
+                        help="Largest prediction difference from the model accepted on the validation images.")
+    export.add_argument("--float16", action="store_true", help="Store split thresholds as float16.")
+    export.add_argument("--max-depth", type=int, default=None, help="Prune the trees to this depth.")
+    export.set_defaults(func=cmd_export)
+
+    recommend = subcommands.add_parser("recommend", help=cmd_recommend.__doc__)
+    recommend.add_argument("score", type=float)
+    recommend.add_argument("features", nargs="*")
+    recommend.set_defaults(func=cmd_recommend)
+
+    scrape = subcommands.add_parser("scrape", help=cmd_scrape.__doc__)
+    scrape.add_argument("--subreddit", default="landscaping")
+    scrape.add_argument("--num-lines", type=int, default=10)
+    scrape.add_argument("--format", default="print", choices=["print", "csv", "json", "parquet"])
+    scrape.set_defaults(func=cmd_scrape)
+
+    similar = subcommands.add_parser("similar", help=cmd_similar.__doc__)
+    similar.add_argument("image_folder", nargs="?", default="data/images",
+                         help="Folder the photos and Reddit post images were downloaded to.")
+    similar.add_argument("--csv-path", default="data/features.csv")
+    similar.add_argument("--tips-dir", default=TIPS_PARQUET_DIR, help="Parquet dataset of scraped tips.")
+    similar.add_argument("--index-dir", default=SIMILARITY_INDEX_DIR)
+    similar.add_argument("--lists", type=int, default=0, help="Inverted lists of the index; 0 searches exactly.")
+    similar.add_argument("--detector", default=DETECTOR_MODEL_PATH)
+    similar.add_argument("--cache-dir", default="data/cache")
+    similar.add_argument("--workers", type=int, default=None)
+    similar.set_defaults(func=cmd_similar)
+
+    serve = subcommands.add_parser("serve", help=cmd_serve.__doc__)
+    serve.add_argument("--detector", default=DETECTOR_MODEL_PATH)
+    serve.add_argument("--model-dir", default=MODEL_DIR)
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8080)
+    serve.add_argument("--compact", action="store_true", help="Serve the exported NumPy forest.")
+    serve.add_argument("--similarity-index", default=None,
+                       help="Attach similar past lawns from this index (see the similar command).")
+    serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def report_timings(startup, command_time, stream=sys.stderr):
+    """
+    Print startup, per-module import and command times and the heavy libraries that were loaded.
+
+    startup is the CPU time the process spent before the command ran: interpreter startup, site
+    packages and the package and CLI imports.
+    """
+    print(f"startup: {startup * 1000:.1f} ms CPU", file=stream)
+    for name, seconds in _import_times:
+        print(f"import {name}: {seconds * 1000:.1f} ms", file=stream)
+    print(f"command: {command_time * 1000:.1f} ms", file=stream)
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+    print(f"heavy modules loaded: {', '.join(loaded) if loaded else 'none'}", file=stream)
+
+
+def main(argv=None):
+    """
+    Runs one CLI command, importing only the modules that command needs.
+
+    Args:
+        argv (list, optional): Command line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: Exit status.
+    """
+
+    args = build_parser().parse_args(argv)
+    startup = time.process_time()  # CPU time since the process started, including interpreter startup
+    start = time.perf_counter()
+    args.func(args)
+    if args.timings:
+        report_timings(startup, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+import io
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import metrics
+
+DEFAULT_CONCURRENCY = 16  # Downloads in flight at once
+DEFAULT_RETRIES = 3  # Retries for connection errors, 429 and 5xx responses
+CHUNK_SIZE = 64 * 1024  # Bytes written to disk per streamed chunk
+
+
+class ImageDownloader:
+    """
+    Downloads images concurrently over a pooled HTTP session.
+
+    All downloads share one requests.Session whose connection pool is sized to the concurrency limit,
+    so connections to the same host are reused. Transient failures are retried with backoff, bodies
+    are streamed to a temporary file and renamed into place, and URLs whose file is already on disk
+    (or already queued in this run) are not downloaded again.
+
+    With a transform, the body is collected in memory instead and the transform decodes it and
+    writes the final file itself, so a resized image reaches the disk in a single write.
+    """
+
+    def __init__(self, image_dir, concurrency=DEFAULT_CONCURRENCY, retries=DEFAULT_RETRIES, timeout=30,
+                 on_complete=None, transform=None):
+        """
+        Args:
+            image_dir (str): Directory the images are saved to.
+            concurrency (int, optional): Maximum number of downloads in flight. Defaults to DEFAULT_CONCURRENCY.
+            retries (int, optional): Retries per download for transient failures. Defaults to DEFAULT_RETRIES.
+            timeout (float, optional): Connect/read timeout in seconds. Defaults to 30.
+            on_complete (callable, optional): Called with the image path after each successful download,
+                on the download thread.
+            transform (callable, optional): Called as transform(buffer, out_path) with the response body in
+                an io.BytesIO; it must write the final image to out_path.
+        """
+        self.image_dir = image_dir
+        self.timeout = timeout
+        self.on_complete = on_complete
+        self.transform = transform
+        os.makedirs(image_dir, exist_ok=True)
+
+        retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, url, image_filename):
+        """
+        Queue a download and return immediately.
+
+        Args:
+            url (str): Image URL.
+            image_filename (str): File name to save the image under in image_dir.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the image path, or None if the download failed.
+        """
+        image_path = os.path.join(self.image_dir, image_filename)
+        with self._lock:
+            future = self._futures.get(image_path)
+            if future is None:
+                future = self._executor.submit(self._download, url, image_path)
+                self._futures[image_path] = future
+        return future
+
+    def download_all(self, items):
+        """Download (url, image_filename) pairs concurrently and return {image_filename: image path or None}."""
+        futures = {image_filename: self.submit(url, image_filename) for url, image_filename in items}
+        return {image_filename: future.result() for image_filename, future in futures.items()}
+
+    def _download(self, url, image_path):
+        """Stream one URL to image_path, skipping it if the file is already on disk."""
+        if os.path.exists(image_path):
+            metrics.increment("downloads_skipped_total")
+            return image_path
+
+        with metrics.timer("download_image"):
+            return self._fetch(url, image_path)
+
+    def _fetch(self, url, image_path):
+        """Stream one URL to a temporary file and move it to image_path once it is complete."""
+        tmp_path = None
+        try:
+            with self.session.get(url, stream=True, timeout=self.timeout) as r:
+                # Ensure the request was successful before saving
+                if r.status_code != 200:
+                    print(f"Failed to download image from {url}, status code: {r.status_code}")
+                    metrics.increment("download_failures_total")
+                    return None
+
+                fd, tmp_path = tempfile.mkstemp(dir=self.image_dir, suffix='.part')
+                if self.transform is None:
+                    with os.fdopen(fd, 'wb') as f:
+                        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+                        metrics.increment("download_bytes_total", f.tell())
+                else:
+                    os.close(fd)
+                    buffer = io.BytesIO()
+                    for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                        buffer.write(chunk)
+                    metrics.increment("download_bytes_total", buffer.tell())
+                    buffer.seek(0)
+                    self.transform(buffer, tmp_path)
+            os.replace(tmp_path, image_path)
+            tmp_path = None
+
+            metrics.increment("downloads_total")
+
+            if self.on_complete is not None:
+                self.on_complete(image_path)
+            return image_path
+
+        except Exception as e:
+            print(f"Failed to download image from {url}: {e}")
+            metrics.increment("download_failures_total")
+            return None
+        finally:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def close(self):
+        """Wait for queued downloads to finish and release the connection pool."""
+        self._executor.shutdown(wait=True)
+        self.session.close()
@@ -1,10 +1,14 @@
 import cv2
 import numpy as np
-from skimage.feature import greycomatrix, greycoprops
+
+from . import metrics
 
 # Consider defining these parameters in a configuration file for easy modification
 RADIUS = 8  # Radius for texture analysis
 N_POINTS = 8  # Number of points for texture analysis
+GLCM_LEVELS = 32  # Number of grey levels the image is quantized to before building co-occurrences
+GLCM_DISTANCE = 1  # Pixel offset between the two pixels of a co-occurrence pair (angle 0)
+TEXTURE_PERCENTILES = (10, 50, 90)  # Percentiles used to pool the local texture maps
 SERVICE_RECOMMENDATIONS = {
     "bare_patch": ["Grading & Overseeding", "Landscape Construction"],
     "large_object": ["Rock Installations", "Custom Landscape Design"],
@@ -13,22 +17,192 @@ SERVICE_RECOMMENDATIONS = {
     # Extend with more mappings based on your needs
 }
 
+# Names of the pooled texture descriptor values, in the order texture_descriptor returns them
+TEXTURE_FEATURE_NAMES = tuple(
+    [f"texture_{prop}_{stat}" for prop in ("contrast", "homogeneity")
+     for stat in ["mean", "std"] + [f"p{q}" for q in TEXTURE_PERCENTILES]]
+    + ["glcm_contrast", "glcm_homogeneity", "glcm_energy", "glcm_correlation"]
+)
+
 
-def extract_features(image_path, detected_objects):
+def quantize_gray(gray, levels=GLCM_LEVELS):
     """
-    Extracts features from a preprocessed image and detected objects.
+    Quantizes a grayscale image to a small number of grey levels.
+
+    Args:
+        gray (numpy.ndarray): 2D grayscale image, either uint8 (0-255) or float (0-1).
+        levels (int, optional): Number of output grey levels. Defaults to GLCM_LEVELS.
+
+    Returns:
+        numpy.ndarray: 2D array of grey level indices in the range [0, levels).
+    """
+
+    if np.issubdtype(gray.dtype, np.floating):
+        gray = np.clip(gray * 255.0, 0, 255).astype(np.uint8)
+    return ((gray.astype(np.uint16) * levels) >> 8).astype(np.uint8)
+
+
+def _box_mean(values, size):
+    """Mean over every size x size window of a 2D array (valid windows only), using an integral image."""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=integral[1:, 1:])
+    window_sum = (integral[size:, size:] - integral[:-size, size:]
+                  - integral[size:, :-size] + integral[:-size, :-size])
+    return window_sum / (size * size)
+
+
+def texture_maps(gray, levels=GLCM_LEVELS, window=RADIUS, distance=GLCM_DISTANCE):
+    """
+    Computes local GLCM contrast and homogeneity maps for a whole image in one pass.
+
+    The normalized co-occurrence matrix of a window weights every (i, j) pair by how often it occurs,
+    so its contrast and homogeneity equal the mean of (i - j)^2 and 1 / (1 + (i - j)^2) over the
+    pixel pairs in that window. Both maps are therefore a sliding-window mean over per-pair values.
+
+    Args:
+        gray (numpy.ndarray): 2D grayscale image.
+        levels (int, optional): Number of grey levels to quantize to. Defaults to GLCM_LEVELS.
+        window (int, optional): Side of the square window the co-occurrences are counted in. Defaults to RADIUS.
+        distance (int, optional): Horizontal offset between paired pixels. Defaults to GLCM_DISTANCE.
+
+    Returns:
+        tuple: (contrast_map, homogeneity_map), one value per window position.
+    """
+
+    quantized = quantize_gray(gray, levels).astype(np.float32)
+    diff_sq = (quantized[:, :-distance] - quantized[:, distance:]) ** 2
+
+    # Clamp the window so small images still produce at least one value
+    window = max(1, min(window, diff_sq.shape[0], diff_sq.shape[1]))
+    contrast_map = _box_mean(diff_sq, window)
+    homogeneity_map = _box_mean(1.0 / (1.0 + diff_sq), window)
+    return contrast_map, homogeneity_map
+
+
+def glcm_properties(gray, levels=GLCM_LEVELS, distance=GLCM_DISTANCE):
+    """
+    Computes whole-image GLCM properties from co-occurrence counts.
+
+    Args:
+        gray (numpy.ndarray): 2D grayscale image.
+        levels (int, optional): Number of grey levels to quantize to. Defaults to GLCM_LEVELS.
+        distance (int, optional): Horizontal offset between paired pixels. Defaults to GLCM_DISTANCE.
+
+    Returns:
+        dict: Contrast, homogeneity, energy and correlation of the normalized co-occurrence matrix.
+    """
+
+    quantized = quantize_gray(gray, levels).astype(np.intp)
+    pairs = quantized[:, :-distance] * levels + quantized[:, distance:]
+    glcm = np.bincount(pairs.ravel(), minlength=levels * levels).reshape(levels, levels).astype(np.float64)
+    glcm /= max(glcm.sum(), 1.0)
+
+    i, j = np.indices((levels, levels))
+    diff_sq = (i - j) ** 2
+    mean_i, mean_j = (glcm * i).sum(), (glcm * j).sum()
+    std_i = np.sqrt((glcm * (i - mean_i) ** 2).sum())
+    std_j = np.sqrt((glcm * (j - mean_j) ** 2).sum())
+    covariance = (glcm * (i - mean_i) * (j - mean_j)).sum()
+
+    return {
+        "contrast": (glcm * diff_sq).sum(),
+        "homogeneity": (glcm / (1.0 + diff_sq)).sum(),
+        "energy": np.sqrt((glcm ** 2).sum()),
+        # A constant image has no variance; treat it as perfectly correlated like skimage does
+        "correlation": covariance / (std_i * std_j) if std_i > 0 and std_j > 0 else 1.0,
+    }
+
+
+def texture_descriptor(gray):
+    """
+    Pools the local texture maps and whole-image GLCM properties into a fixed-length vector.
+
+    Args:
+        gray (numpy.ndarray): 2D grayscale image.
+
+    Returns:
+        numpy.ndarray: float32 vector laid out as TEXTURE_FEATURE_NAMES, independent of the image size.
+    """
+
+    values = []
+    for texture_map in texture_maps(gray):
+        values.append(texture_map.mean())
+        values.append(texture_map.std())
+        values.extend(np.percentile(texture_map, TEXTURE_PERCENTILES))
+
+    props = glcm_properties(gray)
+    values.extend([props["contrast"], props["homogeneity"], props["energy"], props["correlation"]])
+    return np.asarray(values, dtype=np.float32)
+
+
+class FeatureSchema:
+    """Maps every feature name to a fixed column index so feature rows always share one layout."""
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.columns = {name: index for index, name in enumerate(self.names)}
+        if len(self.columns) != len(self.names):
+            raise ValueError("Feature names in a schema must be unique.")
+
+    @classmethod
+    def default(cls):
+        """Schema with the texture descriptor followed by one presence column per known object feature."""
+        return cls(TEXTURE_FEATURE_NAMES + OBJECT_FEATURE_NAMES)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __eq__(self, other):
+        return isinstance(other, FeatureSchema) and self.names == other.names
+
+    def __repr__(self):
+        return f"FeatureSchema({len(self.names)} features)"
+
+    def index(self, name):
+        """Return the column index of a feature name."""
+        return self.columns[name]
+
+    def new_row(self):
+        """Return a zeroed float32 row laid out by this schema."""
+        return np.zeros(len(self.names), dtype=np.float32)
+
+    def new_matrix(self, n_rows):
+        """Return a zeroed, contiguous float32 (n_rows, n_features) matrix laid out by this schema."""
+        return np.zeros((n_rows, len(self.names)), dtype=np.float32)
+
+    def to_dict(self, row):
+        """Convert a feature row back into a name -> value dictionary."""
+        return dict(zip(self.names, row.tolist()))
+
+
+# Presence columns for the object features the recommender knows about
+OBJECT_FEATURE_NAMES = tuple(f"object_{name}" for name in SERVICE_RECOMMENDATIONS)
+
+# Object name of every class ID the lawn detector outputs, indexed by class ID (the model's training order)
+DETECTOR_CLASS_NAMES = ("bare_patch", "large_object", "weed_growth", "poor_drainage")
+DEFAULT_SCHEMA = FeatureSchema.default()
+
+
+@metrics.timed("extract_features")
+def extract_feature_row(image_path, detected_objects, schema=DEFAULT_SCHEMA, out=None, image=None):
+    """
+    Extracts features from an image and its detected objects straight into a float32 row.
 
     Args:
         image_path (str): Path to the image file.
         detected_objects (list): List of object class IDs or names detected in the image.
+        schema (FeatureSchema, optional): Column layout of the row. Defaults to DEFAULT_SCHEMA.
+        out (numpy.ndarray, optional): Preallocated row to write into, e.g. a row of a feature matrix.
+        image (numpy.ndarray, optional): The image already decoded as BGR uint8 (see preprocess.load_image),
+            so the file is not read and decoded a second time.
 
     Returns:
-        dict: A dictionary containing extracted features.
+        numpy.ndarray: The filled feature row, or None if the image could not be processed.
     """
 
     try:
-        # Load the preprocessed image (assuming preprocessing is done elsewhere)
-        img = cv2.imread(image_path)
+        # Load the image unless an earlier stage already decoded it
+        img = cv2.imread(image_path) if image is None else image
 
         # Error handling for invalid image format
         if img is None:
@@ -37,36 +211,99 @@ def extract_features(image_path, detected_objects):
         # Convert to grayscale (suitable for texture analysis)
         gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
 
-        # Extract texture features (e.g., contrast, homogeneity)
-        features = {}
-        for i in range(len(gray)):
-            for j in range(len(gray[0])):
-                # Calculate texture properties around current pixel
-                glcm = greycomatrix(gray[i:i+RADIUS, j:j+RADIUS], distances=[1], angles=[0], levels=256, mode='L')
-                contrast = greycoprops(glcm, 'contrast')[0, 0]
-                homogeneity = greycoprops(glcm, 'homogeneity')[0, 0]
+        row = schema.new_row() if out is None else out
+        row[:] = 0
 
-                # Average texture features across a local region (adjust window size as needed)
-                window_size = 5
-                contrast_avg = np.mean(contrast[i - window_size // 2:i + window_size // 2 + 1, j - window_size // 2:j + window_size // 2 + 1])
-                homogeneity_avg = np.mean(homogeneity[i - window_size // 2:i + window_size // 2 + 1, j - window_size // 2:j + window_size // 2 + 1])
+        # Extract texture features (contrast, homogeneity) for the whole image in one pass
+        descriptor = texture_descriptor(gray)
+        for name, value in zip(TEXTURE_FEATURE_NAMES, descriptor):
+            column = schema.columns.get(name)
+            if column is not None:
+                row[column] = value
 
-                # Add features to dictionary with appropriate keys
-                features.update({f"texture_contrast_{i}_{j}": contrast_avg, f"texture_homogeneity_{i}_{j}": homogeneity_avg})
+        fill_object_features(row, detected_objects, schema)
+        return row
 
-        # Extract object-based features (if object detection is used)
-        object_features = {}
-        for obj_id in detected_objects:
-            # Map object ID to meaningful feature based on your object detection setup
-            object_feature_name = SERVICE_RECOMMENDATIONS.get(obj_id, None)
-            if object_feature_name:
-                object_features[object_feature_name] = 1  # Presence indicator
+    except Exception as e:
+        print(f"Error extracting features from image {image_path}: {e}")
+        metrics.increment("feature_failures_total")
+        return None  # Indicate failure
 
-        # Combine all features
-        features.update(object_features)
 
-        return features
+def object_name(obj):
+    """Return the object name of a detection: class IDs are looked up in DETECTOR_CLASS_NAMES, names pass through."""
+    if isinstance(obj, (int, np.integer)):
+        return DETECTOR_CLASS_NAMES[obj] if 0 <= obj < len(DETECTOR_CLASS_NAMES) else None
+    return obj
 
-    except Exception as e:
-        print(f"Error extracting features from image {image_path}: {e}")
-        return None  # Indicate failure
\ No newline at end of file
+
+def fill_object_features(row, detected_objects, schema=DEFAULT_SCHEMA):
+    """
+    Set the object presence columns of a feature row.
+
+    Detections may be detector class IDs or object names; unknown class IDs and objects without a
+    column are ignored.
+    """
+    for obj in detected_objects:
+        column = schema.columns.get(f"object_{object_name(obj)}")
+        if column is not None:
+            row[column] = 1
+    return row
+
+
+def extract_features(image_path, detected_objects, schema=DEFAULT_SCHEMA):
+    """
+    Extracts features from a preprocessed image and detected objects.
+
+    Args:
+        image_path (str): Path to the image file.
+        detected_objects (list): List of object class IDs or names detected in the image.
+        schema (FeatureSchema, optional): Column layout of the features. Defaults to DEFAULT_SCHEMA.
+
+    Returns:
+        dict: A dictionary containing extracted features, with the same keys in the same order for every image.
+    """
+
+    row = extract_feature_row(image_path, detected_objects, schema)
+    if row is None:
+        return None  # Indicate failure
+    return schema.to_dict(row)
+
+
+def extract_feature_matrix(image_paths, detections, schema=DEFAULT_SCHEMA, cache=None):
+    """
+    Extracts features for a batch of images into one contiguous matrix.
+
+    Args:
+        image_paths (list): Paths to the image files.
+        detections (list): Detected objects for each image, in the same order as image_paths.
+        schema (FeatureSchema, optional): Column layout of the matrix. Defaults to DEFAULT_SCHEMA.
+        cache (cache.FeatureCache, optional): Cache of feature rows; cached images are not decoded again.
+
+    Returns:
+        tuple: (features, valid) where features is a float32 (n_images, n_features) matrix and valid is a
+        boolean mask of the rows that were extracted successfully (failed rows are left zeroed).
+    """
+
+    features = schema.new_matrix(len(image_paths))
+    valid = np.zeros(len(image_paths), dtype=bool)
+    for i, (image_path, detected_objects) in enumerate(zip(image_paths, detections)):
+        key = None
+        if cache is not None:
+            try:
+                key = cache.key(image_path)
+            except OSError as e:
+                print(f"Error extracting features from image {image_path}: {e}")
+                continue
+            cached = cache.load(key, "features")
+            if cached is not None and cached.shape == (len(schema),):
+                features[i] = cached
+                valid[i] = True
+                continue
+
+        valid[i] = extract_feature_row(image_path, detected_objects, schema, out=features[i]) is not None
+        if not valid[i]:
+            features[i] = 0
+        elif cache is not None:
+            cache.save(key, "features", features[i])
+    return features, valid
@@ -0,0 +1,228 @@
+import numpy as np
+
+COMPACT_SUFFIX = ".npz"
+DEFAULT_TOLERANCE = 1e-4  # Largest absolute difference from sklearn accepted for a full-precision export
+PREDICT_BATCH_SIZE = 256  # Samples routed through every tree at once; small batches stay in cache
+
+
+def _round_down(thresholds, dtype):
+    """
+    Cast thresholds to dtype, rounding down so that x <= threshold keeps its meaning.
+
+    sklearn compares float32 features against float64 thresholds. Rounding a threshold to the largest
+    float32 not above it gives exactly the same comparisons for every float32 feature value.
+
+    Raises:
+        ValueError: If a split threshold is beyond the range of dtype. It would overflow to infinity and
+            flip the split (float16 ends at 65504).
+    """
+    limit = np.finfo(dtype).max
+    splits = thresholds[np.isfinite(thresholds)]  # Leaves are marked with an infinite threshold
+    if len(splits) and np.max(np.abs(splits)) > limit:
+        raise ValueError(f"Split thresholds up to {np.max(np.abs(splits)):g} do not fit {np.dtype(dtype).name} "
+                         f"(largest value {limit:g}); export with a wider threshold dtype.")
+    rounded = thresholds.astype(dtype)
+    too_high = rounded.astype(np.float64) > thresholds
+    rounded[too_high] = np.nextafter(rounded[too_high], dtype(-np.inf))
+    return rounded
+
+
+def _flatten_tree(tree, max_depth=None):
+    """
+    Return (feature, threshold, left, right, value, depth) of a fitted sklearn tree with nodes in
+    breadth-first order. Nodes at max_depth become leaves predicting their node's mean target.
+    """
+    keep, depths = [0], [0]
+    new_index = {0: 0}
+    i = 0
+    while i < len(keep):
+        node, depth = keep[i], depths[i]
+        if tree.children_left[node] >= 0 and (max_depth is None or depth < max_depth):
+            for child in (tree.children_left[node], tree.children_right[node]):
+                new_index[child] = len(keep)
+                keep.append(child)
+                depths.append(depth + 1)
+        i += 1
+
+    keep = np.asarray(keep)
+    feature = tree.feature[keep].astype(np.int32)
+    threshold = tree.threshold[keep].astype(np.float64)
+    value = tree.value[keep, 0, 0].astype(np.float32)
+    left = np.array([new_index.get(child, -1) for child in tree.children_left[keep]], dtype=np.int32)
+    right = np.array([new_index.get(child, -1) for child in tree.children_right[keep]], dtype=np.int32)
+
+    # Leaves (including pruned nodes) loop back to themselves and always compare true, so traversal
+    # recognizes a leaf by a step that stays on the same node
+    leaves = left < 0
+    positions = np.arange(len(keep), dtype=np.int32)
+    left[leaves], right[leaves] = positions[leaves], positions[leaves]
+    feature[leaves] = 0
+    threshold[leaves] = np.inf
+    return feature, threshold, left, right, value, max(depths)
+
+
+def export_forest(model, path, threshold_dtype=np.float32, max_depth=None, X=None, tolerance=DEFAULT_TOLERANCE):
+    """
+    Flattens a fitted RandomForestRegressor into packed NumPy arrays and saves them as a compressed .npz.
+
+    Every tree's nodes are concatenated into one set of arrays: split feature, threshold, left and right
+    child (as indices into the shared arrays) and node value, plus the root index of each tree. Given
+    validation samples X, the export is compared with the model (see check_export) before it is written,
+    and nothing is written if it is not within tolerance.
+
+    Args:
+        model (sklearn.ensemble.RandomForestRegressor): Fitted single-output forest.
+        path (str): File to write, conventionally ending in COMPACT_SUFFIX.
+        threshold_dtype (numpy.dtype, optional): np.float32 keeps sklearn's predictions exactly;
+            np.float16 halves the threshold storage at the cost of small deviations. Defaults to np.float32.
+        max_depth (int, optional): Prune the trees to this depth; deeper nodes are replaced by the mean of
+            their subtree. Defaults to None (no pruning).
+        X (numpy.ndarray, optional): (n_samples, n_features) validation matrix. Defaults to None (no check).
+        tolerance (float, optional): Largest absolute prediction difference accepted on X.
+            Defaults to DEFAULT_TOLERANCE.
+
+    Returns:
+        CompactForest: The exported forest.
+
+    Raises:
+        ValueError: If the forest has several outputs, a split threshold does not fit threshold_dtype or
+            the export differs from the model by more than tolerance on X.
+    """
+
+    if model.n_outputs_ != 1:
+        raise ValueError("Only single-output forests can be exported.")
+
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    depth = 0
+    offset = 0
+    for estimator in model.estimators_:
+        feature, threshold, left, right, value, tree_depth = _flatten_tree(estimator.tree_, max_depth)
+        roots.append(offset)
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left + offset)
+        rights.append(right + offset)
+        values.append(value)
+        depth = max(depth, tree_depth)
+        offset += len(feature)
+
+    n_features = model.n_features_in_
+    feature_dtype = np.int16 if n_features <= np.iinfo(np.int16).max else np.int32
+    schema = getattr(model, "feature_schema", None)
+    arrays = {
+        "feature": np.concatenate(features).astype(feature_dtype),
+        "threshold": _round_down(np.concatenate(thresholds), np.dtype(threshold_dtype).type),
+        "left": np.concatenate(lefts).astype(np.int32),
+        "right": np.concatenate(rights).astype(np.int32),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "depth": np.asarray(depth, dtype=np.int32),
+        "n_features": np.asarray(n_features, dtype=np.int32),
+        "feature_names": np.asarray(schema.names if schema is not None else [], dtype=str),
+    }
+    forest = CompactForest(arrays)
+    if X is not None:
+        error = check_export(model, forest, X, tolerance)
+        print(f"Largest difference from the model on {len(X)} validation samples: {error:g}")
+    with open(path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    print(f"Compact model saved to {path}")
+    return forest
+
+
+def load_compact(path):
+    """Load a forest saved by export_forest."""
+    with np.load(path, allow_pickle=False) as data:
+        return CompactForest({name: data[name] for name in data.files})
+
+
+class CompactForest:
+    """
+    Forest exported by export_forest, predicting with NumPy only.
+
+    predict routes a batch of samples through all trees at once: every step gathers the current node's
+    feature and threshold for each (sample, tree) pair still walking and moves to the left or right child,
+    and pairs that reached a leaf are dropped, so the work follows the actual path lengths rather than
+    the depth of the deepest tree. It is a drop-in replacement for the sklearn model's predict.
+    """
+
+    def __init__(self, arrays):
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.depth = int(arrays["depth"])
+        self.n_features_in_ = int(arrays["n_features"])
+        self.feature_names = tuple(str(name) for name in arrays["feature_names"])
+
+    @property
+    def feature_schema(self):
+        """FeatureSchema of the exported model, or None if it was trained without one."""
+        if not self.feature_names:
+            return None
+        from .feature_extraction import FeatureSchema  # Loads OpenCV, so only when asked for
+
+        return FeatureSchema(self.feature_names)
+
+    @property
+    def nbytes(self):
+        """Memory taken by the node arrays."""
+        return sum(array.nbytes for array in (self.feature, self.threshold, self.left, self.right, self.value))
+
+    def predict(self, X, batch_size=PREDICT_BATCH_SIZE):
+        """Predict lawn scores for a (n_samples, n_features) matrix, averaging the trees like sklearn."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected a matrix with {self.n_features_in_} columns, got shape {X.shape}.")
+
+        n_trees = len(self.roots)
+        predictions = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), batch_size):
+            batch = X[start:start + batch_size]
+            flat = batch.ravel()
+
+            # One entry per (sample, tree) pair still walking down its tree
+            node = np.tile(self.roots, len(batch)).astype(np.intp)
+            offsets = np.repeat(np.arange(len(batch)) * batch.shape[1], n_trees)
+            pair = np.arange(len(node))
+            leaves = np.empty(len(node), dtype=np.intp)
+            while len(node):
+                go_left = flat[offsets + self.feature[node]] <= self.threshold[node]
+                next_node = np.where(go_left, self.left[node], self.right[node])
+                # A leaf points back to itself; retire those pairs so later steps only touch the deeper ones
+                done = next_node == node
+                leaves[pair[done]] = node[done]
+                walking = ~done
+                node, offsets, pair = next_node[walking], offsets[walking], pair[walking]
+            predictions[start:start + batch_size] = self.value[leaves].reshape(len(batch), n_trees).mean(
+                axis=1, dtype=np.float64)
+        return predictions
+
+
+def check_export(model, forest, X, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare an exported forest with the sklearn model it came from.
+
+    Returns:
+        float: The largest absolute prediction difference on X.
+
+    Raises:
+        ValueError: If the difference exceeds tolerance.
+    """
+    error = float(np.max(np.abs(model.predict(X) - forest.predict(X)))) if len(X) else 0.0
+    if error > tolerance:
+        raise ValueError(f"Exported forest differs from the model by up to {error}, above the tolerance {tolerance}.")
+    return error
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    import joblib
+
+    model = joblib.load(sys.argv[1])
+    forest = export_forest(model, sys.argv[1].rsplit(".", 1)[0] + COMPACT_SUFFIX, threshold_dtype=np.float16)
+    print(f"Node arrays: {forest.nbytes / 1024:.0f} KiB")
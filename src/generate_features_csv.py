@@ -1,36 +1,91 @@
+import csv
 import os
-from glob import glob
 
-def generate_features_csv(image_folder, csv_path, default_score=0):
+from .indexer import index_images, scan_images
+from .storage import IMAGE_FEATURES_SCHEMA, ColumnarWriter
+
+def generate_features_csv(image_folder, csv_path, default_score=0, manifest_path=None):
     """
     Generates a CSV file containing image paths and initial lawn scores.
 
+    The folder is indexed incrementally (see indexer.index_images), so a re-run only touches the CSV for
+    images that were added or deleted since the last run: new images are appended, and the file is only
+    rewritten when images were deleted. Changed images keep their existing row and score.
+
     Args:
-        image_folder (str): Path to the folder containing images.
+        image_folder (str): Path to the folder containing images, including nested folders.
         csv_path (str): Path to save the generated CSV file.
         default_score (float, optional): Default score to assign to images if no model prediction is available. Defaults to 0.
+        manifest_path (str, optional): Index manifest to compare against. Defaults to csv_path + ".manifest.parquet".
+
+    Returns:
+        indexer.IndexDelta: The images that were added, changed or deleted since the previous run.
     """
 
-    # Check if image folder exists
-    if not os.path.exists(image_folder):
-        raise ValueError(f"Image folder '{image_folder}' does not exist.")
+    manifest_path = manifest_path or f"{csv_path}.manifest.parquet"
+    if not os.path.exists(csv_path) and os.path.exists(manifest_path):
+        os.remove(manifest_path)  # The CSV was removed, so every image has to be written again
+
+    def write_csv(delta):
+        if delta.deleted or not os.path.exists(csv_path):
+            # Rewrite the file, keeping the scores of the images that are still there
+            deleted = set(delta.deleted)
+            rows = []
+            if os.path.exists(csv_path):
+                with open(csv_path, 'r', newline='') as csvfile:
+                    reader = csv.reader(csvfile)
+                    next(reader, None)  # Skip header row
+                    rows = [row for row in reader if row and row[0] not in deleted]
+
+            tmp_path = f"{csv_path}.tmp"
+            with open(tmp_path, 'w', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+
+                # Write header row
+                writer.writerow(["Image Path", "Initial Score"])
+
+                # Write image paths and initial scores
+                writer.writerows(rows)
+                for image_path in delta.added:
+                    writer.writerow([image_path, default_score])
+            os.replace(tmp_path, csv_path)
+
+        elif delta.added:
+            # Append only the new images
+            with open(csv_path, 'a', newline='') as csvfile:
+                writer = csv.writer(csvfile)
+                for image_path in delta.added:
+                    writer.writerow([image_path, default_score])
 
-    # Get list of image paths
-    image_paths = glob(os.path.join(image_folder, "*.jpg"), recursive=True)  # Adjust pattern for supported formats
-    image_paths.extend(glob(os.path.join(image_folder, "*.png"), recursive=True))
+    # The manifest is only saved once the CSV holds the changes, so a run that dies in between is redone
+    delta = index_images(image_folder, manifest_path, apply=write_csv)
 
-    # Open CSV file for writing
-    with open(csv_path, 'w', newline='') as csvfile:
-        writer = csv.writer(csvfile)
+    print(f"Generated CSV file: {csv_path} ({len(delta.added)} added, {len(delta.changed)} changed, "
+          f"{len(delta.deleted)} deleted)")
+    return delta
 
-        # Write header row
-        writer.writerow(["Image Path", "Initial Score"])
+def generate_features_parquet(image_folder, parquet_path, default_score=0):
+    """
+    Generates a Parquet file containing image paths and initial lawn scores.
+
+    Rows are appended in record batches as the folder is listed, and the file can be read back by
+    column, e.g. storage.read_columns(parquet_path, columns=["image_path"]).
+
+    Args:
+        image_folder (str): Path to the folder containing images.
+        parquet_path (str): Path to save the generated Parquet file.
+        default_score (float, optional): Default score to assign to images if no model prediction is available. Defaults to 0.
+    """
+
+    # Check if image folder exists
+    if not os.path.exists(image_folder):
+        raise ValueError(f"Image folder '{image_folder}' does not exist.")
 
-        # Write image paths and initial scores
-        for image_path in image_paths:
-            writer.writerow([image_path, default_score])
+    with ColumnarWriter(parquet_path, IMAGE_FEATURES_SCHEMA) as writer:
+        for image_path, _, _ in scan_images(image_folder):
+            writer.write({"image_path": image_path, "initial_score": default_score})
 
-    print(f"Generated CSV file: {csv_path}")
+    print(f"Generated Parquet file: {parquet_path}")
 
 if __name__ == "__main__":
     image_folder = "data/images"
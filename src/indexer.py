@@ -0,0 +1,116 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pyarrow as pa
+
+from .cache import file_digest
+from .storage import ColumnarWriter, read_columns
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DEFAULT_HASH_WORKERS = 8  # Hashing is I/O bound, so threads overlap reads well
+
+MANIFEST_SCHEMA = pa.schema([
+    ("image_path", pa.string()),
+    ("size", pa.int64()),
+    ("mtime_ns", pa.int64()),
+    ("sha256", pa.string()),
+])
+
+# Images that were added, changed or deleted since the previous index run
+IndexDelta = namedtuple("IndexDelta", ["added", "changed", "deleted"])
+
+
+def scan_images(image_folder):
+    """Walk a folder and all of its subfolders with os.scandir, yielding (path, size, mtime_ns) per image."""
+    pending = [image_folder]
+    while pending:
+        folder = pending.pop()
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        stat = entry.stat()
+                        yield entry.path, stat.st_size, stat.st_mtime_ns
+        except OSError as e:
+            print(f"Error scanning folder {folder}: {e}")
+
+
+def load_manifest(manifest_path):
+    """Load a manifest as {image_path: (size, mtime_ns, sha256)}, or an empty dict if there is none."""
+    if not os.path.exists(manifest_path):
+        return {}
+    table = read_columns(manifest_path)
+    return {path: (size, mtime_ns, sha256) for path, size, mtime_ns, sha256 in
+            zip(table["image_path"], table["size"], table["mtime_ns"], table["sha256"])}
+
+
+def save_manifest(manifest_path, manifest):
+    """Write a {image_path: (size, mtime_ns, sha256)} manifest as a Parquet file."""
+    with ColumnarWriter(manifest_path, MANIFEST_SCHEMA) as writer:
+        for image_path in sorted(manifest):
+            size, mtime_ns, sha256 = manifest[image_path]
+            writer.write({"image_path": image_path, "size": size, "mtime_ns": mtime_ns, "sha256": sha256})
+
+
+def index_images(image_folder, manifest_path, hash_workers=DEFAULT_HASH_WORKERS, apply=None):
+    """
+    Incrementally indexes the images under a folder against a manifest from the previous run.
+
+    Only files that are new or whose size or mtime changed are hashed, in parallel threads. A file
+    whose stat changed but whose contents hash the same is not reported.
+
+    Args:
+        image_folder (str): Folder to index, including nested folders.
+        manifest_path (str): Parquet manifest of size, mtime and SHA-256 per image; updated in place.
+        hash_workers (int, optional): Number of hashing threads. Defaults to DEFAULT_HASH_WORKERS.
+        apply (callable, optional): Called with the IndexDelta before the manifest is saved, e.g. to write
+            the changes to a CSV. If it raises, the manifest is left as it was, so the next run reports
+            the same changes again. Defaults to None.
+
+    Returns:
+        IndexDelta: Sorted lists of added, changed and deleted image paths.
+    """
+
+    # Check if image folder exists
+    if not os.path.exists(image_folder):
+        raise ValueError(f"Image folder '{image_folder}' does not exist.")
+
+    previous = load_manifest(manifest_path)
+    manifest = {}
+    to_hash = []
+    for image_path, size, mtime_ns in scan_images(image_folder):
+        known = previous.get(image_path)
+        if known is not None and known[0] == size and known[1] == mtime_ns:
+            manifest[image_path] = known
+        else:
+            to_hash.append((image_path, size, mtime_ns))
+
+    added, changed = [], []
+    with ThreadPoolExecutor(max_workers=hash_workers) as executor:
+        digests = executor.map(lambda item: _safe_digest(item[0]), to_hash)
+        for (image_path, size, mtime_ns), sha256 in zip(to_hash, digests):
+            if sha256 is None:
+                continue
+            manifest[image_path] = (size, mtime_ns, sha256)
+            if image_path not in previous:
+                added.append(image_path)
+            elif previous[image_path][2] != sha256:
+                changed.append(image_path)
+
+    delta = IndexDelta(sorted(added), sorted(changed), sorted(set(previous) - set(manifest)))
+    if apply is not None:
+        apply(delta)
+    if to_hash or delta.deleted or not os.path.exists(manifest_path):
+        save_manifest(manifest_path, manifest)
+    return delta
+
+
+def _safe_digest(image_path):
+    try:
+        return file_digest(image_path)
+    except OSError as e:
+        print(f"Error hashing image {image_path}: {e}")
+        return None
@@ -0,0 +1,239 @@
+import functools
+import json
+import os
+import random
+import time
+import traceback
+from collections import namedtuple
+
+DEFAULT_JOB_DIR = "data/jobs"
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 1.0  # Seconds before the first retry; doubled for every further attempt
+MAX_BACKOFF = 60.0
+
+# OSErrors that will not go away by trying again
+PERMANENT_OS_ERRORS = (FileNotFoundError, PermissionError, IsADirectoryError, NotADirectoryError)
+
+# Outcome of JobRunner.run: ids completed in this run, skipped because an earlier run completed them,
+# and failed after all retries
+JobSummary = namedtuple("JobSummary", ["completed", "skipped", "failed"])
+
+_NOT_RUN = object()  # Marks a group whose first attempt has not run yet
+
+
+def _call_task(task, indexed_item):
+    """Run a task on one (index, item) pair in a pool worker, returning the exception instead of raising it."""
+    index, item = indexed_item
+    try:
+        return index, task(item)
+    except Exception as e:
+        return index, e
+
+
+def _call_in_pool(pool, task, item):
+    """Run a task on one item (or batch) in a pool worker and return its result, raising its exception."""
+    return pool.apply(task, (item,))
+
+
+def is_transient(error):
+    """Return True for errors worth retrying: timeouts, dropped connections and other I/O hiccups."""
+    if isinstance(error, PERMANENT_OS_ERRORS):
+        return False
+    return isinstance(error, (TimeoutError, ConnectionError, OSError))
+
+
+class JobRunner:
+    """
+    Runs a task over a list of items, checkpointing every completed item so an interrupted job resumes.
+
+    Completed item ids and their JSON results are appended to <name>.checkpoint.jsonl as they finish,
+    and failures are appended to <name>.errors.jsonl with the error type, message, traceback and number
+    of attempts. A new runner with the same job directory and name loads the checkpoint and skips the
+    items it lists. Transient errors (see is_transient) are retried with exponential backoff and jitter;
+    items that failed in an earlier run are tried again.
+    """
+
+    def __init__(self, job_dir=DEFAULT_JOB_DIR, name="job", retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 max_backoff=MAX_BACKOFF, sleep=time.sleep):
+        """
+        Args:
+            job_dir (str, optional): Directory for the checkpoint and error log. Defaults to DEFAULT_JOB_DIR.
+            name (str, optional): Job name; runs with the same name share a checkpoint. Defaults to "job".
+            retries (int, optional): Retries of an item after a transient error. Defaults to DEFAULT_RETRIES.
+            backoff (float, optional): Seconds before the first retry. Defaults to DEFAULT_BACKOFF.
+            max_backoff (float, optional): Longest wait between retries. Defaults to MAX_BACKOFF.
+            sleep (callable, optional): Function used to wait between retries. Defaults to time.sleep.
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sleep = sleep
+        os.makedirs(job_dir, exist_ok=True)
+        self.checkpoint_path = os.path.join(job_dir, f"{name}.checkpoint.jsonl")
+        self.error_log_path = os.path.join(job_dir, f"{name}.errors.jsonl")
+        self.completed = self._load_checkpoint()
+        self._summary = None
+
+    def _load_checkpoint(self):
+        """Return {item id: result} of the items completed by earlier runs."""
+        completed = {}
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # A line cut short when the previous run was killed
+                    completed[record["id"]] = record.get("result")
+        except FileNotFoundError:
+            pass
+        return completed
+
+    def failures(self):
+        """Return the records of the error log, oldest first."""
+        try:
+            with open(self.error_log_path, 'r', encoding='utf-8') as f:
+                return [json.loads(line) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def reset(self):
+        """Forget the checkpoint and error log so the next run starts from scratch."""
+        for path in (self.checkpoint_path, self.error_log_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.completed = {}
+
+    def finish(self):
+        """Remove the checkpoint of a job that ran to the end, so the next run starts over; the error log is kept."""
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        self.completed = {}
+
+    def _delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    def _complete(self, checkpoint, item_id, result):
+        checkpoint.write(json.dumps({"id": item_id, "result": result}) + "\n")
+        self.completed[item_id] = result
+        self._summary.completed.append(item_id)
+
+    def _fail(self, error_log, item_id, error, attempts):
+        error_log.write(json.dumps({
+            "id": item_id,
+            "error_type": type(error).__name__,
+            "message": str(error),
+            "transient": is_transient(error),
+            "attempts": attempts,
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }) + "\n")
+        error_log.flush()
+        self._summary.failed.append(item_id)
+
+    def _run_group(self, group, task, batched, checkpoint, error_log, outcome=_NOT_RUN):
+        """
+        Run a task over (item id, item) pairs, retrying transient failures and isolating bad items.
+        outcome is the task's result (or exception) for the group if its first attempt already ran elsewhere.
+        """
+        pending = group
+        attempt = 0
+        while pending:
+            try:
+                if outcome is not _NOT_RUN:
+                    results, outcome = outcome, _NOT_RUN
+                    if isinstance(results, Exception):
+                        raise results
+                else:
+                    results = task([item for _, item in pending]) if batched else task(pending[0][1])
+                results = results if batched else [results]
+                if len(results) != len(pending):
+                    raise ValueError(f"Task returned {len(results)} results for {len(pending)} items.")
+            except Exception as e:
+                if len(pending) > 1 and not is_transient(e):
+                    # One bad item should not fail the batch: run the items one at a time instead
+                    for pair in pending:
+                        self._run_group([pair], task, batched, checkpoint, error_log)
+                    return
+                results = [e] * len(pending)
+
+            retry = []
+            for (item_id, item), result in zip(pending, results):
+                if not isinstance(result, Exception):
+                    self._complete(checkpoint, item_id, result)
+                elif is_transient(result) and attempt < self.retries:
+                    retry.append((item_id, item))
+                else:
+                    self._fail(error_log, item_id, result, attempt + 1)
+            checkpoint.flush()
+
+            pending = retry
+            if pending:
+                self.sleep(self._delay(attempt))
+                attempt += 1
+
+    def _groups(self, items, size, item_id):
+        """Yield lists of up to size (item id, item) pairs of the items no earlier run completed."""
+        group = []
+        for item in items:
+            key = item_id(item)
+            if key in self.completed:
+                self._summary.skipped.append(key)
+                continue
+            group.append((key, item))
+            if len(group) >= size:
+                yield group
+                group = []
+        if group:
+            yield group
+
+    def run(self, items, task, batch_size=None, item_id=str, pool=None):
+        """
+        Run a task over the items that no earlier run completed.
+
+        With a multiprocessing pool, the items (or batches) are run in its workers and checkpointed in
+        the order they finish; retries and the items of a failed batch go to the pool one at a time.
+
+        Args:
+            items (iterable): Items to process, e.g. image paths.
+            task (callable): Takes one item, or a list of items if batch_size is set, and returns a
+                JSON-serializable result (a list of results for a batch, where an Exception instance in
+                place of a result marks that item as failed). Raised exceptions fail the item or batch.
+            batch_size (int, optional): Pass items to the task in lists of this size. Defaults to None.
+            item_id (callable, optional): Maps an item to the id stored in the checkpoint. Defaults to str.
+            pool (multiprocessing.pool.Pool, optional): Pool to run the task in; the task must then be a
+                picklable module-level function. Defaults to None (run in this process).
+
+        Returns:
+            JobSummary: Ids completed in this run, skipped as already completed, and failed.
+        """
+
+        self._summary = JobSummary([], [], [])
+        batched = batch_size is not None
+        with open(self.checkpoint_path, 'a', encoding='utf-8') as checkpoint, \
+                open(self.error_log_path, 'a', encoding='utf-8') as error_log:
+            groups = self._groups(items, batch_size or 1, item_id)
+            if pool is None:
+                for group in groups:
+                    self._run_group(group, task, batched, checkpoint, error_log)
+            else:
+                groups = list(groups)
+                arguments = [[item for _, item in group] if batched else group[0][1] for group in groups]
+                in_pool = functools.partial(_call_in_pool, pool, task)
+                for index, outcome in pool.imap_unordered(functools.partial(_call_task, task), enumerate(arguments)):
+                    self._run_group(groups[index], in_pool, batched, checkpoint, error_log, outcome=outcome)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+
+        summary = self._summary
+        print(f"Job finished: {len(summary.completed)} completed, {len(summary.skipped)} already done, "
+              f"{len(summary.failed)} failed (see {self.error_log_path})")
+        return summary
+
+
+# Example usage
+if __name__ == "__main__":
+    runner = JobRunner(name="example")
+    runner.run(range(10), lambda i: i * i if i != 7 else 1 / 0, item_id=str)
+    print(runner.failures()[-1]["error_type"])
@@ -1,9 +1,16 @@
-import feature_extraction
-import generate_features_csv
-import model_trainer
-import preprocess
-import recommendation
-import scrape_reddit
+import numpy as np
+import pandas as pd
+
+from . import cache
+from . import feature_extraction
+from . import generate_features_csv
+from . import indexer
+from . import jobs
+from . import metrics
+from . import model_trainer
+from . import pipeline
+from . import recommendation
+from . import scrape_reddit
 
 
 def main():
@@ -13,38 +20,51 @@ def main():
     model_path = "data/models/lawn_score_model.pkl"
     subreddit_name = "landscaping"
     num_lines = 10
+    detector_model_path = "yolov8n.onnx"
+    metrics_path = "data/metrics.prom"  # Written when LAWN_METRICS=1 is set
+    job_dir = "data/jobs"  # Checkpoint and error log of the feature extraction job
+
+    # Preprocessed images, detections and features of unchanged photos are reused from earlier runs
+    schema = feature_extraction.DEFAULT_SCHEMA
+    feature_cache = cache.FeatureCache(params=cache.pipeline_params(detector_model_path, schema))
 
     # Generate features CSV
-    generate_features_csv.generate_csv(image_folder, csv_path)
-
-    # Load and preprocess images
-    processed_images = preprocess.batch_process_images(image_folder)
-
-    # Extract features
-    features_data = []
-    for image_file, features in processed_images.items():
-        extracted_features = feature_extraction.extract_features(image_file, features)
-        features_data.append(extracted_features)
-
-    # Train the model
-    X, y = [], []
-    for data in features_data:
-        X.append(list(data.values()))
-        y.append(data['lawn_score'])
-    model = model_trainer.train_model(X, y)
-
-    # Make predictions and recommendations
-    for data in features_data:
-        predicted_score = model.predict([list(data.values())])[0]
-        recommendations = recommendation.recommend_services(predicted_score, data['detected_objects'])
-        print(f"Image: {image_file}, Predicted Score: {predicted_score:.2f}, Recommendations: {recommendations}")
+    generate_features_csv.generate_features_csv(image_folder, csv_path)
+
+    # Preprocess, detect and extract features as a resumable job: an interrupted run picks up where it
+    # stopped, and images that fail are written to the job's error log instead of stopping the run
+    runner = jobs.JobRunner(job_dir, "features")
+    image_paths = sorted(image_path for image_path, _, _ in indexer.scan_images(image_folder))
+    image_paths, X, detections = pipeline.run_feature_job(image_paths, runner, schema, detector_model_path,
+                                                          feature_cache)
+    feature_cache.flush()
+    runner.finish()  # The next nightly run starts over; unchanged images are served by the feature cache
+    if len(image_paths) == 0:
+        print(f"No images could be processed; see {runner.error_log_path}")
+        return
+
+    # Train the model on the lawn scores recorded in the features CSV
+    scores = pd.read_csv(csv_path).set_index("Image Path")["Initial Score"]
+    y = scores.reindex(image_paths).fillna(0).to_numpy(dtype=np.float32)
+    model, X_test, y_test = model_trainer.train_model(X, y, schema=schema)
+
+    # Make predictions and recommendations for the whole batch at once
+    with metrics.timer("predict"):
+        predicted_scores = model.predict(X)
+    batch_recommendations = recommendation.DEFAULT_RECOMMENDER.recommend_batch(predicted_scores, detections)
+    for image_path, predicted_score, recommendations in zip(image_paths, predicted_scores, batch_recommendations):
+        print(f"Image: {image_path}, Predicted Score: {predicted_score:.2f}, Recommendations: {recommendations}")
 
     # Scrape Reddit for additional tips
-    reddit_tips = scrape_reddit.scrape_reddit(subreddit_name, num_lines)
+    reddit_tips = scrape_reddit.scrape_reddit(subreddit_name, num_lines, cache=feature_cache)
     print("Reddit Tips:")
     for tip in reddit_tips:
         print(tip)
 
+    if metrics.METRICS.enabled:
+        metrics.METRICS.write(metrics_path)
+        print(f"Metrics written to {metrics_path}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,257 @@
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_ENV_VAR = "LAWN_METRICS"  # Set to 1 to record metrics without calling enable()
+PROFILE_ENV_VAR = "LAWN_PROFILE_EVERY"  # Set to N to also profile every Nth call of each timed stage
+METRIC_PREFIX = "lawn_"
+# Upper bounds in seconds of the stage duration histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count of observed values, as in a Prometheus histogram."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        cumulative, total = {}, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative["+Inf" if bound == float("inf") else repr(bound)] = total
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class Metrics:
+    """
+    Opt-in registry of counters, histograms and sampled cProfile stats for the pipeline stages.
+
+    While disabled every call returns after a single flag check, so the instrumented hot paths cost
+    nothing in normal runs. All updates take one lock, since the streaming stages run in threads.
+    Each worker process of a Pool records into its own registry; only the parent's is exported.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._profile_every = 0
+        self._profile_calls = {}
+        self._profiles = {}
+
+    def enable(self, profile_every=0):
+        """
+        Start recording.
+
+        Args:
+            profile_every (int, optional): Run every Nth call of each timed stage under cProfile, so the
+                profile shows where a slow stage spends its time without profiling every call. 0 disables
+                profiling. Defaults to 0.
+        """
+        self.enabled = True
+        self._profile_every = profile_every
+
+    def disable(self):
+        self.enabled = False
+        self._profile_every = 0
+
+    def reset(self):
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._profile_calls.clear()
+            self._profiles.clear()
+
+    def increment(self, name, value=1):
+        """Add value to a counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        """Record a value, e.g. a duration in seconds, in a histogram."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def _should_profile(self, name):
+        if not self._profile_every:
+            return False
+        with self._lock:
+            calls = self._profile_calls.get(name, 0)
+            self._profile_calls[name] = calls + 1
+        return calls % self._profile_every == 0
+
+    @contextmanager
+    def timer(self, name):
+        """Time a block as one call of a stage, recording <name>_seconds and <name>_calls_total."""
+        if not self.enabled:
+            yield
+            return
+
+        profiler = None
+        if self._should_profile(name):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                profiler = None  # Another profiler is already active in this thread
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                profiler.disable()
+                with self._lock:
+                    if name in self._profiles:
+                        self._profiles[name].add(profiler)
+                    else:
+                        self._profiles[name] = pstats.Stats(profiler)
+            self.observe(f"{name}_seconds", elapsed)
+            self.increment(f"{name}_calls_total")
+
+    def timed(self, name):
+        """Decorator that times every call of a function with timer(name)."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        """Return the counters and histograms recorded so far as a JSON-serializable dict."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self._histograms.items()},
+            }
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        """Render the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+        for name, value in sorted(snapshot["counters"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} counter")
+            lines.append(f"{METRIC_PREFIX}{name} {value}")
+        for name, histogram in sorted(snapshot["histograms"].items()):
+            lines.append(f"# TYPE {METRIC_PREFIX}{name} histogram")
+            for bound, count in histogram["buckets"].items():
+                lines.append(f'{METRIC_PREFIX}{name}_bucket{{le="{bound}"}} {count}')
+            lines.append(f"{METRIC_PREFIX}{name}_sum {histogram['sum']}")
+            lines.append(f"{METRIC_PREFIX}{name}_count {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+    def profile_report(self, sort_by="cumulative", limit=20):
+        """Return the sampled cProfile stats of every profiled stage as text."""
+        with self._lock:
+            profiles = dict(self._profiles)
+        report = io.StringIO()
+        for name, stats in sorted(profiles.items()):
+            report.write(f"=== {name} ===\n")
+            stats.stream = report
+            stats.sort_stats(sort_by).print_stats(limit)
+        return report.getvalue()
+
+    def write(self, path):
+        """
+        Write the metrics to a file: Prometheus text for .prom or .txt, JSON otherwise.
+
+        Sampled profiles, if any, are written next to it as <path>.profile.txt.
+        """
+        text = self.to_prometheus() if path.endswith(('.prom', '.txt')) else self.to_json()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+        report = self.profile_report()
+        if report:
+            with open(f"{path}.profile.txt", 'w', encoding='utf-8') as f:
+                f.write(report)
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        """
+        Serve the metrics over HTTP from a daemon thread: Prometheus text at /metrics, JSON at /metrics.json.
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it.
+        """
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+                elif self.path == "/metrics.json":
+                    body, content_type = registry.to_json(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+# Process-wide registry used by the instrumented modules
+METRICS = Metrics()
+if os.environ.get(METRICS_ENV_VAR, "") not in ("", "0"):
+    METRICS.enable(profile_every=int(os.environ.get(PROFILE_ENV_VAR, "0")))
+enable = METRICS.enable
+disable = METRICS.disable
+increment = METRICS.increment
+observe = METRICS.observe
+timer = METRICS.timer
+timed = METRICS.timed
+
+
+# Example usage
+if __name__ == "__main__":
+    enable(profile_every=10)
+    for _ in range(100):
+        with timer("example_stage"):
+            sum(range(10000))
+        increment("images_processed_total")
+    print(METRICS.to_prometheus())
+    print(METRICS.profile_report(limit=5))
@@ -1,32 +1,84 @@
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error
-import pickle
+import copy
 import time
 import os
 
+# scikit-learn and joblib are imported inside the training and evaluation functions, so importing this
+# module for its constants (e.g. the CLI's defaults, or scoring with an exported forest) does not load them
 
-def train_model(X, y, n_estimators=300, test_size=0.2):
-    """Train the RandomForest model and return it."""
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+MODEL_DIR = '../data/models'  # Directory timestamped models are saved to
+MODEL_PREFIX = 'lawn_score_model_'
 
-    model = RandomForestRegressor(n_estimators=n_estimators, random_state=42)
+
+def train_model(X, y, n_estimators=300, test_size=0.2, schema=None, model_dir=MODEL_DIR,
+                n_jobs=None, base_model=None, oob=False):
+    """Train the RandomForest model and return it.
+
+    If a FeatureSchema is given it is stored on the model as `feature_schema`, so prediction can
+    lay out its feature rows in the same column order the model was trained on. The model is saved
+    with joblib; forest_export makes a compact copy for shipping and scoring without scikit-learn.
+
+    n_jobs fits (and later predicts) trees in parallel; -1 uses every core. Passing a previously
+    trained forest as base_model warm-starts a copy of it: its trees are kept and n_estimators new
+    trees are grown on X, y (e.g. only the newly labelled photos), while base_model itself is left
+    unchanged. Without a schema the copy keeps the base model's feature_schema. With oob=True the model is fit on all of
+    the data and scored on its out-of-bag samples instead of a train_test_split holdout, and
+    X_test, y_test are returned as None. The two cannot be combined: sklearn derives every tree's
+    out-of-bag rows from its random state against X, so the base model's trees, which were fit on other
+    data, would be scored on rows picked as if they had been fit on X and the score would be meaningless.
+    """
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.model_selection import train_test_split
+
+    if schema is None and base_model is not None:
+        schema = getattr(base_model, "feature_schema", None)  # New trees use the base model's column layout
+    if schema is not None and len(X[0]) != len(schema):
+        raise ValueError(f"Training data has {len(X[0])} columns but the schema has {len(schema)}.")
+    if oob and base_model is not None:
+        raise ValueError("oob=True cannot be combined with base_model; evaluate a warm-started model on a holdout.")
+
+    if oob:
+        X_train, X_test, y_train, y_test = X, None, y, None
+    else:
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
+
+    if base_model is None:
+        model = RandomForestRegressor(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs, oob_score=oob)
+    else:
+        # Grow a copy of the existing forest instead of starting from nothing; the caller's model keeps
+        # its trees and parameters
+        model = copy.deepcopy(base_model)
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_estimators,
+                         n_jobs=n_jobs, oob_score=oob)
     model.fit(X_train, y_train)
+    model.feature_schema = schema
+
+    if oob:
+        print(f"Out-of-bag R^2: {model.oob_score_}")
 
     # Save the trained model with a timestamp
     timestamp = time.strftime("%Y%m%d-%H%M%S")
-    model_path = f'../data/models/lawn_score_model_{timestamp}.pkl'
-    os.makedirs(os.path.dirname(model_path), exist_ok=True)
-
-    with open(model_path, 'wb') as file:
-        pickle.dump(model, file)
+    model_path = os.path.join(model_dir, f'{MODEL_PREFIX}{timestamp}.pkl')
+    os.makedirs(model_dir, exist_ok=True)
+    joblib.dump(model, model_path)
 
     print(f"Model saved to {model_path}")
     return model, X_test, y_test
 
 
+def evaluate_oob(model, y_train):
+    """Evaluate a model trained with oob=True on its out-of-bag predictions."""
+    from sklearn.metrics import mean_squared_error
+
+    mse = mean_squared_error(y_train, model.oob_prediction_)
+    print(f"Out-of-bag Mean Squared Error: {mse}")
+    return mse
+
+
 def evaluate_model(model, X_test, y_test):
     """Evaluate the model on the test set."""
+    from sklearn.metrics import mean_squared_error
+
     y_pred = model.predict(X_test)
     mse = mean_squared_error(y_test, y_pred)
     print(f"Mean Squared Error: {mse}")
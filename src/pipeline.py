@@ -0,0 +1,496 @@
+import os
+import queue
+import threading
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from . import feature_extraction
+from . import metrics
+from . import preprocess
+from . import recommendation
+from .arena import Arena
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+DECODED_QUEUE_SIZE = 2  # Full-size decoded images waiting for feature extraction
+_DONE = object()  # Sentinel marking the end of a bounded stage
+PUT_TIMEOUT = 0.1  # Seconds a bounded producer waits for room before checking whether the consumer left
+
+
+def bounded(iterable, maxsize=64):
+    """
+    Runs an iterable in a background thread and yields its items through a bounded queue.
+
+    The producer blocks once maxsize items are waiting, so a fast stage can never run ahead of a slow
+    one by more than maxsize items and memory stays flat however long the stream is. If the consumer
+    stops early (break, an exception or closing the generator), the producer stops too and closes the
+    upstream generator, so neither the thread nor the upstream stages are left blocked.
+
+    Args:
+        iterable (iterable): The upstream stage.
+        maxsize (int, optional): Maximum number of items buffered between the stages. Defaults to 64.
+
+    Yields:
+        The items of the iterable, in order. Exceptions raised upstream are re-raised here.
+    """
+
+    buffer = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def put(item):
+        """Wait for room in the buffer; return False if the consumer went away first."""
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(e)
+        finally:
+            if stop.is_set() and hasattr(iterable, "close"):
+                iterable.close()  # Runs the upstream stages' cleanup, e.g. releasing their own threads
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def batched(iterable, batch_size):
+    """Group an iterable into lists of at most batch_size items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_image_paths(image_dir):
+    """Yield the paths of the images in a directory without listing the whole directory first."""
+    with os.scandir(image_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                yield entry.path
+
+
+def preprocess_stage(image_paths, arena):
+    """
+    Decode every image once and preprocess it into a slot of the arena.
+
+    Yields (image_path, decoded_image, slot) for every image that could be loaded. The slot holds the
+    preprocessed RGB uint8 image and is released by the detection stage.
+    """
+    for image_path in image_paths:
+        try:
+            decoded = preprocess.load_image(image_path)
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            metrics.increment("image_failures_total")
+            continue
+        slot = arena.acquire()
+        try:
+            preprocess.preprocess_array(decoded, out=arena[slot])
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            metrics.increment("image_failures_total")
+            arena.release(slot)
+            continue
+        yield image_path, decoded, slot
+
+
+def extract_stage(items, arena, schema=feature_extraction.DEFAULT_SCHEMA):
+    """
+    Extract texture features from the already decoded images and drop the full-size decode.
+
+    Yields (image_path, slot, feature_row); object columns are filled in once detection has run. The
+    slot of an image whose features cannot be extracted is released here, since no later stage sees it.
+    """
+    for image_path, decoded, slot in items:
+        row = feature_extraction.extract_feature_row(image_path, [], schema, image=decoded)
+        if row is None:
+            arena.release(slot)
+            continue
+        yield image_path, slot, row
+
+
+def detect_stage(items, arena, detector=None, batch_size=16, schema=feature_extraction.DEFAULT_SCHEMA):
+    """
+    Run detection on batches of preprocessed arena slots and release the slots afterwards.
+
+    Yields (image_path, detected_objects, feature_row) with the object columns of the row filled in.
+    """
+    for batch in batched(items, batch_size):
+        detections = [[] for _ in batch]
+        if detector is not None:
+            try:
+                detections = detector.detect([arena[slot] for _, slot, _ in batch])
+            except Exception as e:
+                print(f"Error in object detection: {e}")
+        for (image_path, slot, row), detected_objects in zip(batch, detections):
+            arena.release(slot)
+            feature_extraction.fill_object_features(row, detected_objects, schema)
+            yield image_path, detected_objects, row
+
+
+def predict_stage(items, model, batch_size=64):
+    """Score feature rows in batches and yield (image_path, detected_objects, predicted_score)."""
+    for batch in batched(items, batch_size):
+        with metrics.timer("predict"):
+            scores = model.predict(np.stack([row for _, _, row in batch]))
+        for (image_path, detected_objects, _), score in zip(batch, scores):
+            yield image_path, detected_objects, float(score)
+
+
+def recommend_stage(items, score_thresholds=None):
+    """Yield (image_file, predicted_score, recommendations) for every scored image."""
+    for image_path, detected_objects, score in items:
+        recommendations = recommendation.recommend_services(score, detected_objects, score_thresholds)
+        metrics.increment("images_processed_total")
+        yield os.path.basename(image_path), score, recommendations
+
+
+def stream_recommendations(image_dir, model, detector=None, schema=None, batch_size=16, queue_size=64):
+    """
+    Streams recommendations for the images in a directory through chained generator stages.
+
+    Loading, feature extraction and detection each run in their own thread behind a bounded queue, so
+    only about queue_size items per stage are held in memory and the first recommendations are yielded
+    before the whole directory has been read. Each image is decoded once: the decode is shared by
+    preprocessing and feature extraction, and preprocessed images live in a preallocated uint8 arena
+    whose slots are passed between stages instead of copies.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        model: Trained model with a predict method taking a feature matrix.
+        detector (preprocess.ObjectDetector, optional): Detector to run on each batch. None skips detection.
+        schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to the model's
+            feature_schema, or DEFAULT_SCHEMA if the model has none.
+        batch_size (int, optional): Number of images per detection and prediction batch. Defaults to 16.
+        queue_size (int, optional): Maximum number of items buffered between stages. Defaults to 64.
+
+    Yields:
+        tuple: (image_file, predicted_score, recommendations) per image.
+    """
+
+    if schema is None:
+        schema = getattr(model, "feature_schema", None) or feature_extraction.DEFAULT_SCHEMA
+
+    # Enough slots for a full queue plus a detection batch; preprocessing waits for a free slot beyond that
+    width, height = preprocess.PREPROCESS_SIZE
+    arena = Arena(queue_size + batch_size + 2, (height, width, 3), np.uint8)
+
+    # Full-size decodes are large, so only a couple wait for feature extraction at a time
+    stream = bounded(preprocess_stage(iter_image_paths(image_dir), arena), DECODED_QUEUE_SIZE)
+    stream = bounded(extract_stage(stream, arena, schema), queue_size)
+    stream = bounded(detect_stage(stream, arena, detector, batch_size, schema), queue_size)
+    stream = predict_stage(stream, model, batch_size)
+    return recommend_stage(stream)
+
+
+# Per-process state of process_images_shared workers: shared arenas, detector, cache and schema
+_shared_state = {}
+
+
+def _init_shared_worker(image_paths, features_name, images_name, schema, model_path, cache):
+    """Attach a worker to the shared feature and image arenas and load its detector once."""
+    cv2.setNumThreads(1)
+    width, height = preprocess.PREPROCESS_SIZE
+    _shared_state.update(
+        image_paths=image_paths,
+        features=Arena.attach(features_name, len(image_paths), (len(schema),), np.float32),
+        images=Arena.attach(images_name, len(image_paths), (height, width, 3), np.uint8) if images_name else None,
+        schema=schema,
+        detector=preprocess.load_detector(model_path),
+        cache=cache,
+    )
+
+
+def _process_shared_chunk(indices):
+    """
+    Decode, preprocess, extract and detect a chunk of images, writing into the shared arenas.
+
+    Returns (index, detected_objects, valid) per image; the feature rows and preprocessed images
+    themselves are written straight into shared memory and never pickled back to the parent.
+    """
+    state = _shared_state
+    features, images, schema, cache = state["features"], state["images"], state["schema"], state["cache"]
+    results = {}
+    pending, pending_images = [], []
+
+    for index in indices:
+        image_path = state["image_paths"][index]
+        key = None
+        if cache is not None:
+            try:
+                key = cache.key(image_path)
+            except OSError as e:
+                print(f"Error processing image {image_path}: {e}")
+                results[index] = ([], False)
+                continue
+            cached_row, cached_detections = cache.load(key, "features"), cache.load(key, "detections")
+            if cached_row is not None and cached_detections is not None and cached_row.shape == (len(schema),):
+                features[index][:] = cached_row
+                results[index] = ([int(class_id) for class_id in cached_detections], True)
+                continue
+
+        # Decode once; both preprocessing and texture extraction read this buffer
+        try:
+            decoded = preprocess.load_image(image_path)
+            img = preprocess.preprocess_array(decoded, out=images[index] if images is not None else None)
+        except Exception as e:
+            print(f"Error processing image {image_path}: {e}")
+            results[index] = ([], False)
+            continue
+        if feature_extraction.extract_feature_row(image_path, [], schema, out=features[index], image=decoded) is None:
+            features.buffer[index] = 0
+            results[index] = ([], False)
+            continue
+        pending.append((index, key))
+        pending_images.append(img)
+
+    detections = [[] for _ in pending]
+    if state["detector"] is not None and pending:
+        try:
+            detections = state["detector"].detect(pending_images)
+        except Exception as e:
+            print(f"Error in object detection: {e}")
+
+    for (index, key), detected_objects in zip(pending, detections):
+        feature_extraction.fill_object_features(features[index], detected_objects, schema)
+        results[index] = (detected_objects, True)
+        if cache is not None:
+            cache.save(key, "features", features[index])
+            cache.save(key, "detections", np.asarray(detected_objects, dtype=np.int64))
+
+    return [(index, results[index][0], results[index][1]) for index in indices]
+
+
+def _process_shared_worker_chunk(indices):
+    """Run _process_shared_chunk in a pool worker and also return the file digests its cache computed."""
+    cache = _shared_state["cache"]
+    return _process_shared_chunk(indices), cache.hash_updates() if cache is not None else {}
+
+
+def process_images_shared(image_paths, schema=feature_extraction.DEFAULT_SCHEMA, model_path="yolov8n.onnx",
+                          workers=None, chunksize=16, cache=None, keep_images=False):
+    """
+    Preprocesses, detects and extracts features for a batch of images, decoding each image only once.
+
+    Feature rows (and optionally the preprocessed images) are written by the workers straight into
+    multiprocessing.shared_memory arenas, so results reach the parent without being pickled or copied.
+
+    Args:
+        image_paths (list): Paths to the image files.
+        schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to DEFAULT_SCHEMA.
+        model_path (str, optional): Path to the object detection model, or None to skip detection.
+        workers (int, optional): Number of worker processes. None or 1 runs in this process, 0 uses one
+            worker per CPU core. Defaults to None.
+        chunksize (int, optional): Images per task; each chunk also runs through the detector as one batch.
+        cache (cache.FeatureCache, optional): Cache of feature rows and detections. Defaults to None.
+        keep_images (bool, optional): Also return the preprocessed RGB uint8 images. Defaults to False.
+
+    Returns:
+        tuple: (features, valid, detections, images) where features is a float32 (n_images, n_features)
+        matrix, valid a boolean mask of the images that were processed, detections one list of detected
+        objects per image, and images an (n_images, height, width, 3) uint8 array or None.
+    """
+
+    width, height = preprocess.PREPROCESS_SIZE
+    n_images = len(image_paths)
+    shared = workers is not None and workers != 1
+    features = Arena(n_images, (len(schema),), np.float32, shared=shared)
+    images = Arena(n_images, (height, width, 3), np.uint8, shared=shared) if keep_images else None
+    features.buffer[:] = 0
+
+    indices = list(range(n_images))
+    chunks = [indices[i:i + chunksize] for i in range(0, n_images, chunksize)]
+    detections = [[] for _ in image_paths]
+    valid = np.zeros(n_images, dtype=bool)
+    initargs = (image_paths, features.name, images.name if images is not None else None, schema, model_path, cache)
+
+    try:
+        if not shared:
+            # Run in this process on process-local arenas
+            _shared_state.update(image_paths=image_paths, features=features, images=images, schema=schema,
+                                 detector=preprocess.load_detector(model_path), cache=cache)
+            results = (result for chunk in chunks for result in _process_shared_chunk(chunk))
+            for index, detected_objects, ok in results:
+                detections[index], valid[index] = detected_objects, ok
+            return features.buffer, valid, detections, images.buffer if images is not None else None
+
+        with Pool(processes=workers or os.cpu_count(), initializer=_init_shared_worker, initargs=initargs) as pool:
+            for results, hash_updates in pool.imap_unordered(_process_shared_worker_chunk, chunks):
+                if cache is not None:
+                    cache.merge_hash_index(hash_updates)
+                for index, detected_objects, ok in results:
+                    detections[index], valid[index] = detected_objects, ok
+
+        # One copy out of shared memory before it is unlinked
+        return (np.array(features.buffer), valid, detections,
+                np.array(images.buffer) if images is not None else None)
+
+    finally:
+        _shared_state.clear()
+        if shared:
+            features.close()
+            if images is not None:
+                images.close()
+
+
+def process_image_batch(image_paths, schema=feature_extraction.DEFAULT_SCHEMA, detector=None, cache=None):
+    """
+    Extracts the feature row and detections of each image in a batch, reporting errors per image.
+
+    Unlike the other stages, a failing image does not just print and drop out: its slot in the result
+    holds the exception, so a jobs.JobRunner can log it, retry it if it is transient, and carry on with
+    the rest of the batch. An error in the detector is raised for the whole batch.
+
+    Args:
+        image_paths (list): Paths to the image files.
+        schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to DEFAULT_SCHEMA.
+        detector (preprocess.ObjectDetector, optional): Detector run on the batch. None skips detection.
+        cache (cache.FeatureCache, optional): Cache of feature rows and detections. Defaults to None.
+
+    Returns:
+        list: One {"features": list, "detections": list} dict or Exception per image, in order.
+    """
+
+    results = [None] * len(image_paths)
+    pending, keys, rows, images = [], [], [], []
+    for i, image_path in enumerate(image_paths):
+        try:
+            key = cache.key(image_path) if cache is not None else None
+            if key is not None:
+                cached_row, cached_detections = cache.load(key, "features"), cache.load(key, "detections")
+                if cached_row is not None and cached_detections is not None and cached_row.shape == (len(schema),):
+                    results[i] = {"features": cached_row.tolist(),
+                                  "detections": [int(class_id) for class_id in cached_detections]}
+                    continue
+
+            decoded = preprocess.load_image(image_path)
+            row = feature_extraction.extract_feature_row(image_path, [], schema, image=decoded)
+            if row is None:
+                raise ValueError(f"Features could not be extracted from image {image_path}.")
+            pending.append(i)
+            keys.append(key)
+            rows.append(row)
+            images.append(preprocess.preprocess_array(decoded))
+        except Exception as e:
+            results[i] = e
+
+    detections = detector.detect(images) if detector is not None and images else [[] for _ in images]
+    for i, key, row, detected_objects in zip(pending, keys, rows, detections):
+        feature_extraction.fill_object_features(row, detected_objects, schema)
+        detected_objects = [int(obj) if isinstance(obj, (int, np.integer)) else obj for obj in detected_objects]
+        results[i] = {"features": row.tolist(), "detections": detected_objects}
+        if key is not None:
+            cache.save(key, "features", row)
+            cache.save(key, "detections", np.asarray(detected_objects, dtype=np.int64))
+    return results
+
+
+# Per-process state of run_feature_job workers: schema, detector and cache
+_job_state = {}
+
+
+def _init_job_worker(schema, model_path, cache):
+    """Build a feature job worker's state once: single-threaded OpenCV and a loaded detector."""
+    cv2.setNumThreads(1)
+    _job_state.update(schema=schema, detector=preprocess.load_detector(model_path), cache=cache)
+
+
+def _process_job_batch(image_paths):
+    """Run process_image_batch with the worker's detector. Runs inside a pool worker."""
+    return process_image_batch(image_paths, _job_state["schema"], _job_state["detector"], _job_state["cache"])
+
+
+def _job_item_id(image_path, cache=None):
+    """
+    Return the checkpoint id of an image: its path and its cache key (content digest), or its size and
+    modification time without a cache, so an image replaced after an interrupted run is processed again.
+    """
+    try:
+        if cache is not None:
+            return f"{image_path}:{cache.key(image_path)}"
+        stat = os.stat(image_path)
+        return f"{image_path}:{stat.st_size}:{stat.st_mtime_ns}"
+    except OSError:
+        return image_path  # Missing or unreadable; the task reports the error
+
+
+def run_feature_job(image_paths, runner, schema=feature_extraction.DEFAULT_SCHEMA, model_path=None, cache=None,
+                    batch_size=16, workers=None):
+    """
+    Extracts features for a list of images as a resumable job.
+
+    Images completed by an earlier, interrupted run of the same job are taken from its checkpoint, unless
+    their contents changed since, and images that fail are logged to the job's error log instead of
+    stopping the run. With workers, the batches are decoded, detected and extracted in a process pool
+    and checkpointed as they finish.
+
+    Args:
+        image_paths (list): Paths to the image files.
+        runner (jobs.JobRunner): Runner holding the job's checkpoint and error log.
+        schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to DEFAULT_SCHEMA.
+        model_path (str, optional): Path to the object detection model, or None to skip detection.
+        cache (cache.FeatureCache, optional): Cache of feature rows and detections. Defaults to None.
+        batch_size (int, optional): Images per detection batch. Defaults to 16.
+        workers (int, optional): Number of worker processes. None or 1 runs in this process, 0 uses one
+            worker per CPU core. Defaults to None.
+
+    Returns:
+        tuple: (image_paths, features, detections) for the images that completed, in the given order, with
+        features a float32 (n_completed, n_features) matrix.
+    """
+
+    # Computed before the pool starts, so the workers' copies of the cache already know every digest
+    item_ids = {image_path: _job_item_id(image_path, cache) for image_path in image_paths}
+    if workers is None or workers == 1:
+        detector = preprocess.load_detector(model_path)
+        runner.run(image_paths, lambda batch: process_image_batch(batch, schema, detector, cache),
+                   batch_size=batch_size, item_id=item_ids.__getitem__)
+    else:
+        with Pool(processes=workers or os.cpu_count(), initializer=_init_job_worker,
+                  initargs=(schema, model_path, cache)) as pool:
+            runner.run(image_paths, _process_job_batch, batch_size=batch_size, item_id=item_ids.__getitem__,
+                       pool=pool)
+
+    done = [image_path for image_path in image_paths if item_ids[image_path] in runner.completed]
+    features = schema.new_matrix(len(done))
+    for row, image_path in zip(features, done):
+        row[:] = runner.completed[item_ids[image_path]]["features"]
+    return done, features, [runner.completed[item_ids[image_path]]["detections"] for image_path in done]
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    import joblib
+
+    image_dir, model_path = sys.argv[1], sys.argv[2]
+    model = joblib.load(model_path)  # Saved by model_trainer.train_model
+
+    for image_file, score, recommendations in stream_recommendations(image_dir, model):
+        print(f"Image: {image_file}, Predicted Score: {score:.2f}, Recommendations: {recommendations}")
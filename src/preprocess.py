@@ -1,44 +1,202 @@
 import cv2
 import numpy as np
 import os
+from multiprocessing import Pool
 
-def preprocess_image(image_path):
+from . import metrics
+
+PREPROCESS_SIZE = (256, 256)  # Width and height every image is resized to
+
+# Per-process OpenCV state, built once by _init_worker in every pool worker
+_worker_state = {}
+
+@metrics.timed("decode_image")
+def load_image(image_path):
     """
-    Preprocesses an image by resizing, converting color space, normalizing, and (optionally) detecting objects.
+    Decodes an image file once into a BGR uint8 array that every stage can share.
 
     Args:
         image_path (str): Path to the image file.
 
     Returns:
-        numpy.ndarray: Preprocessed image as a NumPy array (RGB, normalized between 0-1).
+        numpy.ndarray: Decoded BGR image.
 
     Raises:
         ValueError: If the image cannot be loaded.
     """
 
-    try:
-        # Load the image
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Image at {image_path} cannot be loaded.")
+    img = cv2.imread(image_path)
+    if img is None:
+        raise ValueError(f"Image at {image_path} cannot be loaded.")
+    return img
+
+
+@metrics.timed("preprocess_image")
+def preprocess_array(img, out=None):
+    """
+    Resizes a decoded BGR image to PREPROCESS_SIZE and converts it to RGB, keeping it uint8.
+
+    Keeping uint8 (a quarter of the float32 size) lets the preprocessed image be written straight into a
+    preallocated or shared buffer; the detector scales uint8 input to 0-1 itself.
+
+    Args:
+        img (numpy.ndarray): Decoded BGR uint8 image, e.g. from load_image.
+        out (numpy.ndarray, optional): Preallocated (height, width, 3) uint8 buffer to write into.
+
+    Returns:
+        numpy.ndarray: Preprocessed RGB uint8 image (out, if it was given).
+    """
+
+    # Resize the image while maintaining aspect ratio
+    # Consider using content-aware resize for better preservation of details
+    resized = cv2.resize(img, PREPROCESS_SIZE, interpolation=cv2.INTER_AREA)
+
+    # Convert color space (adjust based on your model's requirement)
+    if out is None:
+        return cv2.cvtColor(resized, cv2.COLOR_BGR2RGB)
+    cv2.cvtColor(resized, cv2.COLOR_BGR2RGB, dst=out)
+    return out
+
+
+def preprocess_image(image_path, normalize=True):
+    """
+    Preprocesses an image by resizing, converting color space, normalizing, and (optionally) detecting objects.
 
-        # Resize the image while maintaining aspect ratio
-        # Consider using content-aware resize for better preservation of details
-        img = cv2.resize(img, (256, 256), interpolation=cv2.INTER_AREA)
+    Args:
+        image_path (str): Path to the image file.
+        normalize (bool, optional): Scale to float32 in [0, 1]. False returns the RGB uint8 image of
+            preprocess_array, a quarter of the size. Defaults to True.
 
-        # Convert color space (adjust based on your model's requirement)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    Returns:
+        numpy.ndarray: Preprocessed image as a NumPy array (RGB, normalized between 0-1 unless normalize is False).
+
+    Raises:
+        ValueError: If the image cannot be loaded.
+    """
+
+    try:
+        # Load the image and resize it to RGB
+        img = preprocess_array(load_image(image_path))
 
         # Normalize pixel values to the range [0, 1]
-        img = img.astype(np.float32) / 255.0
+        if normalize:
+            img = img.astype(np.float32) / 255.0
 
         return img
 
     except Exception as e:
         print(f"Error processing image {image_path}: {e}")
+        metrics.increment("image_failures_total")
         return None
 
 
+class ObjectDetector:
+    """
+    Holds a YOLO ONNX network loaded once and runs batched inference on lists of images.
+
+    The network is expected to produce YOLOv8-style output of shape (batch, 4 + n_classes, n_anchors):
+    a (cx, cy, w, h) box followed by one score per class for every anchor.
+    """
+
+    def __init__(self, model_path="yolov8n.onnx", conf_threshold=0.5, nms_threshold=0.45, input_size=640):
+        """
+        Args:
+            model_path (str, optional): Path to the pre-trained object detection model. None disables detection.
+            conf_threshold (float, optional): Minimum class score for a detection to be kept. Defaults to 0.5.
+            nms_threshold (float, optional): IoU above which overlapping boxes of a class are suppressed. Defaults to 0.45.
+            input_size (int, optional): Side of the square network input. Defaults to 640.
+        """
+        self.model_path = model_path
+        self.conf_threshold = conf_threshold
+        self.nms_threshold = nms_threshold
+        self.input_size = input_size
+        self.net = cv2.dnn.readNet(model_path) if model_path is not None else None
+
+    def detect(self, images, return_boxes=False):
+        """
+        Detects objects in a batch of images with a single forward pass.
+
+        Args:
+            images (list): Preprocessed images (RGB, float 0-1 or uint8 0-255), all with the same dtype.
+            return_boxes (bool, optional): Return boxes and scores as well as class IDs. Defaults to False.
+
+        Returns:
+            list: One list of detected object class IDs per image, or one dict with "class_ids", "scores"
+            and "boxes" (x, y, w, h in network input pixels) per image if return_boxes is True.
+        """
+
+        if self.net is None or len(images) == 0:
+            empty = {"class_ids": [], "scores": np.empty(0, np.float32), "boxes": np.empty((0, 4), np.float32)}
+            return [dict(empty) if return_boxes else [] for _ in images]
+
+        # Preprocessed images are already RGB, so only the 0-255 range of uint8 input needs scaling
+        scale = 1.0 if np.issubdtype(images[0].dtype, np.floating) else 1 / 255
+        with metrics.timer("detect_objects"):
+            blob = cv2.dnn.blobFromImages(images, scale, (self.input_size, self.input_size), swapRB=False, crop=False)
+            self.net.setInput(blob)
+            outputs = self.net.forward()
+            decoded = self.decode(outputs)
+        metrics.increment("detect_images_total", len(images))
+        metrics.increment("detections_total", sum(len(detections["class_ids"]) for detections in decoded))
+        if return_boxes:
+            return decoded
+        return [detections["class_ids"] for detections in decoded]
+
+    def decode(self, outputs):
+        """
+        Decodes raw network output for a whole batch with vectorized confidence filtering and per-image NMS.
+
+        Args:
+            outputs (numpy.ndarray): Network output of shape (batch, 4 + n_classes, n_anchors).
+
+        Returns:
+            list: One dict with "class_ids", "scores" and "boxes" per image.
+        """
+
+        predictions = np.transpose(outputs, (0, 2, 1))  # (batch, n_anchors, 4 + n_classes)
+        class_scores = predictions[:, :, 4:]
+        class_ids = class_scores.argmax(axis=2)
+        scores = np.take_along_axis(class_scores, class_ids[:, :, None], axis=2)[:, :, 0]
+
+        # Convert centre-based boxes to top-left based boxes for NMS
+        boxes = predictions[:, :, :4].copy()
+        boxes[:, :, :2] -= boxes[:, :, 2:] / 2
+
+        keep_mask = scores > self.conf_threshold
+        results = []
+        for image_index in range(predictions.shape[0]):
+            keep = np.flatnonzero(keep_mask[image_index])
+            image_boxes = boxes[image_index, keep]
+            image_scores = scores[image_index, keep]
+            image_class_ids = class_ids[image_index, keep]
+
+            if len(keep) > 0:
+                nms_keep = np.asarray(cv2.dnn.NMSBoxesBatched(
+                    image_boxes.tolist(), image_scores.tolist(), image_class_ids.tolist(),
+                    self.conf_threshold, self.nms_threshold), dtype=np.intp).reshape(-1)
+                image_boxes = image_boxes[nms_keep]
+                image_scores = image_scores[nms_keep]
+                image_class_ids = image_class_ids[nms_keep]
+
+            results.append({
+                "class_ids": [int(class_id) for class_id in image_class_ids],
+                "scores": image_scores.astype(np.float32),
+                "boxes": image_boxes.astype(np.float32),
+            })
+        return results
+
+
+# Detectors loaded in this process, keyed by model path
+_detectors = {}
+
+
+def get_detector(model_path="yolov8n.onnx"):
+    """Return the ObjectDetector for a model path, loading the network only the first time it is requested."""
+    if model_path not in _detectors:
+        _detectors[model_path] = ObjectDetector(model_path)
+    return _detectors[model_path]
+
+
 def detect_objects(img, model_path="yolov8n.onnx"):
     """
     Detects objects in the image using a pre-trained YOLO model (optional).
@@ -49,27 +207,12 @@ def detect_objects(img, model_path="yolov8n.onnx"):
 
     Returns:
         list: List of detected object class IDs (if object detection is enabled) or an empty list otherwise.
-
-    Raises:
-        Exception: If an error occurs during object detection.
     """
 
     # Check if object detection is enabled and a model path is provided
     if model_path is not None:
         try:
-            model = cv2.dnn.readNet(model_path)
-            blob = cv2.dnn.blobFromImage(img, 1 / 255, (640, 640), swapRB=True, crop=False)
-            model.setInput(blob)
-            detections = model.forward()
-
-            features = []
-            for detection in detections[0]:
-                confidence = float(detection[5])
-                if confidence > 0.5:  # Adjust confidence threshold as needed
-                    class_id = int(detection[6])
-                    features.append(class_id)  # Store class ID for further use
-
-            return features
+            return get_detector(model_path).detect([img])[0]
 
         except Exception as e:
             print(f"Error in object detection: {e}")
@@ -79,25 +222,119 @@ def detect_objects(img, model_path="yolov8n.onnx"):
     return []
 
 
-def batch_process_images(image_dir, model_path="yolov8n.onnx"):
+def _process_image_chunk(image_paths, detector, cache=None):
+    """Preprocess a chunk of images and run detection on all of them as one batch, skipping cached images."""
+    results = {}
+    image_files, images, keys = [], [], []
+    for image_path in image_paths:
+        image_file = os.path.basename(image_path)
+        key = None
+        if cache is not None:
+            try:
+                key = cache.key(image_path)
+            except OSError as e:
+                print(f"Error processing image {image_path}: {e}")
+                continue
+            cached = cache.load(key, "detections")
+            if cached is not None:
+                results[image_file] = [int(class_id) for class_id in cached]
+                continue
+
+        # Images preprocessed earlier (e.g. while they were downloaded) are not decoded again. The cache
+        # holds uint8 images; the detector scales them itself
+        img = cache.load(key, "preprocessed") if cache is not None else None
+        if img is None:
+            img = preprocess_image(image_path, normalize=False)
+            if img is not None and cache is not None:
+                cache.save(key, "preprocessed", img)
+        if img is not None:
+            image_files.append(image_file)
+            images.append(np.asarray(img))
+            keys.append(key)
+
+    detections = [[] for _ in images]
+    if detector is not None and images:
+        try:
+            detections = detector.detect(images)
+        except Exception as e:
+            print(f"Error in object detection: {e}")
+
+    for image_file, key, detected_objects in zip(image_files, keys, detections):
+        results[image_file] = detected_objects
+        if cache is not None:
+            cache.save(key, "detections", np.asarray(detected_objects, dtype=np.int64))
+
+    # Keep the chunk's directory order
+    return [(os.path.basename(p), results[os.path.basename(p)]) for p in image_paths if os.path.basename(p) in results]
+
+
+def _init_worker(model_path, cache=None):
+    """Build the OpenCV state of a pool worker once: single-threaded OpenCV and a loaded detector."""
+    # Each worker owns one core, so OpenCV's own thread pool would only oversubscribe the machine
+    cv2.setNumThreads(1)
+    _worker_state["detector"] = load_detector(model_path)
+    _worker_state["cache"] = cache
+
+
+def load_detector(model_path):
+    """Load a detector, or return None if detection is disabled or the model cannot be loaded."""
+    if model_path is None:
+        return None
+    try:
+        return get_detector(model_path)
+    except Exception as e:
+        print(f"Error loading object detection model {model_path}: {e}")
+        return None
+
+
+def _process_worker_chunk(image_paths):
+    """
+    Process one chunk of images with the worker's detector. Runs inside a pool worker.
+
+    Returns the chunk's results and the file digests the worker's cache computed, which only the parent
+    can write back to the cache's hash index.
+    """
+    cache = _worker_state.get("cache")
+    results = _process_image_chunk(image_paths, _worker_state.get("detector"), cache)
+    return results, cache.hash_updates() if cache is not None else {}
+
+
+def batch_process_images(image_dir, model_path="yolov8n.onnx", workers=None, chunksize=16, ordered=True, cache=None):
     """
     Batch processes all images in a directory, performs preprocessing, and optionally detects objects.
 
     Args:
         image_dir (str): Path to the directory containing images.
         model_path (str, optional): Path to the pre-trained object detection model. Defaults to "yolov8n.onnx".
+        workers (int, optional): Number of worker processes. None or 1 processes images serially in this
+            process, 0 uses one worker per CPU core. Defaults to None.
+        chunksize (int, optional): Number of images handed to a worker at a time; each chunk also runs
+            through the detector as one batch. Defaults to 16.
+        ordered (bool, optional): Keep results in directory order. If False, results are collected as
+            workers finish them, which keeps all workers busy when image sizes vary. Defaults to True.
+        cache (cache.FeatureCache, optional): Cache of preprocessed images and detections. Images already in
+            the cache are not preprocessed or run through the detector again. Defaults to None.
 
     Returns:
         dict: A dictionary where keys are image filenames and values are lists of detected object class IDs (or empty lists if object detection is disabled).
     """
 
+    image_paths = [os.path.join(image_dir, image_file) for image_file in os.listdir(image_dir)]
+    chunks = [image_paths[i:i + chunksize] for i in range(0, len(image_paths), chunksize)]
+
     processed_images = {}
-    for image_file in os.listdir(image_dir):
-        image_path = os.path.join(image_dir, image_file)
-        img = preprocess_image(image_path)
-        if img is not None:
-            features = detect_objects(img, model_path)
-            processed_images[image_file] = features
+    if workers is None or workers == 1:
+        detector = load_detector(model_path)
+        for chunk in chunks:
+            processed_images.update(_process_image_chunk(chunk, detector, cache))
+        return processed_images
+
+    with Pool(processes=workers or os.cpu_count(), initializer=_init_worker, initargs=(model_path, cache)) as pool:
+        imap = pool.imap if ordered else pool.imap_unordered
+        for results, hash_updates in imap(_process_worker_chunk, chunks):
+            processed_images.update(results)
+            if cache is not None:
+                cache.merge_hash_index(hash_updates)
     return processed_images
 
 
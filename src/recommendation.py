@@ -1,44 +1,153 @@
+import json
 import logging
 
-def recommend_services(lawn_score, features, score_thresholds=None):
-    """Generate recommendations based on lawn score and detected features."""
+import numpy as np
 
-    # Default score thresholds
-    if score_thresholds is None:
-        score_thresholds = {
-            'low': 50,
-            'medium': 75
-        }
+from . import metrics
 
-    recommendations = []
+# Default score thresholds
+DEFAULT_SCORE_THRESHOLDS = {
+    'low': 50,
+    'medium': 75
+}
 
-    # Score-based recommendations
-    if lawn_score < score_thresholds['low']:
-        recommendations.extend(["Fertilization", "Weed Control & Mulching"])
-    elif lawn_score < score_thresholds['medium']:
-        recommendations.extend(["Overseeding", "Tree & Shrub Care"])
-    else:
-        recommendations.extend(["Lawn Maintenance Tips", "Custom Landscape Design"])
+# Score-based recommendations, from the lowest score tier to the highest
+DEFAULT_TIER_RECOMMENDATIONS = {
+    'low': ["Fertilization", "Weed Control & Mulching"],
+    'medium': ["Overseeding", "Tree & Shrub Care"],
+    'high': ["Lawn Maintenance Tips", "Custom Landscape Design"],
+}
 
-    # Feature-based recommendations
-    feature_recommendations = {
-        "bare_patch": ["Grading & Overseeding", "Landscape Construction"],
-        "large_object": ["Rock Installations", "Custom Landscape Design"],
-        # Dynamically add more mappings
-        "weed_growth": ["Weed Control"],
-        "poor_drainage": ["Drainage Solutions", "Lawn Grading"],
-        # Extend with more features as necessary
-    }
+# Feature-based recommendations
+DEFAULT_FEATURE_RECOMMENDATIONS = {
+    "bare_patch": ["Grading & Overseeding", "Landscape Construction"],
+    "large_object": ["Rock Installations", "Custom Landscape Design"],
+    # Dynamically add more mappings
+    "weed_growth": ["Weed Control"],
+    "poor_drainage": ["Drainage Solutions", "Lawn Grading"],
+    # Extend with more features as necessary
+}
 
-    for feature in features:
-        if feature in feature_recommendations:
-            recommendations.extend(feature_recommendations[feature])
+MAX_PRECOMPUTED_FEATURES = 10  # Precompute every feature combination up to 2^10 masks per tier
 
-    # Remove duplicates and log recommendations
-    unique_recommendations = list(set(recommendations))
-    logging.info(f"Generated recommendations: {unique_recommendations}")
 
-    return unique_recommendations
+class Recommender:
+    """
+    Compiled tier and feature rules that turn lawn scores and detected features into recommendations.
+
+    The rules are built once. Every known feature gets a bit, and the ordered, de-duplicated
+    recommendation list of each (tier, feature bitmask) pair is precomputed, so a recommendation is
+    a threshold lookup, a mask and a table lookup. Lists keep rule order: the tier's services first,
+    then those of each detected feature in the order the features were configured.
+    """
+
+    def __init__(self, score_thresholds=None, tier_recommendations=None, feature_recommendations=None):
+        score_thresholds = DEFAULT_SCORE_THRESHOLDS if score_thresholds is None else score_thresholds
+        tier_recommendations = DEFAULT_TIER_RECOMMENDATIONS if tier_recommendations is None else tier_recommendations
+        feature_recommendations = (DEFAULT_FEATURE_RECOMMENDATIONS if feature_recommendations is None
+                                   else feature_recommendations)
+
+        self.thresholds = np.array([score_thresholds['low'], score_thresholds['medium']], dtype=np.float64)
+        self.tier_recommendations = [list(tier_recommendations[tier]) for tier in ('low', 'medium', 'high')]
+        self.feature_recommendations = {feature: list(services) for feature, services in feature_recommendations.items()}
+        self.feature_bits = {feature: 1 << bit for bit, feature in enumerate(self.feature_recommendations)}
+
+        self._table = {}
+        if len(self.feature_bits) <= MAX_PRECOMPUTED_FEATURES:
+            for tier in range(len(self.tier_recommendations)):
+                for mask in range(1 << len(self.feature_bits)):
+                    self._lookup(tier, mask)
+
+    @classmethod
+    def from_config(cls, config_path):
+        """
+        Build a recommender from a JSON config file.
+
+        The file may contain "score_thresholds", "tier_recommendations" and "feature_recommendations"
+        objects; any that are missing fall back to the defaults.
+        """
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('score_thresholds'), config.get('tier_recommendations'),
+                   config.get('feature_recommendations'))
+
+    def _lookup(self, tier, mask):
+        """Return the ordered recommendation list of a tier and feature mask, building it on first use."""
+        key = (tier, mask)
+        recommendations = self._table.get(key)
+        if recommendations is None:
+            services = list(self.tier_recommendations[tier])
+            for feature, bit in self.feature_bits.items():
+                if mask & bit:
+                    services.extend(self.feature_recommendations[feature])
+            # Remove duplicates while keeping the first occurrence of each service
+            recommendations = tuple(dict.fromkeys(services))
+            self._table[key] = recommendations
+        return recommendations
+
+    def feature_mask(self, features):
+        """
+        Return the bitmask of the known features in a list; unknown features are ignored. Features may be
+        names or detector class IDs, which are mapped to names with feature_extraction.object_name.
+        """
+        mask = 0
+        for feature in features:
+            if isinstance(feature, (int, np.integer)):
+                # Loads OpenCV, but class IDs only come from the detector, which has loaded it already
+                from .feature_extraction import object_name
+
+                feature = object_name(feature)
+            mask |= self.feature_bits.get(feature, 0)
+        return mask
+
+    def tier(self, lawn_score):
+        """Return the score tier index: 0 below 'low', 1 below 'medium', 2 otherwise."""
+        return int(np.searchsorted(self.thresholds, lawn_score, side='right'))
+
+    def recommend(self, lawn_score, features):
+        """Generate recommendations for one lawn score and its detected features."""
+        return list(self._lookup(self.tier(lawn_score), self.feature_mask(features)))
+
+    @metrics.timed("recommend_batch")
+    def recommend_batch(self, scores, feature_lists):
+        """
+        Generate recommendations for a whole batch of lawn scores.
+
+        Args:
+            scores (numpy.ndarray): Lawn scores, one per property.
+            feature_lists (list): Detected features for each property, in the same order as scores.
+
+        Returns:
+            list: One ordered recommendation list per property.
+        """
+        tiers = np.searchsorted(self.thresholds, np.asarray(scores, dtype=np.float64), side='right')
+        return [list(self._lookup(tier, self.feature_mask(features)))
+                for tier, features in zip(tiers.tolist(), feature_lists)]
+
+
+DEFAULT_RECOMMENDER = Recommender()
+_threshold_recommenders = {}  # Recommenders compiled for custom score thresholds, keyed by (low, medium)
+
+
+@metrics.timed("recommend_services")
+def recommend_services(lawn_score, features, score_thresholds=None, recommender=None, regions=None):
+    """Generate recommendations based on lawn score, detected features and localized problem regions."""
+
+    if recommender is None:
+        if score_thresholds is None:
+            recommender = DEFAULT_RECOMMENDER
+        else:
+            key = (score_thresholds['low'], score_thresholds['medium'])
+            if key not in _threshold_recommenders:
+                _threshold_recommenders[key] = Recommender(score_thresholds)
+            recommender = _threshold_recommenders[key]
+
+    if regions:
+        features = list(features) + [region.label for region in regions]
+    recommendations = recommender.recommend(lawn_score, features)
+    logging.info(f"Generated recommendations: {recommendations}")
+
+    return recommendations
 
 
 # Example usage
@@ -46,4 +155,4 @@ if __name__ == "__main__":
     lawn_score = 60
     detected_features = ["bare_patch", "large_object"]
     recommendations = recommend_services(lawn_score, detected_features)
-    print(f"Recommendations: {recommendations}")
\ No newline at end of file
+    print(f"Recommendations: {recommendations}")
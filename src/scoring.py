@@ -0,0 +1,119 @@
+import glob
+import os
+import sys
+
+import joblib
+import numpy as np
+
+from . import forest_export
+from . import metrics
+from . import model_trainer
+from . import pipeline
+from . import preprocess
+
+
+class ModelRegistry:
+    """
+    Finds the latest persisted lawn score model and loads it once for scoring without training.
+
+    Models are loaded with joblib. Its mmap_mode only maps plain NumPy arrays of the pickle: sklearn
+    copies the node arrays of the forest's trees when it unpickles them, so every process that scores
+    holds its own copy of the forest. With compact=True the registry loads forests exported by
+    forest_export instead, which are a fraction of the size, predict with NumPy alone and never import
+    scikit-learn; prefer them when many processes score.
+    """
+
+    def __init__(self, model_dir=model_trainer.MODEL_DIR, mmap_mode='r', compact=False):
+        """
+        Args:
+            model_dir (str, optional): Directory the timestamped models are saved in. Defaults to MODEL_DIR.
+            mmap_mode (str, optional): joblib memory-map mode for the plain arrays of the pickle, or None
+                to load them fully into memory. Defaults to 'r'.
+            compact (bool, optional): Load lawn_score_model_*.npz exports instead of the pickles. Defaults to False.
+        """
+        self.model_dir = model_dir
+        self.mmap_mode = mmap_mode
+        self.suffix = forest_export.COMPACT_SUFFIX if compact else ".pkl"
+        self.model_path = None
+        self._model = None
+
+    def latest_model_path(self):
+        """Return the path of the most recent lawn_score_model_* model, or None if there is none."""
+        pattern = os.path.join(self.model_dir, f"{model_trainer.MODEL_PREFIX}*{self.suffix}")
+        model_paths = glob.glob(pattern)
+        # The timestamp in the name sorts chronologically
+        return max(model_paths) if model_paths else None
+
+    def get(self):
+        """Return the latest model, loading it on first use only."""
+        if self._model is None:
+            self.refresh()
+        return self._model
+
+    def refresh(self):
+        """Load the latest model if it differs from the one already loaded. Returns True if a model was loaded."""
+        model_path = self.latest_model_path()
+        if model_path is None:
+            raise FileNotFoundError(f"No {model_trainer.MODEL_PREFIX}*{self.suffix} model found in {self.model_dir}.")
+        if model_path == self.model_path and self._model is not None:
+            return False
+
+        if self.suffix == forest_export.COMPACT_SUFFIX:
+            self._model = forest_export.load_compact(model_path)
+        else:
+            self._model = joblib.load(model_path, mmap_mode=self.mmap_mode)
+        self.model_path = model_path
+        print(f"Model loaded from {model_path}")
+        return True
+
+    def score(self, X, batch_size=1024):
+        """
+        Score a feature matrix with the loaded model in batches.
+
+        Args:
+            X (numpy.ndarray): Feature matrix of shape (n_images, n_features).
+            batch_size (int, optional): Number of rows passed to predict at a time. Defaults to 1024.
+
+        Returns:
+            numpy.ndarray: Predicted lawn scores, one per row.
+        """
+        model = self.get()
+        X = np.asarray(X, dtype=np.float32)
+        schema = getattr(model, "feature_schema", None)
+        if schema is not None and X.shape[1] != len(schema):
+            raise ValueError(f"Feature matrix has {X.shape[1]} columns but the model expects {len(schema)}.")
+
+        scores = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], batch_size):
+            with metrics.timer("predict"):
+                scores[start:start + batch_size] = model.predict(X[start:start + batch_size])
+        metrics.increment("images_scored_total", X.shape[0])
+        return scores
+
+
+def score_images(image_dir, registry=None, detector_model_path="yolov8n.onnx"):
+    """
+    Scores the images in a directory with the latest persisted model and prints recommendations.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        registry (ModelRegistry, optional): Registry to take the model from. Defaults to a new ModelRegistry.
+        detector_model_path (str, optional): Path to the object detection model, or None to skip detection.
+
+    Returns:
+        list: (image_file, predicted_score, recommendations) per image.
+    """
+
+    registry = ModelRegistry() if registry is None else registry
+    model = registry.get()
+    detector = preprocess.load_detector(detector_model_path)
+
+    results = []
+    for image_file, score, recommendations in pipeline.stream_recommendations(image_dir, model, detector):
+        print(f"Image: {image_file}, Predicted Score: {score:.2f}, Recommendations: {recommendations}")
+        results.append((image_file, score, recommendations))
+    return results
+
+
+if __name__ == "__main__":
+    score_images(sys.argv[1] if len(sys.argv) > 1 else "data/images")
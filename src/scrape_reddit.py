@@ -1,72 +1,176 @@
 import praw
 import os
 import csv
+import hashlib
+import io
 import json
-import requests
 import time
+from functools import partial
 from datetime import datetime, timedelta
+import numpy as np
 from PIL import Image  # Import the Pillow library
 
+from .downloader import ImageDownloader
+from .storage import TIPS_SCHEMA, ColumnarWriter, new_part_path
+from .vocabulary import Vocabulary, tokenize
+from .vocabulary import sentiment_score as vocabulary_sentiment_score
+
 FILLER_WORDS_FILE = 'filler_words.txt'
 LANDSCAPING_TERMS_FILE = 'landscaping_terms.txt'
+CHECKPOINT_FILE = 'scrape_checkpoint.json'
+TIPS_PARQUET_DIR = 'reddit_tips'  # Parquet dataset directory; every run adds one part file
+TIPS_CSV_FILE = 'features.csv'
+TIPS_JSON_FILE = 'reddit_tips.json'
+TIPS_CSV_HEADER = ["Title", "Body", "Image Filename", "Relevant Words", "Sentiment Score"]
+WINDOW_DAYS = 15  # Width of the time windows posts are grouped into
 
-# Initialize global word lists
-filler_words = []
-landscaping_terms = []
-
-def load_word_list(file_path):
-    """Load words from a specified text file into a list."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return [line.strip().lower() for line in f.readlines()]
-    except Exception as e:
-        print(f"Error loading word list from {file_path}: {e}")
-        return []
-
-def save_word_list(word_list, file_path):
-    """Save the word list back to the specified text file."""
-    try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            for word in word_list:
-                f.write(f"{word}\n")
-    except Exception as e:
-        print(f"Error saving word list to {file_path}: {e}")
-
-def update_word_lists(relevant_words, body_words):
-    """Update the global word lists based on relevant words from the current entry."""
-    global filler_words, landscaping_terms
-    filler_words = list(set(filler_words) - set(relevant_words))
-    landscaping_terms = list(set(landscaping_terms) | set(body_words))
+VOCABULARY_CHECKPOINT_EVERY = 500  # Posts between word list saves
 
 def filter_words(body, filler_words, landscaping_terms):
-    """Filter the body text to extract relevant words."""
-    words = body.lower().split()
-    relevant_words = [word for word in words if word in landscaping_terms and word not in filler_words]
-    return relevant_words
+    """Filter the body text to extract relevant words. Pass sets for constant-time membership tests."""
+    return [word for word in tokenize(body) if word in landscaping_terms and word not in filler_words]
 
 def sentiment_score(body):
     """Dummy sentiment analysis function (replace with a real model as needed)."""
-    positive_words = ['good', 'great', 'excellent', 'love', 'happy', 'fantastic', 'enjoy']
-    negative_words = ['bad', 'terrible', 'hate', 'sad', 'angry', 'awful']
-
-    score = 0
-    words = body.lower().split()
-    for word in words:
-        if word in positive_words:
-            score += 1
-        elif word in negative_words:
-            score -= 1
-
-    return score
-
-def scrape_reddit(subreddit_name='landscaping', num_lines=10, output_format='print'):
-    """Scrape a specific number of lines from Reddit posts in the given subreddit."""
-    global filler_words, landscaping_terms  # Declare global variables
+    return vocabulary_sentiment_score(tokenize(body))
 
+def _load_checkpoints(file_path):
+    """Load the scrape checkpoints of every subreddit, or an empty dict if there are none."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            checkpoints = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f"Error loading checkpoint from {file_path}: {e}")
+        return {}
+    # Only per-subreddit entries count; a checkpoint file from before they were keyed means a full scrape
+    return {name: checkpoint for name, checkpoint in checkpoints.items() if isinstance(checkpoint, dict)}
+
+def load_checkpoint(file_path, subreddit_name):
+    """Load a subreddit's scrape checkpoint (last seen submission id and timestamp), or an empty dict if there is none."""
+    return _load_checkpoints(file_path).get(subreddit_name.lower(), {})
+
+def save_checkpoint(file_path, subreddit_name, checkpoint):
+    """
+    Save a subreddit's scrape checkpoint, keeping those of the other subreddits. The file is replaced
+    atomically, so an interrupted write never leaves a corrupt file.
+    """
+    checkpoints = _load_checkpoints(file_path)
+    checkpoints[subreddit_name.lower()] = checkpoint  # Subreddit names are case-insensitive
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoints, f)
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        print(f"Error saving checkpoint to {file_path}: {e}")
+
+def bucket_submissions(submissions, start_ts, window_seconds, checkpoint=None):
+    """
+    Route a newest-first submission listing into time windows in a single pass.
+
+    Yields (window index, submission) with window 0 starting at start_ts. The pass stops at the first
+    submission older than start_ts, or at the submission recorded in the checkpoint, since everything
+    after it in the listing was scraped by a previous run.
+    """
+    checkpoint = checkpoint or {}
+    last_id = checkpoint.get("last_id")
+    last_created_utc = checkpoint.get("last_created_utc")
+
+    for submission in submissions:
+        if submission.id == last_id:
+            return
+        if last_created_utc is not None and submission.created_utc < last_created_utc:
+            return
+        if submission.created_utc < start_ts:
+            return
+        yield int((submission.created_utc - start_ts) // window_seconds), submission
+
+def append_tips_csv(file_path, tips):
+    """Append tips to a CSV file, writing the header only when the file is new."""
+    write_header = not os.path.exists(file_path) or os.path.getsize(file_path) == 0
+    with open(file_path, mode='a', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        if write_header:
+            writer.writerow(TIPS_CSV_HEADER)  # Write header
+        for title, body, image_filename, relevant_words, score in tips:
+            writer.writerow([title, body, image_filename, ', '.join(relevant_words), score])  # Write all info
+
+def append_tips_json(file_path, tips):
+    """Add tips to the JSON list in a file, merging with the tips of earlier runs and replacing the file atomically."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as file:
+            tips_json = json.load(file)
+    except FileNotFoundError:
+        tips_json = []
+
+    # Create a list of dictionaries for JSON output
+    tips_json.extend({"title": title, "body": body, "image_filename": image_filename,
+                      "relevant_words": relevant_words, "sentiment_score": score} for
+                     title, body, image_filename, relevant_words, score in tips)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, mode='w', encoding='utf-8') as file:
+        json.dump(tips_json, file, indent=4)
+    os.replace(tmp_path, file_path)
+
+def save_halved_image(buffer, out_path, cache=None):
+    """
+    Decode a downloaded image from memory, halve its dimensions and write it to disk once.
+
+    JPEGs are decoded in draft mode, which lets the decoder scale the image down while decoding
+    instead of producing the full-size image first.
+
+    Args:
+        buffer (io.BytesIO): Downloaded image bytes.
+        out_path (str): Path to write the resized image to.
+        cache (cache.FeatureCache, optional): If given, the 256x256 uint8 array preprocess_array would produce is
+            stored in it as well, so the later preprocessing pass can skip this image.
+    """
+    with Image.open(buffer) as img:
+        image_format = img.format or 'JPEG'
+        new_size = (max(1, img.width // 2), max(1, img.height // 2))  # Halve the dimensions
+        img.draft(img.mode, new_size)  # Reduced-scale JPEG decoding; a no-op for other formats
+        if img.size != new_size:
+            img = img.resize(new_size, Image.LANCZOS)  # Resize with high-quality resampling
+        else:
+            img.load()
+
+        # Encode in memory so the file is written in a single pass and its digest is known
+        encoded = io.BytesIO()
+        img.save(encoded, format=image_format)
+        data = encoded.getvalue()
+        with open(out_path, 'wb') as f:
+            f.write(data)
+
+        if cache is not None:
+            import cv2  # Loads OpenCV, so only when caching
+            from .preprocess import preprocess_array
+
+            # Decode the bytes just written with OpenCV and preprocess them the way the preprocessing pass
+            # would, so the cached pixels are exactly the ones it would compute from the file
+            decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            cache.save(cache.key_for_digest(hashlib.sha256(data).hexdigest()), "preprocessed", preprocess_array(decoded))
+
+def scrape_reddit(subreddit_name='landscaping', num_lines=10, output_format='print', download_concurrency=16,
+                  cache=None):
+    """Scrape a specific number of lines from Reddit posts in the given subreddit.
+
+    If a FeatureCache is given, each downloaded image's preprocessed array is cached as it is saved.
+    Only posts newer than the subreddit's checkpoint from its last run are fetched, so every output
+    accumulates across runs: 'csv' appends to TIPS_CSV_FILE, 'json' merges into TIPS_JSON_FILE, and
+    'parquet' writes the run's tips in record batches to a new part file of the TIPS_PARQUET_DIR dataset
+    (read it back with storage.read_columns). The checkpoint only advances once the output has been written; 'print' does
+    not advance it.
+
+    Returns a list of (title, body, image_filename, relevant_words, sentiment_score) tuples, which is
+    empty if scraping failed or the tips were written to Parquet.
+    """
+    tips = []
+    tips_writer = None
     try:
         # Load dynamic word lists
-        filler_words = load_word_list(FILLER_WORDS_FILE)
-        landscaping_terms = load_word_list(LANDSCAPING_TERMS_FILE)
+        vocabulary = Vocabulary.load(FILLER_WORDS_FILE, LANDSCAPING_TERMS_FILE)
 
         # Reddit API credentials
         reddit = praw.Reddit(
@@ -79,7 +183,6 @@ def scrape_reddit(subreddit_name='landscaping', num_lines=10, output_format='pri
 
         subreddit = reddit.subreddit(subreddit_name)
 
-        tips = []
         today = datetime.now()
         year_ago = today - timedelta(days=365)  # Date one year ago
         image_dir = 'data/images'  # Directory to save images
@@ -87,85 +190,97 @@ def scrape_reddit(subreddit_name='landscaping', num_lines=10, output_format='pri
         # Create the directory if it doesn't exist
         os.makedirs(image_dir, exist_ok=True)
 
-        # Fetch new posts from the subreddit
-        for days_back in range(0, 366, 15):  # 15-day increments
-            target_date = year_ago + timedelta(days=days_back)
-            print(f"Scraping posts from: {target_date.strftime('%Y-%m-%d')}")
-
-            # Get new submissions
-            for submission in subreddit.new(limit=None):
-                if submission.created_utc < target_date.timestamp():
-                    continue  # Skip submissions older than the target date
-                if submission.created_utc >= (target_date + timedelta(days=15)).timestamp():
-                    break  # Stop processing when we exceed the 15-day window
-
-                if submission.stickied:
-                    continue  # Skip stickied posts
-
-                title = submission.title  # Get the submission title
-                body = submission.selftext  # Get the submission body
-                image_filename = None  # Initialize image filename
-
-                # Check if the post has a valid URL and is an image link
-                if submission.url and ('jpg' in submission.url or 'jpeg' in submission.url or 'png' in submission.url):
-                    url = submission.url
-                    image_filename = url.split("/")[-1]  # Get the last part of the URL
-
-                    if not image_filename.endswith(('.jpg', '.jpeg', '.png')):
-                        image_filename += ".jpg"  # Default to .jpg if no extension
-
-                    # Download the image to the specified directory
-                    image_path = os.path.join(image_dir, image_filename)
-                    r = requests.get(url)
-
-                    # Ensure the request was successful before saving
-                    if r.status_code == 200:
-                        with open(image_path, "wb") as f:
-                            f.write(r.content)
-
-                        # Resize the image to half its original dimensions
-                        with Image.open(image_path) as img:
-                            new_size = (img.width // 2, img.height // 2)  # Halve the dimensions
-                            img = img.resize(new_size, Image.ANTIALIAS)  # Resize with high-quality resampling
-                            img.save(image_path)  # Save the resized image
-
-                    else:
-                        print(f"Failed to download image from {url}, status code: {r.status_code}")
-
-                # Calculate relevant words and sentiment score
-                relevant_words = filter_words(body, filler_words, landscaping_terms)
-                score = sentiment_score(body)
-
-                # Update dynamic word lists based on current entry
-                update_word_lists(relevant_words, set(body.lower().split()))
-
-                tips.append((title, body, image_filename, relevant_words, score))  # Append relevant info
-
-        # Save tips to the specified output format
-        if output_format == 'csv':
-            with open('features.csv', mode='w', newline='', encoding='utf-8') as file:
-                writer = csv.writer(file)
-                writer.writerow(["Title", "Body", "Image Filename", "Relevant Words", "Sentiment Score"])  # Write header
-                for title, body, image_filename, relevant_words, score in tips:
-                    writer.writerow([title, body, image_filename, ', '.join(relevant_words), score])  # Write all info
+        # Images download concurrently over a pooled session and are resized in memory before being written
+        downloader = ImageDownloader(image_dir, concurrency=download_concurrency,
+                                     transform=partial(save_halved_image, cache=cache))
+
+        # Fetch new posts from the subreddit in a single pass, routing each one into its 15-day window.
+        # Posts already scraped by a previous run end the pass early.
+        checkpoint = load_checkpoint(CHECKPOINT_FILE, subreddit_name)
+        buckets = {}
+        newest = None
+        if output_format == 'parquet':
+            tips_writer = ColumnarWriter(new_part_path(TIPS_PARQUET_DIR), TIPS_SCHEMA)
+        scraped = 0
+        for bucket, submission in bucket_submissions(subreddit.new(limit=None), year_ago.timestamp(),
+                                                     WINDOW_DAYS * 86400, checkpoint):
+            if newest is None or submission.created_utc > newest.created_utc:
+                newest = submission
+            if bucket not in buckets:
+                window_start = year_ago + timedelta(days=bucket * WINDOW_DAYS)
+                print(f"Scraping posts from: {window_start.strftime('%Y-%m-%d')}")
+                buckets[bucket] = []
+
+            if submission.stickied:
+                continue  # Skip stickied posts
+
+            title = submission.title  # Get the submission title
+            body = submission.selftext  # Get the submission body
+            image_filename = None  # Initialize image filename
+
+            # Check if the post has a valid URL and is an image link
+            if submission.url and ('jpg' in submission.url or 'jpeg' in submission.url or 'png' in submission.url):
+                url = submission.url
+                image_filename = url.split("/")[-1]  # Get the last part of the URL
+
+                if not image_filename.endswith(('.jpg', '.jpeg', '.png')):
+                    image_filename += ".jpg"  # Default to .jpg if no extension
+
+                # Queue the download; it runs on the downloader's pooled connections while the loop continues
+                downloader.submit(url, image_filename)
+
+            # Calculate relevant words and sentiment score, and update the dynamic word lists
+            relevant_words, score = vocabulary.process(body)
+
+            if tips_writer is not None:
+                # Columnar output is appended as it is produced instead of being held in memory
+                tips_writer.write({"submission_id": submission.id, "created_utc": submission.created_utc,
+                                   "title": title, "body": body, "image_filename": image_filename,
+                                   "relevant_words": relevant_words, "sentiment_score": score})
+            else:
+                buckets[bucket].append((title, body, image_filename, relevant_words, score))  # Append relevant info
+            scraped += 1
+
+            # Save the word lists at checkpoints rather than after every post
+            if scraped % VOCABULARY_CHECKPOINT_EVERY == 0:
+                vocabulary.save(FILLER_WORDS_FILE, LANDSCAPING_TERMS_FILE)
+
+        # Oldest window first, as the windows were scraped before
+        tips = [tip for bucket in sorted(buckets) for tip in buckets[bucket]]
+
+        # Wait for the remaining downloads before writing the results
+        downloader.close()
+
+        # Save tips to the specified output format, adding to what earlier runs saved
+        if tips_writer is not None:
+            if scraped:
+                tips_writer.close()
+                print(f"Saved {tips_writer.rows_written} tips to {tips_writer.path}")
+            else:
+                tips_writer.abort()  # No new posts; don't add an empty part file
+        elif output_format == 'csv':
+            append_tips_csv(TIPS_CSV_FILE, tips)
         elif output_format == 'json':
-            # Create a list of dictionaries for JSON output
-            tips_json = [{"title": title, "body": body, "image_filename": image_filename,
-                           "relevant_words": relevant_words, "sentiment_score": score} for
-                          title, body, image_filename, relevant_words, score in tips]
-            with open('reddit_tips.json', mode='w', encoding='utf-8') as file:
-                json.dump(tips_json, file, indent=4)
+            append_tips_json(TIPS_JSON_FILE, tips)
         else:
             for idx, (title, body, image_filename, relevant_words, score) in enumerate(tips):
                 print(f"Tip {idx + 1}: {title}\nBody: {body}\nImage: {image_filename}\n"
                       f"Relevant Words: {relevant_words}\nSentiment Score: {score}\n")
 
         # Update and save word lists to text files
-        save_word_list(filler_words, FILLER_WORDS_FILE)
-        save_word_list(landscaping_terms, LANDSCAPING_TERMS_FILE)
+        vocabulary.save(FILLER_WORDS_FILE, LANDSCAPING_TERMS_FILE)
+
+        # Remember the newest post so the next run only fetches posts after it. Printed tips are not
+        # stored anywhere, so a printing run leaves the checkpoint for the next run that saves them
+        if newest is not None and output_format in ('csv', 'json', 'parquet'):
+            save_checkpoint(CHECKPOINT_FILE, subreddit_name,
+                            {"last_id": newest.id, "last_created_utc": newest.created_utc})
 
     except Exception as e:
         print(f"An error occurred: {e}")
+        if tips_writer is not None:
+            tips_writer.abort()
+    return tips
 
 if __name__ == "__main__":
     scrape_reddit(subreddit_name='landscaping', num_lines=500, output_format='csv')  # Save to CSV
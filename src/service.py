@@ -0,0 +1,294 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from . import feature_extraction
+from . import metrics
+from . import preprocess
+from . import recommendation
+
+DEFAULT_MAX_BATCH_SIZE = 16  # Uploads scored together in one detector and predict call
+DEFAULT_MAX_WAIT = 0.02  # Seconds the first upload of a batch waits for more to arrive
+MAX_UPLOAD_BYTES = 32 * 1024 * 1024
+DEFAULT_READ_TIMEOUT = 30.0  # Seconds a client may take to send each header line or the request body
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into micro-batches and processes each batch once on an executor.
+
+    A batch is closed when it reaches max_batch_size items or max_wait seconds after its first item
+    arrived, whichever comes first, so a lone request waits at most max_wait while a burst of requests
+    shares one call to process_batch.
+    """
+
+    def __init__(self, process_batch, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait=DEFAULT_MAX_WAIT, executor=None):
+        """
+        Args:
+            process_batch (callable): Takes a list of items and returns one result per item, in order.
+            max_batch_size (int, optional): Largest batch. Defaults to DEFAULT_MAX_BATCH_SIZE.
+            max_wait (float, optional): Seconds to wait for a batch to fill. Defaults to DEFAULT_MAX_WAIT.
+            executor (concurrent.futures.Executor, optional): Where batches run, so they never block the
+                event loop. Defaults to a single worker thread, which stop() shuts down.
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._owns_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1)
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """Start collecting batches on the running event loop."""
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Stop collecting batches, shutting down the executor if the batcher created it."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._owns_executor:
+            self.executor.shutdown(wait=False)
+
+    async def submit(self, item):
+        """Queue one item and wait for its result; an exception raised for the batch is raised here."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _next_batch(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            items = [item for item, _ in batch]
+            metrics.increment("service_batches_total")
+            metrics.increment("service_batched_requests_total", len(batch))
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ScoringService:
+    """
+    Local asyncio HTTP service that scores uploaded lawn photos in micro-batches.
+
+    POST /score with the raw image bytes as the request body returns a JSON object with the predicted
+    score, the detected objects and the recommendations, plus the most similar past lawns if a
+    similarity index is given. GET /health returns {"status": "ok"}.
+    Uploads arriving together are decoded and their texture features extracted in parallel on a thread
+    pool (OpenCV and NumPy release the GIL for the heavy work), then run through the detector and scored
+    by the model as one batch. A client that stalls while sending its request gets a 408.
+    """
+
+    def __init__(self, model, detector=None, schema=None, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait=DEFAULT_MAX_WAIT, score_thresholds=None, similarity_index=None, n_similar=3,
+                 workers=None, read_timeout=DEFAULT_READ_TIMEOUT):
+        """
+        Args:
+            model: Trained model with a predict method taking a feature matrix.
+            detector (preprocess.ObjectDetector, optional): Detector run on each batch. None skips detection.
+            schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to the model's
+                feature_schema, or DEFAULT_SCHEMA if the model has none.
+            max_batch_size (int, optional): Largest micro-batch. Defaults to DEFAULT_MAX_BATCH_SIZE.
+            max_wait (float, optional): Seconds a batch waits to fill. Defaults to DEFAULT_MAX_WAIT.
+            score_thresholds (dict, optional): Score thresholds passed to recommend_services.
+            similarity_index (similarity.SimilarityIndex, optional): Index of past lawns; each result then
+                lists the n_similar most similar ones and what was done for them. Defaults to None.
+            n_similar (int, optional): Number of similar lawns per result. Defaults to 3.
+            workers (int, optional): Threads decoding and extracting features of a batch's uploads.
+                Defaults to one per CPU core.
+            read_timeout (float, optional): Seconds to wait for each header line and for the body before
+                answering 408. Defaults to DEFAULT_READ_TIMEOUT.
+        """
+        self.model = model
+        self.detector = detector
+        self.schema = schema or getattr(model, "feature_schema", None) or feature_extraction.DEFAULT_SCHEMA
+        self.score_thresholds = score_thresholds
+        self.similarity_index = similarity_index
+        self.n_similar = n_similar
+        self.read_timeout = read_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count())
+        self.batcher = MicroBatcher(self.score_batch, max_batch_size, max_wait)
+        self._server = None
+
+    def _decode_upload(self, data, row):
+        """Decode one upload and extract its texture features into row; returns (preprocessed image, error)."""
+        with metrics.timer("decode_image"):
+            decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if decoded is None:
+            metrics.increment("image_failures_total")
+            return None, "The upload is not a readable image."
+        if feature_extraction.extract_feature_row("upload", [], self.schema, out=row, image=decoded) is None:
+            return None, "Features could not be extracted from the upload."
+        return preprocess.preprocess_array(decoded), None
+
+    def score_batch(self, uploads):
+        """
+        Score a batch of uploaded image files with one detector pass and one predict call.
+
+        Args:
+            uploads (list): Encoded image bytes, one per request.
+
+        Returns:
+            list: One dict per upload with "score", "detections", "recommendations" and, with a similarity
+            index, "similar_lawns", or "error" if the upload could not be decoded.
+        """
+        results = [None] * len(uploads)
+        indices, images = [], []
+        features = self.schema.new_matrix(len(uploads))
+        # Each upload writes its own feature row, so the threads never touch the same memory
+        decoded = self.executor.map(self._decode_upload, uploads, features)
+        for i, (image, error) in enumerate(decoded):
+            if error is not None:
+                results[i] = {"error": error}
+                continue
+            indices.append(i)
+            images.append(image)
+
+        if not indices:
+            return results
+
+        detections = [[] for _ in indices]
+        if self.detector is not None:
+            try:
+                detections = self.detector.detect(images)
+            except Exception as e:
+                print(f"Error in object detection: {e}")
+        for i, detected_objects in zip(indices, detections):
+            feature_extraction.fill_object_features(features[i], detected_objects, self.schema)
+
+        with metrics.timer("predict"):
+            scores = self.model.predict(features[indices])
+        for i, detected_objects, score in zip(indices, detections, scores):
+            # Clients get object names; class IDs the detector has no name for are reported as they are
+            names = [feature_extraction.object_name(obj) or str(obj) for obj in detected_objects]
+            recommendations = recommendation.recommend_services(float(score), names, self.score_thresholds)
+            results[i] = {"score": float(score), "detections": names, "recommendations": recommendations}
+
+        if self.similarity_index is not None:
+            for i, similar in zip(indices, self.similarity_index.similar(features[indices], self.n_similar)):
+                results[i]["similar_lawns"] = similar
+        return results
+
+    async def start(self, host="127.0.0.1", port=8080):
+        """Start serving on host and port (0 picks a free port) and return the asyncio server."""
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server
+
+    async def stop(self):
+        """Stop accepting connections, stop the batcher and shut down the decoding threads."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.batcher.stop()
+        self.executor.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        try:
+            status, body = await self._respond(reader)
+        except asyncio.TimeoutError:
+            status, body = 408, {"error": f"The request was not received within {self.read_timeout} seconds."}
+        except Exception as e:
+            print(f"Error handling request: {e}")
+            status, body = 500, {"error": "Internal error."}
+        data = json.dumps(body).encode('utf-8')
+        writer.write(f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode('latin-1') + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _read(self, read):
+        """Await one read from the client, raising asyncio.TimeoutError if it stalls past read_timeout."""
+        return await asyncio.wait_for(read, self.read_timeout)
+
+    async def _respond(self, reader):
+        """Read one HTTP request and return (status, JSON body)."""
+        request_line = (await self._read(reader.readline())).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await self._read(reader.readline())
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if len(request_line) != 3:
+            return 400, {"error": "Malformed request."}
+
+        method, path = request_line[0], request_line[1].split("?", 1)[0]
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path != "/score":
+            return 404, {"error": f"No route for {path}."}
+        if method != "POST":
+            return 405, {"error": "Use POST to upload an image."}
+
+        try:
+            length = int(headers.get("content-length", ""))
+        except ValueError:
+            return 400, {"error": "A Content-Length header is required."}
+        if length < 0:
+            return 400, {"error": "Content-Length cannot be negative."}
+        if length > MAX_UPLOAD_BYTES:
+            return 413, {"error": f"Uploads are limited to {MAX_UPLOAD_BYTES} bytes."}
+
+        upload = await self._read(reader.readexactly(length))
+        metrics.increment("service_requests_total")
+        with metrics.timer("service_request"):
+            result = await self.batcher.submit(upload)
+        return (400 if "error" in result else 200), result
+
+
+async def serve(model, detector=None, host="127.0.0.1", port=8080, **kwargs):
+    """Run a ScoringService until the task is cancelled."""
+    service = ScoringService(model, detector, **kwargs)
+    server = await service.start(host, port)
+    print(f"Scoring service listening on {', '.join(str(s.getsockname()) for s in server.sockets)}")
+    try:
+        await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+# Example usage
+if __name__ == "__main__":
+    from . import scoring
+
+    registry = scoring.ModelRegistry()
+    asyncio.run(serve(registry.get(), preprocess.load_detector("yolov8n.onnx")))
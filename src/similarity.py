@@ -0,0 +1,265 @@
+import json
+import os
+
+import numpy as np
+
+from . import metrics
+from .storage import SIMILAR_ITEMS_SCHEMA, ColumnarWriter, read_columns
+
+VECTORS_FILE = "vectors.npy"
+CENTROIDS_FILE = "centroids.npy"
+ITEMS_FILE = "items.parquet"
+INDEX_FILE = "index.json"
+DEFAULT_BATCH_ROWS = 65536  # Database rows multiplied against the queries at a time
+DEFAULT_N_PROBE = 4  # Inverted lists scanned per query in IVF mode
+KMEANS_ITERATIONS = 10
+
+
+def _normalize(vectors):
+    """Scale rows to unit length so a dot product is their cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _spherical_kmeans(vectors, n_lists, iterations=KMEANS_ITERATIONS, seed=0, batch_rows=DEFAULT_BATCH_ROWS):
+    """Cluster unit vectors into n_lists groups by cosine similarity and return (centroids, assignments)."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].copy()
+    assignments = np.zeros(len(vectors), dtype=np.int64)
+    for _ in range(iterations):
+        for start in range(0, len(vectors), batch_rows):
+            assignments[start:start + batch_rows] = np.argmax(vectors[start:start + batch_rows] @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        filled = np.bincount(assignments, minlength=n_lists) > 0
+        centroids[filled] = _normalize(sums[filled])  # Empty lists keep their previous centroid
+    return centroids, assignments
+
+
+def _merge_top_k(best_scores, best_indices, scores, offset):
+    """Merge a block of similarities into the running top-k of each query, in place."""
+    k = best_scores.shape[1]
+    if scores.shape[1] > k:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    merged_scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+    merged_indices = np.concatenate([best_indices, candidates + offset], axis=1)
+    keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+    best_scores[:] = np.take_along_axis(merged_scores, keep, axis=1)
+    best_indices[:] = np.take_along_axis(merged_indices, keep, axis=1)
+
+
+class SimilarityIndex:
+    """
+    k-nearest-neighbour index over the feature vectors of past lawns, stored as memory-mapped float32.
+
+    Vectors are standardized with the statistics of the archive they were built from and normalized,
+    so neighbours are ranked by cosine similarity. Search is an exact scan of batched NumPy dot
+    products; an index built with n_lists > 0 also stores an inverted file (IVF): the vectors are
+    grouped by their nearest k-means centroid and laid out list by list, and a query only scans the
+    contiguous ranges of its n_probe nearest lists.
+    """
+
+    def __init__(self, index_dir, mmap_mode='r'):
+        """
+        Args:
+            index_dir (str): Directory written by SimilarityIndex.build.
+            mmap_mode (str, optional): Memory-map mode for the vectors, or None to load them into memory.
+        """
+        self.index_dir = index_dir
+        with open(os.path.join(index_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            info = json.load(f)
+        self.mean = np.asarray(info["mean"], dtype=np.float32)
+        self.std = np.asarray(info["std"], dtype=np.float32)
+        self.offsets = np.asarray(info["offsets"], dtype=np.int64)
+        self.vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode=mmap_mode)
+        self.centroids = np.load(os.path.join(index_dir, CENTROIDS_FILE)) if len(self.offsets) > 2 else None
+        self.items = read_columns(os.path.join(index_dir, ITEMS_FILE))
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def build(cls, index_dir, vectors, items, n_lists=0, seed=0):
+        """
+        Build an index and write it to a directory.
+
+        Args:
+            index_dir (str): Directory to write the index to.
+            vectors (numpy.ndarray): (n_items, n_features) feature matrix, e.g. from extract_feature_matrix.
+            items (list): One dict per row with "item_id", "source" (e.g. "photo" or "reddit"), "score" and
+                "notes" (what was done, e.g. the recommendations or the post title).
+            n_lists (int, optional): Number of IVF lists; 0 builds an exact-search index. Defaults to 0.
+            seed (int, optional): Seed of the k-means initialization. Defaults to 0.
+
+        Returns:
+            SimilarityIndex: The written index, opened from disk.
+        """
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) != len(items):
+            raise ValueError(f"Got {len(vectors)} vectors but {len(items)} items.")
+        os.makedirs(index_dir, exist_ok=True)
+
+        mean = vectors.mean(axis=0) if len(vectors) else np.zeros(vectors.shape[1], dtype=np.float32)
+        std = vectors.std(axis=0) if len(vectors) else np.ones(vectors.shape[1], dtype=np.float32)
+        std[std == 0] = 1
+        normalized = _normalize((vectors - mean) / std).astype(np.float32)
+
+        order = np.arange(len(vectors))
+        offsets = [0, len(vectors)]
+        n_lists = min(n_lists, len(vectors))
+        if n_lists > 1:
+            centroids, assignments = _spherical_kmeans(normalized, n_lists, seed=seed)
+            order = np.argsort(assignments, kind='stable')
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).tolist()
+            np.save(os.path.join(index_dir, CENTROIDS_FILE), centroids.astype(np.float32))
+
+        np.save(os.path.join(index_dir, VECTORS_FILE), normalized[order])
+        with ColumnarWriter(os.path.join(index_dir, ITEMS_FILE), SIMILAR_ITEMS_SCHEMA) as writer:
+            for i in order:
+                writer.write(items[i])
+        with open(os.path.join(index_dir, INDEX_FILE), 'w', encoding='utf-8') as f:
+            json.dump({"mean": mean.tolist(), "std": std.tolist(), "offsets": [int(o) for o in offsets]}, f)
+        return cls(index_dir)
+
+    def prepare(self, rows):
+        """Standardize and normalize query rows the way the indexed vectors were."""
+        rows = np.atleast_2d(np.asarray(rows, dtype=np.float32))
+        return _normalize((rows - self.mean) / self.std).astype(np.float32)
+
+    @metrics.timed("similarity_search")
+    def search(self, rows, k=5, n_probe=DEFAULT_N_PROBE, batch_rows=DEFAULT_BATCH_ROWS):
+        """
+        Find the k most similar indexed items of each query row.
+
+        Args:
+            rows (numpy.ndarray): (n_queries, n_features) feature rows, or a single row.
+            k (int, optional): Number of neighbours per query. Defaults to 5.
+            n_probe (int, optional): Lists scanned per query in IVF mode. Defaults to DEFAULT_N_PROBE.
+            batch_rows (int, optional): Indexed vectors multiplied at a time. Defaults to DEFAULT_BATCH_ROWS.
+
+        Returns:
+            tuple: (similarities, indices), both (n_queries, k) and sorted by decreasing similarity.
+            Slots without a neighbour have index -1 and similarity -inf.
+        """
+
+        queries = self.prepare(rows)
+        best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        best_indices = np.full((len(queries), k), -1, dtype=np.int64)
+
+        if self.centroids is None:
+            ranges = [(0, len(self.vectors), np.arange(len(queries)))]
+        else:
+            # Scan each probed list once for all of the queries that probe it
+            n_probe = min(n_probe, len(self.centroids))
+            probes = np.argpartition(-(queries @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+            ranges = [(self.offsets[l], self.offsets[l + 1], np.flatnonzero((probes == l).any(axis=1)))
+                      for l in range(len(self.centroids))]
+
+        for start, stop, query_ids in ranges:
+            if len(query_ids) == 0:
+                continue
+            for block in range(start, stop, batch_rows):
+                block_stop = min(block + batch_rows, stop)
+                scores = queries[query_ids] @ self.vectors[block:block_stop].T
+                scores_out, indices_out = best_scores[query_ids], best_indices[query_ids]
+                _merge_top_k(scores_out, indices_out, scores, block)
+                best_scores[query_ids], best_indices[query_ids] = scores_out, indices_out
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best_indices, order, axis=1)
+
+    def similar(self, rows, k=5, n_probe=DEFAULT_N_PROBE):
+        """
+        Return the similar past lawns of each query row as lists of dicts with the item's "item_id",
+        "source", "score" (None for items without one, e.g. Reddit posts) and "notes" and its
+        "similarity" to the query.
+        """
+        similarities, indices = self.search(rows, k, n_probe)
+        results = []
+        for row_similarities, row_indices in zip(similarities, indices):
+            neighbours = []
+            for similarity, index in zip(row_similarities, row_indices):
+                if index < 0:
+                    continue
+                item = self.items.iloc[index]
+                score = float(item["score"])
+                neighbours.append({"item_id": item["item_id"], "source": item["source"],
+                                   "score": None if np.isnan(score) else score,
+                                   "notes": item["notes"], "similarity": float(similarity)})
+            results.append(neighbours)
+        return results
+
+
+def build_archive_index(index_dir, csv_path, tips_dir=None, image_dir="data/images", schema=None,
+                        model_path="yolov8n.onnx", workers=None, cache=None, n_lists=0):
+    """
+    Build a SimilarityIndex over the archive of past lawns: the scored photos listed in the features CSV
+    and the Reddit posts whose images were downloaded.
+
+    A photo's notes are the recommendations for its score and detected objects; a post's notes are its
+    title, and it has no score. Downloaded post images also appear in the CSV, but are indexed once, as
+    posts. Images that cannot be processed are left out.
+
+    Args:
+        index_dir (str): Directory to write the index to.
+        csv_path (str): Features CSV of the scored photos (see generate_features_csv).
+        tips_dir (str, optional): Parquet dataset of scraped tips (scrape_reddit.TIPS_PARQUET_DIR). Defaults to None.
+        image_dir (str, optional): Folder the post images were downloaded to. Defaults to "data/images".
+        schema (feature_extraction.FeatureSchema, optional): Feature layout. Defaults to DEFAULT_SCHEMA.
+        model_path (str, optional): Object detection model, or None to skip detection.
+        workers (int, optional): Worker processes extracting features (see pipeline.process_images_shared).
+        cache (cache.FeatureCache, optional): Cache of feature rows and detections. Defaults to None.
+        n_lists (int, optional): Number of IVF lists; 0 builds an exact-search index. Defaults to 0.
+
+    Returns:
+        SimilarityIndex: The written index.
+    """
+    import pandas as pd
+
+    from . import feature_extraction, pipeline, recommendation  # Load OpenCV, so only when building
+
+    schema = feature_extraction.DEFAULT_SCHEMA if schema is None else schema
+    posts = {}
+    if tips_dir is not None and os.path.exists(tips_dir):
+        tips = read_columns(tips_dir, columns=["submission_id", "title", "image_filename"],
+                            filters=[("image_filename", "!=", "")])
+        for submission_id, title, image_filename in tips.itertuples(index=False):
+            image_path = os.path.normpath(os.path.join(image_dir, image_filename))
+            if os.path.exists(image_path):  # Skip posts whose download failed
+                posts[image_path] = (submission_id, title)
+
+    image_paths, items = [], []
+    photos = pd.read_csv(csv_path)
+    for image_path, score in zip(photos["Image Path"], photos["Initial Score"]):
+        if os.path.normpath(image_path) not in posts:
+            image_paths.append(image_path)
+            items.append({"item_id": image_path, "source": "photo", "score": float(score), "notes": None})
+    for image_path, (submission_id, title) in posts.items():
+        image_paths.append(image_path)
+        items.append({"item_id": submission_id, "source": "reddit", "score": None, "notes": title})
+
+    features, valid, detections, _ = pipeline.process_images_shared(image_paths, schema, model_path, workers,
+                                                                    cache=cache)
+    for item, detected_objects in zip(items, detections):
+        if item["source"] == "photo":
+            objects = [feature_extraction.object_name(obj) for obj in detected_objects]
+            item["notes"] = ", ".join(recommendation.recommend_services(item["score"], objects))
+
+    keep = np.flatnonzero(valid)
+    print(f"Indexing {len(keep)} of {len(items)} archived lawns ({len(items) - len(keep)} could not be processed)")
+    return SimilarityIndex.build(index_dir, features[keep], [items[i] for i in keep], n_lists=n_lists)
+
+
+# Example usage
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    archive = rng.random((10000, 18), dtype=np.float32)
+    archive_items = [{"item_id": f"lawn_{i}.jpg", "source": "photo", "score": float(i % 100),
+                      "notes": "Weed Control"} for i in range(len(archive))]
+    index = SimilarityIndex.build("data/similarity_index", archive, archive_items, n_lists=32)
+    for neighbour in index.similar(archive[0], k=3)[0]:
+        print(neighbour)
@@ -0,0 +1,134 @@
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_BATCH_SIZE = 1024  # Rows buffered before a record batch is appended to the file
+
+# Scraped Reddit tips, one row per submission
+TIPS_SCHEMA = pa.schema([
+    ("submission_id", pa.string()),
+    ("created_utc", pa.float64()),
+    ("title", pa.string()),
+    ("body", pa.string()),
+    ("image_filename", pa.string()),
+    ("relevant_words", pa.list_(pa.string())),
+    ("sentiment_score", pa.int32()),
+])
+
+# Indexed images and their lawn scores, one row per image
+IMAGE_FEATURES_SCHEMA = pa.schema([
+    ("image_path", pa.string()),
+    ("initial_score", pa.float32()),
+])
+
+# Items of a similarity index (past scored photos and Reddit posts with images), one row per vector
+SIMILAR_ITEMS_SCHEMA = pa.schema([
+    ("item_id", pa.string()),
+    ("source", pa.string()),
+    ("score", pa.float32()),
+    ("notes", pa.string()),
+])
+
+
+class ColumnarWriter:
+    """
+    Appends rows to a Parquet file as record batches while the data is being produced.
+
+    Rows are buffered per column and flushed as one record batch (a Parquet row group) every
+    batch_size rows, so memory holds at most one batch however many rows are written. The file is
+    written to a hidden temporary path and renamed into place on close, so readers (including readers
+    of the dataset directory it is in) never see a partial file.
+    """
+
+    def __init__(self, path, schema, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            path (str): Parquet file to write.
+            schema (pyarrow.Schema): Columns of the file, e.g. TIPS_SCHEMA.
+            batch_size (int, optional): Rows per record batch. Defaults to DEFAULT_BATCH_SIZE.
+        """
+        self.path = path
+        self.schema = schema
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._columns = {name: [] for name in schema.names}
+        self._buffered = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tmp_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+        self._writer = pq.ParquetWriter(self._tmp_path, schema)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, row):
+        """Buffer one row, given as a dict keyed by column name, and flush a batch when it is full."""
+        for name, values in self._columns.items():
+            values.append(row.get(name))
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Append the buffered rows to the file as one record batch."""
+        if self._buffered == 0:
+            return
+        batch = pa.record_batch([pa.array(self._columns[name], type=field.type)
+                                 for name, field in zip(self.schema.names, self.schema)], schema=self.schema)
+        self._writer.write_batch(batch)
+        self.rows_written += self._buffered
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    def close(self):
+        """Flush the remaining rows and move the finished file into place."""
+        self.flush()
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard the file being written."""
+        self._writer.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def new_part_path(dataset_dir):
+    """
+    Return the path of a new part file in a Parquet dataset directory.
+
+    A dataset grows by adding a part file per run instead of rewriting one file, and read_columns
+    reads the whole directory as one table.
+    """
+    os.makedirs(dataset_dir, exist_ok=True)
+    stem = os.path.join(dataset_dir, f"part-{time.strftime('%Y%m%d-%H%M%S')}")
+    path, suffix = f"{stem}.parquet", 1
+    while os.path.exists(path):
+        path, suffix = f"{stem}-{suffix}.parquet", suffix + 1
+    return path
+
+
+def read_columns(path, columns=None, filters=None):
+    """
+    Read a Parquet file into a pandas DataFrame, loading only what is needed.
+
+    Args:
+        path (str): Parquet file, or dataset directory of part files (see new_part_path), to read.
+        columns (list, optional): Columns to load; the others are never read from disk. Defaults to all.
+        filters (list, optional): Row predicates such as [("sentiment_score", ">", 0)], pushed down so row
+            groups whose statistics rule them out are skipped. Defaults to None.
+
+    Returns:
+        pandas.DataFrame: The selected rows and columns.
+    """
+    return pq.read_table(path, columns=columns, filters=filters).to_pandas()
@@ -0,0 +1,222 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from . import feature_extraction
+from . import metrics
+
+TILE_SIZE = 256  # Side of a square tile in pixels of its pyramid level
+MAX_DECODE_SIDE = 2048  # Longest side the photo is decoded at; larger JPEGs are decoded at 1/2, 1/4 or 1/8 scale
+PYRAMID_LEVELS = 3  # Level 0 is the decoded image, each further level halves it
+BARE_GREEN_FRACTION = 0.25  # A tile with less green than this in a green lawn photo is a bare patch
+MIN_LAWN_GREEN_FRACTION = 0.3  # Bare patches are only reported in photos that are at least this green
+WEED_CONTRAST_FACTOR = 2.0  # A green tile this many times coarser than the median green tile has weeds
+
+EXIF_ORIENTATION = 0x0112  # EXIF tag of the camera orientation
+ROTATED_ORIENTATIONS = (5, 6, 7, 8)  # Orientations that swap width and height when applied
+
+# JPEG scale factors cv2 can decode at directly, largest reduction first
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+_GLCM_CONTRAST = feature_extraction.TEXTURE_FEATURE_NAMES.index("glcm_contrast")
+
+# A problem found in part of a photo; the box is (x, y, width, height) in pixels of the original photo
+Region = namedtuple("Region", ["label", "box", "level", "score"])
+
+# Result of analyze_tiled: the aggregated feature row, one (rows, cols, n_texture) grid per pyramid
+# level, and the localized problem regions
+TiledAnalysis = namedtuple("TiledAnalysis", ["features", "pyramid", "regions"])
+
+
+def load_reduced(image_path, max_side=MAX_DECODE_SIDE):
+    """
+    Decodes an image at the smallest JPEG scale that still keeps its longest side at least max_side.
+
+    Only the header is read to find the size, and the JPEG decoder then produces the reduced image
+    directly, so a 20 MP photo is never held at full resolution. Like cv2.imread, the result is turned
+    upright according to the EXIF orientation, and scale refers to the upright photo.
+
+    Args:
+        image_path (str): Path to the image file.
+        max_side (int, optional): Longest side to aim for. Defaults to MAX_DECODE_SIDE.
+
+    Returns:
+        tuple: (BGR uint8 image, scale) where scale maps decoded pixels back to original pixels.
+
+    Raises:
+        ValueError: If the image cannot be loaded.
+    """
+
+    with Image.open(image_path) as header:
+        width, height = header.size
+        # cv2.imread applies the EXIF orientation, so the scale is measured against the rotated size
+        if header.getexif().get(EXIF_ORIENTATION) in ROTATED_ORIENTATIONS:
+            width, height = height, width
+
+    img = None
+    for factor, flag in _REDUCED_FLAGS:
+        if max(width, height) // factor >= max_side:
+            img = cv2.imread(image_path, flag)
+            break
+    if img is None:
+        img = cv2.imread(image_path)
+    if img is None:
+        raise ValueError(f"Image at {image_path} cannot be loaded.")
+    return img, width / img.shape[1]
+
+
+def build_pyramid(img, levels=PYRAMID_LEVELS, tile_size=TILE_SIZE):
+    """Return the image halved level by level, stopping before a level gets smaller than one tile."""
+    pyramid = [img]
+    while len(pyramid) < levels and min(pyramid[-1].shape[:2]) // 2 >= tile_size:
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+def tile_origins(length, tile_size=TILE_SIZE):
+    """Start offsets of the tiles covering a length; the last tile is shifted back so every tile is full size."""
+    if length <= tile_size:
+        return [0]
+    origins = list(range(0, length - tile_size, tile_size))
+    return origins + [length - tile_size]
+
+
+def green_fraction(bgr):
+    """Fraction of pixels whose excess green index (2G - R - B) marks them as vegetation."""
+    b, g, r = (bgr[..., channel].astype(np.int16) for channel in range(3))
+    return float(np.count_nonzero(2 * g - r - b > 20)) / (bgr.shape[0] * bgr.shape[1])
+
+
+def _analyze_tile(tile):
+    """Texture descriptor and green fraction of one BGR tile."""
+    gray = cv2.cvtColor(tile, cv2.COLOR_BGR2GRAY)
+    return feature_extraction.texture_descriptor(gray), green_fraction(tile)
+
+
+def find_regions(descriptors, greens, boxes, level=0):
+    """
+    Flag tiles of one pyramid level as bare patches or weed growth.
+
+    Args:
+        descriptors (numpy.ndarray): (n_tiles, n_texture) texture descriptors.
+        greens (numpy.ndarray): Green fraction of every tile.
+        boxes (list): (x, y, width, height) of every tile in original pixels.
+        level (int, optional): Pyramid level the tiles come from. Defaults to 0.
+
+    Returns:
+        list: Region per flagged tile.
+    """
+
+    regions = []
+    if greens.mean() >= MIN_LAWN_GREEN_FRACTION:
+        for i in np.flatnonzero(greens < BARE_GREEN_FRACTION):
+            regions.append(Region("bare_patch", boxes[i], level, float(1.0 - greens[i])))
+
+    # Weeds show up as patches of much coarser texture than the surrounding turf
+    lawn = greens >= BARE_GREEN_FRACTION
+    if lawn.sum() >= 2:
+        contrast = descriptors[:, _GLCM_CONTRAST]
+        median = np.median(contrast[lawn])
+        if median > 0:
+            for i in np.flatnonzero(lawn & (contrast > WEED_CONTRAST_FACTOR * median)):
+                regions.append(Region("weed_growth", boxes[i], level, float(contrast[i] / median)))
+    return regions
+
+
+@metrics.timed("analyze_tiled")
+def analyze_tiled(image_path, schema=feature_extraction.DEFAULT_SCHEMA, detector=None, tile_size=TILE_SIZE,
+                  max_side=MAX_DECODE_SIDE, levels=PYRAMID_LEVELS, workers=None):
+    """
+    Analyzes a high-resolution photo tile by tile over an image pyramid.
+
+    The photo is decoded at reduced JPEG scale, halved into a pyramid and cut into tiles that are
+    analyzed in parallel threads (OpenCV and NumPy release the GIL). Texture is therefore measured at
+    several scales instead of once on a squashed 256x256 copy, and problems are localized to tiles.
+
+    Args:
+        image_path (str): Path to the image file.
+        schema (feature_extraction.FeatureSchema, optional): Layout of the aggregated row. Defaults to DEFAULT_SCHEMA.
+        detector (preprocess.ObjectDetector, optional): Also run detection on the finest level's tiles as one
+            batch; detected classes become regions too. Defaults to None.
+        tile_size (int, optional): Tile side in pixels. Defaults to TILE_SIZE.
+        max_side (int, optional): Longest side to decode at. Defaults to MAX_DECODE_SIDE.
+        levels (int, optional): Maximum number of pyramid levels. Defaults to PYRAMID_LEVELS.
+        workers (int, optional): Number of tile threads. Defaults to the number of CPU cores.
+
+    Returns:
+        TiledAnalysis: The feature row (texture averaged over the finest tiles, object columns set from the
+        regions), the per-level tile descriptor grids and the regions, or None if the image could not be processed.
+    """
+
+    try:
+        img, scale = load_reduced(image_path, max_side)
+    except Exception as e:
+        print(f"Error processing image {image_path}: {e}")
+        metrics.increment("image_failures_total")
+        return None
+
+    jobs = []  # (level, row, col, tile, box in original pixels)
+    grids = []
+    for level, level_img in enumerate(build_pyramid(img, levels, tile_size)):
+        level_scale = scale * (img.shape[1] / level_img.shape[1])
+        ys, xs = tile_origins(level_img.shape[0], tile_size), tile_origins(level_img.shape[1], tile_size)
+        grids.append((len(ys), len(xs)))
+        for row, y in enumerate(ys):
+            for col, x in enumerate(xs):
+                tile = level_img[y:y + tile_size, x:x + tile_size]
+                box = (int(x * level_scale), int(y * level_scale),
+                       int(tile.shape[1] * level_scale), int(tile.shape[0] * level_scale))
+                jobs.append((level, row, col, tile, box))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        results = list(executor.map(lambda job: _analyze_tile(job[3]), jobs))
+    metrics.increment("tiles_analyzed_total", len(jobs))
+
+    n_texture = len(feature_extraction.TEXTURE_FEATURE_NAMES)
+    pyramid = [np.zeros(grid + (n_texture,), dtype=np.float32) for grid in grids]
+    for (level, row, col, _, _), (descriptor, _) in zip(jobs, results):
+        pyramid[level][row, col] = descriptor
+
+    finest = [i for i, job in enumerate(jobs) if job[0] == 0]
+    descriptors = np.stack([results[i][0] for i in finest])
+    greens = np.array([results[i][1] for i in finest])
+    boxes = [jobs[i][4] for i in finest]
+    regions = find_regions(descriptors, greens, boxes)
+
+    if detector is not None:
+        try:
+            tiles = [cv2.cvtColor(jobs[i][3], cv2.COLOR_BGR2RGB) for i in finest]
+            for box, detected_objects in zip(boxes, detector.detect(tiles)):
+                regions.extend(Region(obj_id, box, 0, 1.0) for obj_id in dict.fromkeys(detected_objects))
+        except Exception as e:
+            print(f"Error in object detection: {e}")
+
+    row = schema.new_row()
+    for name, value in zip(feature_extraction.TEXTURE_FEATURE_NAMES, descriptors.mean(axis=0)):
+        column = schema.columns.get(name)
+        if column is not None:
+            row[column] = value
+    feature_extraction.fill_object_features(row, region_labels(regions), schema)
+    return TiledAnalysis(row, pyramid, regions)
+
+
+def region_labels(regions):
+    """Return the distinct labels of a list of regions in the order they were found."""
+    return list(dict.fromkeys(region.label for region in regions))
+
+
+# Example usage
+if __name__ == "__main__":
+    import sys
+
+    from . import recommendation
+
+    analysis = analyze_tiled(sys.argv[1])
+    if analysis is not None:
+        for region in analysis.regions:
+            print(f"{region.label} at {region.box} (score {region.score:.2f})")
+        print("Recommendations:", recommendation.recommend_services(50, [], regions=analysis.regions))
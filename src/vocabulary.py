@@ -0,0 +1,98 @@
+import os
+from collections import Counter
+
+POSITIVE_WORDS = frozenset(['good', 'great', 'excellent', 'love', 'happy', 'fantastic', 'enjoy'])
+NEGATIVE_WORDS = frozenset(['bad', 'terrible', 'hate', 'sad', 'angry', 'awful'])
+
+
+def load_word_list(file_path):
+    """Load words from a specified text file into a list."""
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return [line.strip().lower() for line in f if line.strip()]
+    except Exception as e:
+        print(f"Error loading word list from {file_path}: {e}")
+        return []
+
+
+def save_word_list(word_list, file_path):
+    """Save the word list to the specified text file atomically, in one write."""
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(f"{word}\n" for word in word_list))
+        os.replace(tmp_path, file_path)
+    except Exception as e:
+        print(f"Error saving word list to {file_path}: {e}")
+
+
+def tokenize(body):
+    """Split a post body into lowercase words."""
+    return body.lower().split()
+
+
+def sentiment_score(words):
+    """Dummy sentiment analysis (replace with a real model as needed): positive minus negative words."""
+    score = 0
+    for word in words:
+        if word in POSITIVE_WORDS:
+            score += 1
+        elif word in NEGATIVE_WORDS:
+            score -= 1
+    return score
+
+
+class Vocabulary:
+    """
+    Set-backed filler word and landscaping term lists that grow incrementally during a scrape.
+
+    Membership tests and updates are O(1) per word instead of rebuilding lists for every post. Term
+    counts are accumulated as posts are processed, and the word list files are only written when
+    save() is called, e.g. at scrape checkpoints.
+    """
+
+    def __init__(self, filler_words=(), landscaping_terms=()):
+        self.filler_words = set(filler_words)
+        self.landscaping_terms = set(landscaping_terms)
+        self.term_counts = Counter()
+        self.dirty = False
+
+    @classmethod
+    def load(cls, filler_words_file, landscaping_terms_file):
+        """Load a vocabulary from the filler word and landscaping term files."""
+        return cls(load_word_list(filler_words_file), load_word_list(landscaping_terms_file))
+
+    def relevant_words(self, words):
+        """Return the words that are landscaping terms and not filler words, in order."""
+        return [word for word in words if word in self.landscaping_terms and word not in self.filler_words]
+
+    def update(self, relevant_words, words):
+        """Update the word sets from one post: relevant words stop being filler, every word becomes a term."""
+        self.filler_words.difference_update(relevant_words)
+        self.landscaping_terms.update(words)
+        self.term_counts.update(words)
+        self.dirty = True
+
+    def process(self, body):
+        """
+        Tokenize a post once and derive everything the scraper needs from the tokens.
+
+        Args:
+            body (str): Post body text.
+
+        Returns:
+            tuple: (relevant_words, sentiment_score) of the post. The vocabulary is updated afterwards.
+        """
+        words = tokenize(body)
+        relevant_words = self.relevant_words(words)
+        score = sentiment_score(words)
+        self.update(relevant_words, words)
+        return relevant_words, score
+
+    def save(self, filler_words_file, landscaping_terms_file):
+        """Write both word lists (sorted, so files are stable between runs) if anything changed."""
+        if not self.dirty:
+            return
+        save_word_list(sorted(self.filler_words), filler_words_file)
+        save_word_list(sorted(self.landscaping_terms), landscaping_terms_file)
+        self.dirty = False
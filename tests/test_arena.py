@@ -0,0 +1,26 @@
+import pytest
+import numpy as np
+from src.arena import Arena
+
+
+def test_arena_slots_are_reused():
+    """Test that released slots are handed out again and a full arena times out."""
+
+    arena = Arena(2, (4, 4, 3))
+    first, second = arena.acquire(), arena.acquire()
+    assert first != second, "Slots in use should not be handed out twice"
+    with pytest.raises(TimeoutError):
+        arena.acquire(timeout=0.01)
+
+    arena.release(first)
+    assert arena.acquire(timeout=0.01) == first
+
+
+def test_shared_arena_attach():
+    """Test that writes through an attached arena are visible to the creating one."""
+
+    with Arena(3, (5,), np.float32, shared=True) as arena:
+        attached = Arena.attach(arena.name, 3, (5,), np.float32)
+        attached[1][:] = 7
+        assert arena[1].tolist() == [7.0] * 5
+        attached.close()
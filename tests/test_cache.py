@@ -0,0 +1,111 @@
+import pytest
+import cv2
+import numpy as np
+import src.preprocess as preprocess
+from src.cache import FeatureCache, pipeline_params
+
+
+def _write_image(path, value):
+    cv2.imwrite(str(path), np.full((32, 32, 3), value, dtype=np.uint8))
+
+
+def test_cache_keys_follow_content_and_params(tmp_path):
+    """Test that keys change with the image contents and the pipeline parameters."""
+
+    image_path = tmp_path / "lawn.png"
+    _write_image(image_path, 10)
+
+    cache = FeatureCache(str(tmp_path / "cache"))
+    other_params = FeatureCache(str(tmp_path / "cache"), params=pipeline_params(model_path="other.onnx"))
+    key = cache.key(str(image_path))
+
+    assert cache.load(key, "features") is None, "An empty cache should miss"
+    cache.save(key, "features", np.arange(4, dtype=np.float32))
+    assert np.array_equal(cache.load(key, "features"), np.arange(4)), "A saved array should be read back"
+    assert other_params.key(str(image_path)) != key, "Different pipeline parameters should give a different key"
+
+    _write_image(image_path, 200)
+    assert cache.key(str(image_path)) != key, "Changed image contents should give a different key"
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Test that the oldest entries are evicted once the cache is over its size limit."""
+
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    for key in ["aa01", "aa02", "aa03"]:
+        cache.save(key, "features", np.zeros(1024, dtype=np.float32))
+    cache.load("aa01", "features")  # Touch the first entry so the second is the least recently used
+
+    cache.evict(max_bytes=2 * 4300)
+
+    assert cache.load("aa02", "features") is None, "The least recently used entry should be evicted"
+    assert cache.load("aa01", "features") is not None, "Recently used entries should be kept"
+
+
+def test_batch_process_images_skips_cached_images(tmp_path, monkeypatch):
+    """Test that a second run only preprocesses images that are not in the cache yet."""
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    for i in range(3):
+        _write_image(image_dir / f"lawn_{i}.png", i * 50)
+    cache = FeatureCache(str(tmp_path / "cache"), params=pipeline_params(model_path=None))
+
+    first = preprocess.batch_process_images(str(image_dir), model_path=None, cache=cache)
+    _write_image(image_dir / "lawn_new.png", 255)
+
+    processed = []
+    original = preprocess.preprocess_image
+    monkeypatch.setattr(preprocess, "preprocess_image", lambda path, **kwargs: processed.append(path) or original(path, **kwargs))
+    second = preprocess.batch_process_images(str(image_dir), model_path=None, cache=cache)
+
+    assert len(first) == 3 and len(second) == 4, "Every image should be in the results"
+    assert [p.endswith("lawn_new.png") for p in processed] == [True], "Only the new image should be preprocessed"
+
+
+def test_eviction_keeps_small_arrays_and_frees_to_low_water(tmp_path):
+    """Test that preprocessed images are evicted before feature rows and that eviction leaves headroom."""
+
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    for i in range(8):
+        key = f"aa{i:02d}"
+        cache.save(key, "features", np.zeros(64, dtype=np.float32))
+        cache.save(key, "preprocessed", np.zeros((256, 256, 3), dtype=np.uint8))
+
+    assert cache.size() <= 0.9 * cache.max_bytes, "Eviction should free space down to the low-water mark"
+    assert all(cache.load(f"aa{i:02d}", "features") is not None for i in range(8)), \
+        "Feature rows should survive while there are preprocessed images to evict"
+    assert cache.load("aa00", "preprocessed") is None and cache.load("aa07", "preprocessed") is not None
+
+
+def test_parallel_workers_record_file_digests(tmp_path):
+    """Test that digests computed in pool workers reach the parent's hash index and are stored as uint8."""
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    for i in range(4):
+        _write_image(image_dir / f"lawn_{i}.png", i * 50)
+    cache = FeatureCache(str(tmp_path / "cache"), params=pipeline_params(model_path=None))
+
+    preprocess.batch_process_images(str(image_dir), model_path=None, workers=2, chunksize=2, cache=cache)
+    cache.flush()
+    reopened = FeatureCache(str(tmp_path / "cache"), params=pipeline_params(model_path=None))
+
+    image_paths = sorted(str(path) for path in image_dir.iterdir())
+    assert sorted(reopened._hash_index) == image_paths, "Every image hashed by a worker should be in the index"
+    assert reopened.load(reopened.key(image_paths[0]), "preprocessed").dtype == np.uint8, \
+        "Preprocessed images should be cached as uint8"
+
+
+def test_overwriting_an_entry_keeps_the_size_estimate(tmp_path):
+    """Test that saving over an existing array does not count the replaced file."""
+
+    cache = FeatureCache(str(tmp_path / "cache"), max_bytes=10 * 1024 * 1024)
+    cache.save("ab" * 32, "features", np.zeros(1000, dtype=np.float32))
+    cache.size()  # Scan once so later saves update the running total
+    for _ in range(5):
+        cache.save("ab" * 32, "features", np.zeros(1000, dtype=np.float32))
+
+    total = cache.size()
+    cache._size = None
+    assert total == cache.size(), "The running total should match a fresh scan of the files"
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+import cv2
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_cli(*args, cwd=REPO_DIR):
+    return subprocess.run([sys.executable, "-m", "src", "--timings", *args], cwd=cwd,
+                          capture_output=True, text=True, check=True)
+
+
+def test_recommend_loads_no_heavy_modules():
+    """Test that the recommend command prints recommendations without loading any heavy library."""
+
+    result = _run_cli("recommend", "40", "bare_patch")
+
+    assert "Grading & Overseeding" in result.stdout.splitlines()
+    assert "heavy modules loaded: none" in result.stderr, result.stderr
+
+
+def test_index_does_not_load_opencv(tmp_path):
+    """Test that indexing images writes the CSV without loading OpenCV or scikit-learn."""
+
+    image_folder = tmp_path / "images"
+    image_folder.mkdir()
+    cv2.imwrite(str(image_folder / "lawn.png"), np.zeros((8, 8, 3), dtype=np.uint8))
+
+    result = _run_cli("index", str(image_folder), "--csv-path", str(tmp_path / "features.csv"))
+
+    assert "1 added" in result.stdout
+    assert (tmp_path / "features.csv").exists()
+    loaded = result.stderr.split("heavy modules loaded: ")[1]
+    assert "cv2" not in loaded and "sklearn" not in loaded, result.stderr
+
+
+def test_export_checks_validation_images(tmp_path):
+    """Test that export refuses a pruned forest outside the tolerance on the validation images."""
+
+    import joblib
+    from sklearn.ensemble import RandomForestRegressor
+    from src.feature_extraction import DEFAULT_SCHEMA
+
+    image_folder = tmp_path / "images"
+    image_folder.mkdir()
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        cv2.imwrite(str(image_folder / f"lawn_{i}.png"), rng.integers(0, 256, (32, 32, 3), dtype=np.uint8))
+    X = rng.random((200, len(DEFAULT_SCHEMA)), dtype=np.float32)
+    model = RandomForestRegressor(n_estimators=10, random_state=42).fit(X, X.sum(axis=1) * 10)
+    model.feature_schema = DEFAULT_SCHEMA
+    model_dir = tmp_path / "models"
+    model_dir.mkdir()
+    joblib.dump(model, model_dir / "lawn_score_model_20240101-000000.pkl")
+    args = ("export", str(image_folder), "--model-dir", str(model_dir), "--detector", str(tmp_path / "none.onnx"),
+            "--cache-dir", str(tmp_path / "cache"), "--max-depth", "1")
+
+    result = _run_cli(*args)
+    assert "Not exporting" in result.stdout, result.stdout
+    assert not (model_dir / "lawn_score_model_20240101-000000.npz").exists()
+
+    result = _run_cli(*args, "--tolerance", "1000")
+    assert (model_dir / "lawn_score_model_20240101-000000.npz").exists(), result.stdout
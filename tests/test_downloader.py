@@ -0,0 +1,72 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from src.downloader import ImageDownloader
+
+IMAGE_BYTES = b"\x89PNG fake image bytes" * 1000
+
+
+@pytest.fixture
+def image_server():
+    """Local HTTP stand-in serving images, failing /flaky.png once with a 503."""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            requests_seen.append(self.path)
+            if self.path == "/missing.png":
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.path == "/flaky.png" and requests_seen.count("/flaky.png") == 1:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(IMAGE_BYTES)))
+            self.end_headers()
+            self.wfile.write(IMAGE_BYTES)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests_seen
+    server.shutdown()
+
+
+def test_download_all(tmp_path, image_server):
+    """Test concurrent downloads, retries of transient failures and failed downloads."""
+
+    base_url, _ = image_server
+    items = [(f"{base_url}/lawn_{i}.png", f"lawn_{i}.png") for i in range(8)]
+    items += [(f"{base_url}/flaky.png", "flaky.png"), (f"{base_url}/missing.png", "missing.png")]
+
+    with ImageDownloader(str(tmp_path), concurrency=4) as downloader:
+        results = downloader.download_all(items)
+
+    assert results["missing.png"] is None, "A 404 should not produce a file"
+    assert not (tmp_path / "missing.png").exists()
+    assert (tmp_path / "flaky.png").read_bytes() == IMAGE_BYTES, "A 503 should be retried"
+    assert all((tmp_path / f"lawn_{i}.png").read_bytes() == IMAGE_BYTES for i in range(8))
+    assert not list(tmp_path.glob("*.part")), "No partial files should be left behind"
+
+
+def test_download_skips_files_on_disk(tmp_path, image_server):
+    """Test that URLs whose file is already on disk or already queued are not downloaded again."""
+
+    base_url, requests_seen = image_server
+    (tmp_path / "existing.png").write_bytes(b"already here")
+    completed = []
+
+    with ImageDownloader(str(tmp_path), on_complete=completed.append) as downloader:
+        downloader.submit(f"{base_url}/existing.png", "existing.png")
+        downloader.submit(f"{base_url}/new.png", "new.png")
+        downloader.submit(f"{base_url}/new.png", "new.png")
+
+    assert requests_seen == ["/new.png"], "Only the new image should be requested, once"
+    assert [p.endswith("new.png") for p in completed] == [True]
+    assert (tmp_path / "existing.png").read_bytes() == b"already here"
@@ -1,31 +1,62 @@
 import pytest
 import numpy as np
-from src.feature_extraction import extract_features, extract_object_features
+import cv2
+from src.feature_extraction import (extract_features, FeatureSchema, extract_feature_matrix, extract_feature_row,
+                                    fill_object_features, DETECTOR_CLASS_NAMES)
+from src.preprocess import ObjectDetector
 
 
-def test_extract_features():
+def test_extract_features(tmp_path):
     """Test feature extraction from an image."""
 
-    # Load a dummy image
-    dummy_image = np.random.rand(256, 256, 3)  # Random image for testing
-    dummy_objects = [(50, 50, 100, 100)]  # Dummy object for object-based feature extraction
+    # Save a dummy image
+    dummy_image = (np.random.rand(256, 256, 3) * 255).astype(np.uint8)  # Random image for testing
+    image_path = str(tmp_path / "dummy.png")
+    cv2.imwrite(image_path, dummy_image)
+    dummy_objects = ["bare_patch"]  # Dummy object for object-based feature extraction
 
-    features = extract_features(dummy_image, dummy_objects)
+    features = extract_feature_row(image_path, dummy_objects)
 
     assert len(features) > 0, "Feature extraction failed, no features extracted"
     assert isinstance(features, np.ndarray), "Features should be a NumPy array"
 
 
-def test_extract_object_features():
-    """Test object feature extraction."""
+def test_extract_feature_matrix(tmp_path):
+    """Test that a batch of images becomes one float32 matrix laid out by the schema."""
 
-    # Create a dummy object image
-    dummy_object_image = np.zeros((100, 100, 3), dtype=np.uint8)
+    image_paths = []
+    for i, size in enumerate([(64, 64), (120, 80)]):
+        image_path = str(tmp_path / f"lawn_{i}.png")
+        cv2.imwrite(image_path, (np.random.rand(*size, 3) * 255).astype(np.uint8))
+        image_paths.append(image_path)
+    image_paths.append(str(tmp_path / "missing.png"))
 
-    # Draw a circle to simulate an object
-    cv2.circle(dummy_object_image, (50, 50), 40, (255, 255, 255), -1)
+    schema = FeatureSchema.default()
+    features, valid = extract_feature_matrix(image_paths, [["bare_patch"], [], ["weed_growth"]], schema)
 
-    object_features = extract_object_features(dummy_object_image)
+    assert features.shape == (3, len(schema)), "Matrix should have one row per image and one column per feature"
+    assert features.dtype == np.float32, "Features should be float32"
+    assert valid.tolist() == [True, True, False], "Only the missing image should be marked invalid"
+    assert features[0, schema.index("object_bare_patch")] == 1, "Detected objects should set their presence column"
+    assert features[1, schema.index("object_bare_patch")] == 0, "Undetected objects should stay zero"
+    assert list(extract_features(image_paths[1], [], schema)) == list(schema.names), "Dict keys should follow the schema"
 
-    assert len(object_features) == 3, "Object features should return 3 elements: area, perimeter, circularity"
-    assert all([f >= 0 for f in object_features]), "Object feature values should be non-negative"
+
+def test_fill_object_features_maps_detector_class_ids():
+    """Test that class IDs decoded by the detector set the presence columns of their named objects."""
+
+    # One image with two confident detections: class 0 (bare_patch) and class 2 (weed_growth)
+    outputs = np.zeros((1, 4 + len(DETECTOR_CLASS_NAMES), 2), dtype=np.float32)
+    outputs[0, :4, 0] = [100, 100, 50, 50]
+    outputs[0, :4, 1] = [400, 400, 50, 50]
+    outputs[0, 4 + 0, 0] = 0.9
+    outputs[0, 4 + 2, 1] = 0.8
+    class_ids = ObjectDetector(model_path=None).decode(outputs)[0]["class_ids"]
+
+    schema = FeatureSchema.default()
+    row = fill_object_features(schema.new_row(), class_ids + [99], schema)
+
+    assert sorted(class_ids) == [0, 2], "The detector should decode integer class IDs"
+    assert row[schema.index("object_bare_patch")] == 1 and row[schema.index("object_weed_growth")] == 1, \
+        "Detected class IDs should set the presence columns of their objects"
+    assert row.sum() == 2, "Undetected objects and unknown class IDs should leave their columns at zero"
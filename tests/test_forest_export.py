@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestRegressor
+from src.forest_export import check_export, export_forest, load_compact
+from src.scoring import ModelRegistry
+
+
+def _forest(n_estimators=20):
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 8), dtype=np.float32)
+    y = X[:, 0] * 50 + X[:, 1] * 30 + rng.random(300) * 5
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=42).fit(X, y), X
+
+
+def test_export_matches_sklearn(tmp_path):
+    """Test that a full-precision export predicts like sklearn and reloads from disk."""
+
+    model, X = _forest()
+    path = str(tmp_path / "lawn_score_model_20240101-000000.npz")
+    forest = export_forest(model, path)
+
+    assert check_export(model, forest, X) <= 1e-4, "Only float32 rounding of leaf values should differ"
+    assert np.allclose(load_compact(path).predict(X), model.predict(X), atol=1e-4), "A reloaded forest should match"
+
+
+def test_float16_and_pruned_exports(tmp_path):
+    """Test that float16 thresholds and pruning shrink the model while staying close to sklearn."""
+
+    model, X = _forest()
+    full = export_forest(model, str(tmp_path / "full.npz"))
+    small = export_forest(model, str(tmp_path / "small.npz"), threshold_dtype=np.float16, max_depth=6)
+
+    assert small.nbytes < full.nbytes and small.depth == 6
+    assert small.threshold.dtype == np.float16
+    assert check_export(model, small, X, tolerance=5.0) > 0, "A pruned forest should approximate, not equal, sklearn"
+
+
+def test_registry_loads_compact_models(tmp_path):
+    """Test that a compact registry scores with the exported forest."""
+
+    model, X = _forest(5)
+    export_forest(model, str(tmp_path / "lawn_score_model_20240101-000000.npz"))
+
+    registry = ModelRegistry(model_dir=str(tmp_path), compact=True)
+    assert np.allclose(registry.score(X), model.predict(X), atol=1e-4)
+
+
+def test_float16_export_refuses_out_of_range_thresholds(tmp_path):
+    """Test that thresholds beyond the float16 range are refused instead of overflowing and flipping splits."""
+
+    rng = np.random.default_rng(0)
+    X = rng.random((300, 2), dtype=np.float32) * np.float32(2e5)
+    model = RandomForestRegressor(n_estimators=5, random_state=42).fit(X, X[:, 0] / 2000)
+
+    with pytest.raises(ValueError, match="float16"):
+        export_forest(model, str(tmp_path / "small.npz"), threshold_dtype=np.float16)
+    assert not (tmp_path / "small.npz").exists(), "Nothing should be written"
+    assert check_export(model, export_forest(model, str(tmp_path / "full.npz")), X) <= 1e-4
+
+
+def test_export_out_of_tolerance_is_not_written(tmp_path):
+    """Test that an export failing the validation check raises before the file is written."""
+
+    model, X = _forest()
+    path = tmp_path / "small.npz"
+    with pytest.raises(ValueError, match="tolerance"):
+        export_forest(model, str(path), threshold_dtype=np.float16, max_depth=2, X=X, tolerance=1e-4)
+    assert not path.exists(), "An export outside the tolerance should not be shipped"
+
+    export_forest(model, str(path), threshold_dtype=np.float16, max_depth=2, X=X, tolerance=50.0)
+    assert path.exists()
@@ -0,0 +1,82 @@
+import csv
+import os
+import time
+
+import pytest
+from src.generate_features_csv import generate_features_csv
+from src.indexer import index_images
+
+
+def _read_csv(csv_path):
+    with open(csv_path, newline='') as f:
+        return sorted(tuple(row) for row in list(csv.reader(f))[1:])
+
+
+def test_index_images_reports_only_differences(tmp_path):
+    """Test that nested images are indexed and re-runs only report added, changed and deleted files."""
+
+    image_dir = tmp_path / "images"
+    (image_dir / "nested" / "deeper").mkdir(parents=True)
+    (image_dir / "a.jpg").write_bytes(b"a")
+    (image_dir / "nested" / "b.png").write_bytes(b"b")
+    (image_dir / "nested" / "deeper" / "c.JPG").write_bytes(b"c")
+    (image_dir / "nested" / "notes.txt").write_bytes(b"not an image")
+    manifest_path = str(tmp_path / "manifest.parquet")
+
+    first = index_images(str(image_dir), manifest_path)
+    assert len(first.added) == 3, "Images in nested folders should be indexed"
+
+    assert index_images(str(image_dir), manifest_path) == ([], [], []), "An unchanged folder should report nothing"
+
+    (image_dir / "a.jpg").write_bytes(b"a changed")
+    os.utime(image_dir / "nested" / "b.png", ns=(time.time_ns(), time.time_ns() + 10 ** 9))  # Touched, same contents
+    (image_dir / "nested" / "deeper" / "c.JPG").unlink()
+    (image_dir / "d.png").write_bytes(b"d")
+
+    delta = index_images(str(image_dir), manifest_path, hash_workers=2)
+    assert delta.added == [str(image_dir / "d.png")]
+    assert delta.changed == [str(image_dir / "a.jpg")]
+    assert delta.deleted == [str(image_dir / "nested" / "deeper" / "c.JPG")]
+
+
+def test_generate_features_csv_incremental(tmp_path):
+    """Test that re-runs append new images, drop deleted ones and keep existing scores."""
+
+    image_dir = tmp_path / "images"
+    (image_dir / "nested").mkdir(parents=True)
+    (image_dir / "a.jpg").write_bytes(b"a")
+    (image_dir / "nested" / "b.png").write_bytes(b"b")
+    csv_path = str(tmp_path / "features.csv")
+
+    generate_features_csv(str(image_dir), csv_path, default_score=0.5)
+    assert _read_csv(csv_path) == [(str(image_dir / "a.jpg"), "0.5"), (str(image_dir / "nested" / "b.png"), "0.5")]
+
+    (image_dir / "c.png").write_bytes(b"c")
+    (image_dir / "a.jpg").unlink()
+    generate_features_csv(str(image_dir), csv_path, default_score=0.9)
+
+    assert _read_csv(csv_path) == [(str(image_dir / "c.png"), "0.9"), (str(image_dir / "nested" / "b.png"), "0.5")]
+
+
+def test_failed_csv_write_leaves_the_manifest(tmp_path, monkeypatch):
+    """Test that images are not recorded as indexed when writing them to the CSV fails."""
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    (image_dir / "a.jpg").write_bytes(b"a")
+    csv_path = str(tmp_path / "features.csv")
+    generate_features_csv(str(image_dir), csv_path)
+
+    (image_dir / "b.jpg").write_bytes(b"b")
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(csv, "writer", crash)
+        with pytest.raises(OSError):
+            generate_features_csv(str(image_dir), csv_path)
+
+    delta = generate_features_csv(str(image_dir), csv_path)
+    assert delta.added == [str(image_dir / "b.jpg")], "The next run should add the image again"
+    assert _read_csv(csv_path) == [(str(image_dir / "a.jpg"), "0"), (str(image_dir / "b.jpg"), "0")]
@@ -0,0 +1,84 @@
+import multiprocessing
+import pytest
+from src.jobs import JobRunner, is_transient
+
+
+def test_resume_skips_completed_items(tmp_path):
+    """Test that a run interrupted part-way resumes with only the remaining items."""
+
+    calls = []
+
+    def task(item):
+        calls.append(item)
+        if item == 3 and len(calls) == 4:
+            raise KeyboardInterrupt  # The first run dies on item 3
+        return item * 10
+
+    with pytest.raises(KeyboardInterrupt):
+        JobRunner(str(tmp_path), "nightly").run(range(5), task)
+
+    runner = JobRunner(str(tmp_path), "nightly")
+    summary = runner.run(range(5), task)
+
+    assert summary.skipped == ["0", "1", "2"], "Items checkpointed by the first run should be skipped"
+    assert summary.completed == ["3", "4"]
+    assert runner.completed == {str(i): i * 10 for i in range(5)}
+
+
+def test_transient_errors_are_retried_with_backoff(tmp_path):
+    """Test that transient errors are retried with growing delays and permanent ones are logged at once."""
+
+    delays = []
+    attempts = {"flaky": 0}
+
+    def task(item):
+        if item == "flaky":
+            attempts["flaky"] += 1
+            if attempts["flaky"] < 3:
+                raise TimeoutError("read timed out")
+        if item == "missing":
+            raise FileNotFoundError("no such image")
+        return item
+
+    runner = JobRunner(str(tmp_path), "retries", retries=3, backoff=1.0, sleep=delays.append)
+    summary = runner.run(["flaky", "missing"], task)
+
+    assert summary.completed == ["flaky"] and summary.failed == ["missing"]
+    assert len(delays) == 2 and delays[1] > delays[0] / 2, "Two retries should have waited with backoff"
+    failure = runner.failures()[0]
+    assert failure["id"] == "missing" and failure["error_type"] == "FileNotFoundError" and failure["attempts"] == 1
+    assert not is_transient(FileNotFoundError()) and is_transient(ConnectionError())
+
+
+def test_bad_item_does_not_fail_its_batch(tmp_path):
+    """Test that a batch task failing on one item is split so the other items still complete."""
+
+    def task(batch):
+        if "bad" in batch:
+            raise ValueError("cannot decode")
+        return [item.upper() for item in batch]
+
+    runner = JobRunner(str(tmp_path), "batches")
+    summary = runner.run(["a", "bad", "c", "d"], task, batch_size=2)
+
+    assert sorted(summary.completed) == ["a", "c", "d"] and summary.failed == ["bad"]
+    assert runner.completed["a"] == "A"
+
+
+def _upper_batch(batch):
+    if "bad" in batch:
+        raise ValueError("cannot decode")
+    return [item.upper() for item in batch]
+
+
+def test_pool_runs_batches_and_isolates_bad_items(tmp_path):
+    """Test that batches run in a process pool are checkpointed and a bad item is isolated like in-process."""
+
+    with multiprocessing.Pool(2) as pool:
+        runner = JobRunner(str(tmp_path), "pool")
+        summary = runner.run(["a", "bad", "c", "d", "e"], _upper_batch, batch_size=2, pool=pool)
+
+    assert sorted(summary.completed) == ["a", "c", "d", "e"] and summary.failed == ["bad"]
+    assert runner.completed == {"a": "A", "c": "C", "d": "D", "e": "E"}
+    assert runner.failures()[0]["error_type"] == "ValueError"
+    assert JobRunner(str(tmp_path), "pool").completed == runner.completed, "Pool results should be checkpointed"
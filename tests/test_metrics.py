@@ -0,0 +1,68 @@
+import json
+import urllib.request
+import cv2
+import numpy as np
+import src.feature_extraction as feature_extraction
+import src.metrics
+from src.metrics import Metrics
+
+
+def test_disabled_metrics_record_nothing():
+    """Test that nothing is recorded until metrics are enabled."""
+
+    metrics = Metrics()
+    metrics.increment("images_processed_total")
+    with metrics.timer("stage"):
+        pass
+    assert metrics.snapshot() == {"counters": {}, "histograms": {}}, "Disabled metrics should stay empty"
+
+
+def test_timer_counters_and_exports(tmp_path):
+    """Test that timers and counters show up in the JSON and Prometheus exports."""
+
+    metrics = Metrics()
+    metrics.enable(profile_every=2)
+
+    @metrics.timed("stage")
+    def stage(x):
+        return sum(range(x))
+
+    for _ in range(4):
+        stage(1000)
+    metrics.increment("images_processed_total", 3)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"] == {"stage_calls_total": 4, "images_processed_total": 3}
+    assert snapshot["histograms"]["stage_seconds"]["count"] == 4
+    assert snapshot["histograms"]["stage_seconds"]["buckets"]["+Inf"] == 4, "Buckets should be cumulative"
+
+    text = metrics.to_prometheus()
+    assert "lawn_images_processed_total 3" in text
+    assert 'lawn_stage_seconds_bucket{le="+Inf"} 4' in text
+    assert "=== stage ===" in metrics.profile_report(), "Sampled calls should be profiled"
+
+    metrics.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text())["counters"]["images_processed_total"] == 3
+
+    server = metrics.serve(port=0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        assert "lawn_stage_calls_total 4" in urllib.request.urlopen(url).read().decode()
+    finally:
+        server.shutdown()
+
+
+def test_feature_extraction_is_instrumented(tmp_path):
+    """Test that extracting features records a stage timing in the shared registry."""
+
+    image_path = str(tmp_path / "lawn.png")
+    cv2.imwrite(image_path, (np.random.rand(32, 32, 3) * 255).astype(np.uint8))
+    assert feature_extraction.metrics is src.metrics, "Every module should share the one metrics module"
+    registry = src.metrics.METRICS
+    registry.enable()
+    try:
+        feature_extraction.extract_feature_row(image_path, [])
+        assert registry.snapshot()["counters"]["extract_features_calls_total"] >= 1
+    finally:
+        registry.disable()
+        registry.reset()
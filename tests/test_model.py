@@ -2,7 +2,7 @@ import pytest
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
-from src.model_trainer import train_model, evaluate_model
+from src.model_trainer import train_model, evaluate_model, evaluate_oob
 
 
 def test_train_model():
@@ -33,3 +33,46 @@ def test_evaluate_model():
     mse = evaluate_model(model, X_test, y_test)
 
     assert mse >= 0, "Mean squared error should be non-negative"
+
+
+def test_train_model_oob(tmp_path):
+    """Test out-of-bag training: all data is used for fitting and no holdout is returned."""
+
+    X = np.random.rand(100, 10)
+    y = np.random.rand(100)
+
+    model, X_test, y_test = train_model(X, y, n_estimators=20, model_dir=str(tmp_path), n_jobs=-1, oob=True)
+
+    assert X_test is None and y_test is None, "OOB mode should not split off a test set"
+    assert model.oob_prediction_.shape == (100,), "Every sample should get an out-of-bag prediction"
+    assert evaluate_oob(model, y) >= 0, "Out-of-bag error should be non-negative"
+
+
+def test_train_model_warm_start(tmp_path):
+    """Test that a base model keeps its trees and grows new ones on new data."""
+
+    X = np.random.rand(100, 10)
+    y = np.random.rand(100)
+    base_model, _, _ = train_model(X, y, n_estimators=10, model_dir=str(tmp_path))
+    base_model.feature_schema = ["feature"] * 10  # Stands in for a FeatureSchema of 10 columns
+    params = base_model.get_params()
+
+    model, _, _ = train_model(np.random.rand(40, 10), np.random.rand(40), n_estimators=5,
+                              model_dir=str(tmp_path), base_model=base_model)
+
+    assert len(model.estimators_) == 15, "Warm start should add trees to the existing forest"
+    assert all(np.array_equal(new.tree_.threshold, old.tree_.threshold)
+               for new, old in zip(model.estimators_, base_model.estimators_)), "Existing trees should be kept"
+    assert len(base_model.estimators_) == 10 and base_model.get_params() == params, \
+        "The base model should not be changed"
+    assert model.feature_schema == base_model.feature_schema, "Without a schema the base model's should be kept"
+
+
+def test_train_model_refuses_oob_with_warm_start(tmp_path):
+    """Test that an out-of-bag score is not computed for a forest grown on two different data sets."""
+
+    base_model, _, _ = train_model(np.random.rand(50, 10), np.random.rand(50), n_estimators=5, model_dir=str(tmp_path))
+
+    with pytest.raises(ValueError):
+        train_model(np.random.rand(40, 10), np.random.rand(40), n_estimators=5, model_dir=str(tmp_path),
+                    base_model=base_model, oob=True)
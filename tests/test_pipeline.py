@@ -0,0 +1,178 @@
+import os
+import threading
+import pytest
+import cv2
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from src.cache import FeatureCache, pipeline_params
+from src.feature_extraction import DEFAULT_SCHEMA
+from src.feature_extraction import extract_feature_row
+import src.pipeline as pipeline
+from src.jobs import JobRunner
+from src.pipeline import bounded, process_images_shared, run_feature_job, stream_recommendations
+
+
+def _write_images(folder, count):
+    for i in range(count):
+        cv2.imwrite(str(folder / f"lawn_{i}.png"), (np.random.rand(64, 64, 3) * 255).astype(np.uint8))
+
+
+def _dummy_model():
+    model = RandomForestRegressor(n_estimators=5, random_state=42)
+    model.fit(np.random.rand(20, len(DEFAULT_SCHEMA)), np.random.rand(20) * 100)
+    return model
+
+
+def test_stream_recommendations(tmp_path):
+    """Test that every image in the folder comes out of the stream with a score and recommendations."""
+
+    _write_images(tmp_path, 5)
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    results = list(stream_recommendations(str(tmp_path), _dummy_model(), batch_size=2, queue_size=2))
+
+    assert sorted(image_file for image_file, _, _ in results) == [f"lawn_{i}.png" for i in range(5)]
+    assert all(len(recommendations) > 0 for _, _, recommendations in results), "Every image should get recommendations"
+
+
+def test_stream_releases_slots_of_failed_images(tmp_path, monkeypatch):
+    """Test that images failing feature extraction give their arena slot back instead of stalling the stream."""
+
+    _write_images(tmp_path, 12)
+    for i in range(6):
+        (tmp_path / f"unreadable_{i}.png").write_bytes(b"not an image")
+    extract = pipeline.feature_extraction.extract_feature_row
+
+    def failing_extract(image_path, *args, **kwargs):
+        # Half of the readable images fail extraction; far more than the 5 slots of the arena
+        return None if int(image_path.rsplit("_", 1)[1].split(".")[0]) % 2 else extract(image_path, *args, **kwargs)
+
+    monkeypatch.setattr(pipeline.feature_extraction, "extract_feature_row", failing_extract)
+    results = []
+    consumer = threading.Thread(target=lambda: results.extend(
+        stream_recommendations(str(tmp_path), _dummy_model(), batch_size=2, queue_size=1)), daemon=True)
+    consumer.start()
+    consumer.join(timeout=30)
+
+    assert not consumer.is_alive(), "The stream should not block waiting for leaked arena slots"
+    assert sorted(image_file for image_file, _, _ in results) == sorted(f"lawn_{i}.png" for i in range(0, 12, 2))
+
+
+def test_bounded_reraises_upstream_errors():
+    """Test that an exception in a bounded stage reaches the consumer."""
+
+    def failing():
+        yield 1
+        raise RuntimeError("stage failed")
+
+    stream = bounded(failing(), maxsize=1)
+    assert next(stream) == 1
+    with pytest.raises(RuntimeError):
+        next(stream)
+
+
+def test_bounded_stops_producer_when_consumer_leaves():
+    """Test that closing a bounded stream early stops its producer and closes the upstream generator."""
+
+    closed = threading.Event()
+
+    def endless():
+        try:
+            while True:
+                yield 1
+        finally:
+            closed.set()
+
+    stream = bounded(endless(), maxsize=1)
+    assert next(stream) == 1
+    stream.close()
+
+    assert closed.wait(timeout=5), "The upstream generator should be closed once the consumer leaves"
+
+
+def test_bounded_reraises_base_exceptions():
+    """Test that a KeyboardInterrupt in the producer reaches the consumer instead of hanging it."""
+
+    def interrupted():
+        yield 1
+        raise KeyboardInterrupt
+
+    stream = bounded(interrupted(), maxsize=1)
+    assert next(stream) == 1
+    with pytest.raises(KeyboardInterrupt):
+        next(stream)
+
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_process_images_shared(tmp_path, workers):
+    """Test that shared-memory workers produce the same feature rows as extracting each image directly."""
+
+    _write_images(tmp_path, 5)
+    image_paths = sorted(str(path) for path in tmp_path.glob("*.png")) + [str(tmp_path / "missing.png")]
+
+    features, valid, detections, images = process_images_shared(
+        image_paths, model_path=None, workers=workers, chunksize=2, keep_images=True)
+
+    assert features.dtype == np.float32 and features.shape == (6, len(DEFAULT_SCHEMA))
+    assert valid.tolist() == [True] * 5 + [False], "Only the missing image should be invalid"
+    assert images.shape == (6, 256, 256, 3) and images.dtype == np.uint8
+    for i, image_path in enumerate(image_paths[:5]):
+        np.testing.assert_allclose(features[i], extract_feature_row(image_path, []), rtol=1e-5)
+
+
+def test_run_feature_job_logs_unreadable_images(tmp_path):
+    """Test that the feature job keeps the readable images and logs the unreadable one."""
+
+    images = tmp_path / "images"
+    images.mkdir()
+    _write_images(images, 3)
+    (images / "broken.png").write_bytes(b"not an image")
+    image_paths = sorted(str(path) for path in images.iterdir())
+
+    runner = JobRunner(str(tmp_path / "jobs"), "features")
+    done, features, detections = run_feature_job(image_paths, runner, batch_size=2)
+
+    assert done == [path for path in image_paths if not path.endswith("broken.png")]
+    assert features.shape == (3, len(DEFAULT_SCHEMA)) and detections == [[], [], []]
+    assert [failure["error_type"] for failure in runner.failures()] == ["ValueError"]
+
+
+def test_feature_job_runs_in_worker_processes(tmp_path):
+    """Test that the feature job run on a worker pool gives the same rows as a serial run."""
+
+    images = tmp_path / "images"
+    images.mkdir()
+    _write_images(images, 5)
+    (images / "broken.png").write_bytes(b"not an image")
+    image_paths = sorted(str(path) for path in images.iterdir())
+
+    serial = run_feature_job(image_paths, JobRunner(str(tmp_path / "serial"), "features"), batch_size=2)
+    runner = JobRunner(str(tmp_path / "pool"), "features")
+    done, features, detections = run_feature_job(image_paths, runner, batch_size=2, workers=2)
+
+    assert done == serial[0] and np.array_equal(features, serial[1]) and detections == serial[2]
+    assert [failure["error_type"] for failure in runner.failures()] == ["ValueError"]
+
+
+@pytest.mark.parametrize("use_cache", [False, True])
+def test_resumed_feature_job_recomputes_replaced_images(tmp_path, use_cache):
+    """Test that an image replaced after an interrupted run is not served from the stale checkpoint."""
+
+    images = tmp_path / "images"
+    images.mkdir()
+    _write_images(images, 2)
+    image_paths = sorted(str(path) for path in images.iterdir())
+    feature_cache = FeatureCache(str(tmp_path / "cache"), params=pipeline_params(None)) if use_cache else None
+    _, first, _ = run_feature_job(image_paths, JobRunner(str(tmp_path / "jobs"), "features"), cache=feature_cache)
+
+    # The run was not finished, so its checkpoint stays; then one photo is replaced by another
+    cv2.imwrite(image_paths[0], np.full((64, 64, 3), 200, dtype=np.uint8))
+    os.utime(image_paths[0], ns=(1, 1))
+    runner = JobRunner(str(tmp_path / "jobs"), "features")
+    done, second, _ = run_feature_job(image_paths, runner, cache=feature_cache)
+
+    assert done == image_paths
+    assert np.array_equal(second[1], first[1]), "The unchanged image should come from the checkpoint"
+    expected = extract_feature_row(image_paths[0], [], DEFAULT_SCHEMA)
+    assert np.allclose(second[0], expected), "The replaced image should be processed again"
+    assert not np.allclose(second[0], first[0])
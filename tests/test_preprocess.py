@@ -1,7 +1,50 @@
 # test_preprocess.py
 import pytest
-from src.preprocess import preprocess_image
+import cv2
+import numpy as np
+from src.preprocess import preprocess_image, batch_process_images, ObjectDetector
 
-def test_preprocess_image():
-    img = preprocess_image("path/to/test/image.jpg")
+def test_preprocess_image(tmp_path):
+    image_path = str(tmp_path / "image.jpg")
+    cv2.imwrite(image_path, (np.random.rand(480, 640, 3) * 255).astype(np.uint8))
+    img = preprocess_image(image_path)
     assert img.shape == (256, 256, 3)  # Check if image is resized properly
+
+
+def test_batch_process_images_parallel(tmp_path):
+    """Test that the process pool returns the same results as the serial loop."""
+
+    for i in range(6):
+        cv2.imwrite(str(tmp_path / f"lawn_{i}.png"), (np.random.rand(64, 96, 3) * 255).astype(np.uint8))
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    serial = batch_process_images(str(tmp_path), model_path=None)
+    parallel = batch_process_images(str(tmp_path), model_path=None, workers=2, chunksize=2)
+    unordered = batch_process_images(str(tmp_path), model_path=None, workers=2, ordered=False)
+
+    assert len(serial) == 6, "Every image (and only images) should be processed"
+    assert list(parallel) == list(serial), "Ordered results should follow directory order"
+    assert sorted(unordered) == sorted(serial), "Unordered results should contain the same images"
+
+
+def test_object_detector_decode():
+    """Test batched decoding: confidence filtering, NMS and per-image results."""
+
+    detector = ObjectDetector(model_path=None, conf_threshold=0.5, nms_threshold=0.45)
+
+    # Two images, 3 classes, 4 anchors laid out as (batch, 4 + n_classes, n_anchors)
+    outputs = np.zeros((2, 7, 4), dtype=np.float32)
+    outputs[0, :4, 0] = [100, 100, 50, 50]
+    outputs[0, :4, 1] = [102, 101, 50, 50]  # Overlaps anchor 0 with the same class, should be suppressed
+    outputs[0, :4, 2] = [400, 400, 40, 40]
+    outputs[0, 4 + 1, 0] = 0.9
+    outputs[0, 4 + 1, 1] = 0.8
+    outputs[0, 4 + 2, 2] = 0.7
+    outputs[1, 4 + 0, 3] = 0.3  # Below the confidence threshold
+
+    decoded = detector.decode(outputs)
+
+    assert len(decoded) == 2, "There should be one result per image"
+    assert sorted(decoded[0]["class_ids"]) == [1, 2], "Overlapping boxes of one class should be merged by NMS"
+    assert decoded[1]["class_ids"] == [], "Low-confidence detections should be dropped"
+    assert detector.detect([np.zeros((256, 256, 3), np.float32)]) == [[]], "No model means no detections"
@@ -0,0 +1,49 @@
+import json
+import pytest
+import numpy as np
+from src.recommendation import Recommender, recommend_services
+
+
+def test_recommend_services_order_is_stable():
+    """Test that recommendations keep rule order and contain no duplicates."""
+
+    recommendations = recommend_services(60, ["large_object", "bare_patch", "unknown_feature"])
+
+    assert recommendations == ["Overseeding", "Tree & Shrub Care", "Grading & Overseeding",
+                               "Landscape Construction", "Rock Installations", "Custom Landscape Design"]
+    assert recommend_services(90, ["large_object"]) == ["Lawn Maintenance Tips", "Custom Landscape Design",
+                                                        "Rock Installations"], "Duplicates should be removed"
+
+
+def test_detector_class_ids_are_recommended_like_names():
+    """Test that integer class IDs from the detector select the same services as the object names."""
+
+    names = recommend_services(60, ["bare_patch", "weed_growth"])
+    assert recommend_services(60, [0, np.int64(2)]) == names
+    assert len(names) == 5, "Both detections should add their services"
+    assert Recommender().recommend_batch([60], [[0, 2, 99]]) == [names], "Unknown class IDs should be ignored"
+
+
+def test_recommend_batch_matches_single_calls():
+    """Test that batch recommendations match one call per property."""
+
+    recommender = Recommender()
+    scores = np.array([10.0, 50.0, 74.9, 75.0, 99.0])
+    feature_lists = [["weed_growth"], [], ["poor_drainage", "bare_patch"], [3, "bare_patch"], []]
+
+    batch = recommender.recommend_batch(scores, feature_lists)
+
+    assert batch == [recommender.recommend(s, f) for s, f in zip(scores, feature_lists)]
+    assert batch[1][0] == "Overseeding", "A score equal to the low threshold should be in the medium tier"
+
+
+def test_recommender_from_config(tmp_path):
+    """Test building a recommender from a JSON config file."""
+
+    config_path = tmp_path / "rules.json"
+    config_path.write_text(json.dumps({"score_thresholds": {"low": 20, "medium": 40},
+                                       "feature_recommendations": {"moss": ["Dethatching"]}}))
+
+    recommender = Recommender.from_config(str(config_path))
+
+    assert recommender.recommend(30, ["moss", "bare_patch"]) == ["Overseeding", "Tree & Shrub Care", "Dethatching"]
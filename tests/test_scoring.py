@@ -0,0 +1,27 @@
+import pytest
+import numpy as np
+from src.model_trainer import train_model
+from src.scoring import ModelRegistry
+
+
+def test_registry_loads_latest_model_once(tmp_path):
+    """Test that the registry loads the latest saved model once and scores with it."""
+
+    X = np.random.rand(50, 6).astype(np.float32)
+    y = np.random.rand(50)
+    model, _, _ = train_model(X, y, n_estimators=5, model_dir=str(tmp_path))
+    (tmp_path / "lawn_score_model_19990101-000000.pkl").write_bytes(b"older model")
+
+    registry = ModelRegistry(model_dir=str(tmp_path))
+    scores = registry.score(X, batch_size=16)
+
+    assert registry.model_path.endswith(".pkl") and "1999" not in registry.model_path, "The newest model should be loaded"
+    assert np.allclose(scores, model.predict(X)), "Scores should match the trained model"
+    assert registry.refresh() is False, "An unchanged model should not be loaded again"
+
+
+def test_registry_without_models(tmp_path):
+    """Test that a registry with no saved models raises a clear error."""
+
+    with pytest.raises(FileNotFoundError):
+        ModelRegistry(model_dir=str(tmp_path)).get()
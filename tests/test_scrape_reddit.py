@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+from types import SimpleNamespace
+
+import pytest
+import numpy as np
+from PIL import Image
+from src.cache import FeatureCache
+from src.preprocess import load_image, preprocess_array
+from src.scrape_reddit import (append_tips_csv, append_tips_json, bucket_submissions, load_checkpoint, save_checkpoint,
+                               save_halved_image)
+
+DAY = 86400
+
+
+def _listing(*days):
+    """Fake newest-first listing with one submission per day offset."""
+    return [SimpleNamespace(id=f"post{day}", created_utc=float(day * DAY)) for day in sorted(days, reverse=True)]
+
+
+def test_bucket_submissions_single_pass():
+    """Test that one pass routes every post into its window and stops at the start of the range."""
+
+    listing = iter(_listing(40, 31, 29, 16, 14, 3, -5, -6))
+
+    routed = [(bucket, s.id) for bucket, s in bucket_submissions(listing, 0, 15 * DAY)]
+
+    assert routed == [(2, "post40"), (2, "post31"), (1, "post29"), (1, "post16"), (0, "post14"), (0, "post3")]
+    assert next(listing).id == "post-6", "The listing should not be read past the first post out of range"
+
+
+def test_bucket_submissions_stops_at_checkpoint(tmp_path):
+    """Test that a saved checkpoint limits a later run to posts newer than it."""
+
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(checkpoint_path, "landscaping", {"last_id": "post16", "last_created_utc": 16.0 * DAY})
+
+    routed = [s.id for _, s in bucket_submissions(_listing(40, 31, 16, 14), 0, 15 * DAY,
+                                                  load_checkpoint(checkpoint_path, "landscaping"))]
+
+    assert routed == ["post40", "post31"]
+    assert load_checkpoint(str(tmp_path / "missing.json"), "landscaping") == {}, \
+        "A missing checkpoint should mean a full scrape"
+
+
+def test_checkpoints_are_kept_per_subreddit(tmp_path):
+    """Test that one subreddit's checkpoint does not cut short a scrape of another."""
+
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    save_checkpoint(checkpoint_path, "landscaping", {"last_id": "post31", "last_created_utc": 31.0 * DAY})
+    save_checkpoint(checkpoint_path, "lawncare", {"last_id": "post3", "last_created_utc": 3.0 * DAY})
+
+    lawncare = [s.id for _, s in bucket_submissions(_listing(29, 16, 3, 1), 0, 15 * DAY,
+                                                    load_checkpoint(checkpoint_path, "LawnCare"))]
+
+    assert lawncare == ["post29", "post16"], "Only lawncare's own checkpoint should stop its scrape"
+    assert load_checkpoint(checkpoint_path, "landscaping")["last_id"] == "post31", "Other checkpoints should be kept"
+    assert load_checkpoint(checkpoint_path, "gardening") == {}
+
+
+def test_save_halved_image(tmp_path):
+    """Test that a downloaded JPEG is halved from memory and its preprocessed array is cached."""
+
+    source = io.BytesIO()
+    Image.fromarray((np.random.rand(400, 600, 3) * 255).astype(np.uint8)).save(source, format="JPEG")
+    source.seek(0)
+    cache = FeatureCache(str(tmp_path / "cache"))
+    out_path = str(tmp_path / "lawn.jpg")
+
+    save_halved_image(source, out_path, cache=cache)
+
+    with Image.open(out_path) as img:
+        assert img.size == (300, 200), "The image should be halved"
+        assert img.format == "JPEG", "The original format should be kept"
+    preprocessed = cache.load(cache.key(out_path), "preprocessed")
+    assert preprocessed.shape == (256, 256, 3), "The cached array should match the preprocessed layout"
+    assert preprocessed.dtype == np.uint8, "Preprocessed images should be cached as uint8"
+    assert np.array_equal(preprocessed, preprocess_array(load_image(out_path))), \
+        "The cached array should hold exactly the pixels preprocessing the saved file gives"
+
+
+def test_tip_outputs_accumulate_across_runs(tmp_path):
+    """Test that a second run adds its tips to the CSV and JSON outputs instead of replacing the first run's."""
+
+    first = [("Mow high", "keep it at 3 inches", "lawn_1.jpg", ["mow"], 1)]
+    second = [("Aerate", "aerate in fall", None, ["aerate"], 2)]
+    csv_path, json_path = str(tmp_path / "tips.csv"), str(tmp_path / "tips.json")
+
+    for tips in (first, second):
+        append_tips_csv(csv_path, tips)
+        append_tips_json(json_path, tips)
+
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))
+    with open(json_path, encoding='utf-8') as f:
+        tips_json = json.load(f)
+    assert [row[0] for row in rows] == ["Title", "Mow high", "Aerate"], "The header should be written once"
+    assert [tip["title"] for tip in tips_json] == ["Mow high", "Aerate"], "Earlier tips should be kept"
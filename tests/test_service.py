@@ -0,0 +1,167 @@
+import asyncio
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import cv2
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from src.feature_extraction import DEFAULT_SCHEMA
+from src.service import MicroBatcher, ScoringService
+from src.similarity import SimilarityIndex
+
+
+def _dummy_model():
+    model = RandomForestRegressor(n_estimators=5, random_state=42)
+    model.fit(np.random.rand(20, len(DEFAULT_SCHEMA)), np.random.rand(20) * 100)
+    return model
+
+
+def _post(url, data):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method="POST")) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    """Test that concurrent submissions are processed together and get their own results back."""
+
+    batch_sizes = []
+
+    def process(items):
+        batch_sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    async def run():
+        batcher = MicroBatcher(process, max_batch_size=4, max_wait=0.05)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        finally:
+            await batcher.stop()
+
+    assert asyncio.run(run()) == [i * 2 for i in range(10)]
+    assert batch_sizes == [4, 4, 2], "Batches should fill up to max_batch_size"
+
+
+def test_micro_batcher_shuts_down_only_its_own_executor():
+    """Test that stop() shuts down the executor the batcher created but leaves a given one running."""
+
+    given = ThreadPoolExecutor(max_workers=1)
+    own, shared = MicroBatcher(lambda items: items), MicroBatcher(lambda items: items, executor=given)
+
+    async def run():
+        for batcher in (own, shared):
+            batcher.start()
+            await batcher.stop()
+
+    asyncio.run(run())
+    with pytest.raises(RuntimeError):
+        own.executor.submit(print)
+    assert given.submit(lambda: 1).result() == 1, "An executor passed in belongs to the caller"
+    given.shutdown()
+
+
+def test_scoring_service_scores_uploads():
+    """Test that uploads are scored over HTTP and unreadable uploads get an error."""
+
+    ok, encoded = cv2.imencode(".png", (np.random.rand(64, 64, 3) * 255).astype(np.uint8))
+    image_bytes = encoded.tobytes()
+
+    async def run():
+        service = ScoringService(_dummy_model(), max_wait=0.05)
+        server = await service.start(port=0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/score"
+        loop = asyncio.get_running_loop()
+        try:
+            requests = [image_bytes, image_bytes, b"not an image"]
+            return await asyncio.gather(*(loop.run_in_executor(None, _post, url, data) for data in requests))
+        finally:
+            await service.stop()
+
+    results = asyncio.run(run())
+    for status, body in results[:2]:
+        assert status == 200 and 0 <= body["score"] <= 100
+        assert len(body["recommendations"]) > 0, "A scored upload should get recommendations"
+    assert results[2][0] == 400 and "error" in results[2][1]
+
+
+class _StubDetector:
+    """Detector that finds a bare patch and weed growth (class IDs 0 and 2) in every image."""
+
+    def detect(self, images):
+        return [[0, 2] for _ in images]
+
+
+def test_scoring_service_reports_detections_by_name():
+    """Test that detections come back as object names and add their services to the recommendations."""
+
+    ok, encoded = cv2.imencode(".png", (np.random.rand(64, 64, 3) * 255).astype(np.uint8))
+
+    async def run():
+        service = ScoringService(_dummy_model(), _StubDetector(), max_wait=0.01)
+        server = await service.start(port=0)
+        url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/score"
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, _post, url, encoded.tobytes())
+        finally:
+            await service.stop()
+
+    status, body = asyncio.run(run())
+    assert status == 200 and body["detections"] == ["bare_patch", "weed_growth"]
+    assert {"Grading & Overseeding", "Weed Control"} <= set(body["recommendations"]), body["recommendations"]
+
+
+def test_score_batch_attaches_similar_lawns(tmp_path):
+    """Test that a similarity index adds the most similar past lawns to every result."""
+
+    archive = np.random.rand(30, len(DEFAULT_SCHEMA)).astype(np.float32)
+    items = [{"item_id": f"lawn_{i}.jpg", "source": "photo", "score": 50.0, "notes": "Overseeding"} for i in range(30)]
+    index = SimilarityIndex.build(str(tmp_path / "index"), archive, items)
+    ok, encoded = cv2.imencode(".png", (np.random.rand(64, 64, 3) * 255).astype(np.uint8))
+
+    service = ScoringService(_dummy_model(), similarity_index=index, n_similar=2)
+    result = service.score_batch([encoded.tobytes()])[0]
+
+    assert [lawn["notes"] for lawn in result["similar_lawns"]] == ["Overseeding", "Overseeding"]
+
+
+def test_stalled_client_times_out():
+    """Test that a client that stops sending its request gets a 408 instead of holding the connection."""
+
+    async def run():
+        service = ScoringService(_dummy_model(), read_timeout=0.2)
+        server = await service.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(b"POST /score HTTP/1.1\r\nContent-Length: 100\r\n\r\npartial body")
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=5)
+            writer.close()
+            return response
+        finally:
+            await service.stop()
+
+    assert asyncio.run(run()).startswith(b"HTTP/1.1 408"), "A stalled upload should be answered with 408"
+
+
+def test_negative_content_length_is_rejected():
+    """Test that a negative Content-Length is a bad request rather than an internal error."""
+
+    async def run():
+        service = ScoringService(_dummy_model())
+        server = await service.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            writer.write(b"POST /score HTTP/1.1\r\nContent-Length: -5\r\n\r\n")
+            await writer.drain()
+            response = await asyncio.wait_for(reader.read(), timeout=5)
+            writer.close()
+            return response
+        finally:
+            await service.stop()
+
+    assert asyncio.run(run()).startswith(b"HTTP/1.1 400")
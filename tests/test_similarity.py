@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+import pandas as pd
+from src.similarity import SimilarityIndex, build_archive_index
+from src.storage import TIPS_SCHEMA, ColumnarWriter, new_part_path
+
+
+def _archive(n=500, dim=18, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.random((n, dim), dtype=np.float32)
+    items = [{"item_id": f"lawn_{i}.jpg", "source": "photo" if i % 2 else "reddit", "score": float(i % 100),
+              "notes": f"job {i}"} for i in range(n)]
+    return vectors, items
+
+
+def _exact_neighbours(index, vectors, queries, k):
+    archive = index.prepare(vectors)
+    return np.argsort(-(index.prepare(queries) @ archive.T), axis=1)[:, :k]
+
+
+def test_exact_search_matches_brute_force(tmp_path):
+    """Test that batched exact search returns the same neighbours as one full similarity matrix."""
+
+    vectors, items = _archive()
+    index = SimilarityIndex.build(str(tmp_path / "index"), vectors, items)
+    assert isinstance(index.vectors, np.memmap), "Vectors should be memory-mapped"
+
+    similarities, indices = index.search(vectors[:20], k=5, batch_rows=64)
+    assert np.array_equal(indices, _exact_neighbours(index, vectors, vectors[:20], 5))
+    assert np.all(np.diff(similarities, axis=1) <= 0), "Neighbours should be sorted by similarity"
+    assert indices[:, 0].tolist() == list(range(20)), "Every vector should be its own nearest neighbour"
+
+
+def test_ivf_search_and_similar_items(tmp_path):
+    """Test that IVF search scanning every list is exact and items come back with their notes."""
+
+    vectors, items = _archive()
+    index = SimilarityIndex.build(str(tmp_path / "index"), vectors, items, n_lists=8)
+    assert index.centroids.shape == (8, vectors.shape[1])
+
+    _, indices = index.search(vectors[:10], k=3, n_probe=8)
+    exact = np.argsort(-(index.prepare(vectors[:10]) @ index.vectors.T), axis=1)[:, :3]
+    assert np.array_equal(indices, exact), "Probing every list should be as good as an exact scan"
+
+    neighbours = index.similar(vectors[3], k=2, n_probe=2)[0]
+    assert neighbours[0]["item_id"] == "lawn_3.jpg" and neighbours[0]["notes"] == "job 3"
+    assert len(neighbours) == 2
+
+
+def test_build_archive_index_from_photos_and_posts(tmp_path):
+    """Test that the archive index holds the scored photos and the Reddit posts with downloaded images."""
+
+    image_dir = tmp_path / "images"
+    image_dir.mkdir()
+    rng = np.random.default_rng(0)
+    for name in ("lawn_a.jpg", "lawn_b.jpg", "post.jpg"):
+        cv2.imwrite(str(image_dir / name), rng.integers(0, 256, (64, 64, 3), dtype=np.uint8))
+    (image_dir / "broken.jpg").write_bytes(b"not an image")
+    csv_path = tmp_path / "features.csv"
+    pd.DataFrame({"Image Path": [str(image_dir / name) for name in ("lawn_a.jpg", "lawn_b.jpg", "post.jpg",
+                                                                     "broken.jpg")],
+                  "Initial Score": [20.0, 80.0, 0.0, 50.0]}).to_csv(csv_path, index=False)
+    tips_dir = tmp_path / "tips"
+    tips_dir.mkdir()
+    with ColumnarWriter(new_part_path(str(tips_dir)), TIPS_SCHEMA) as writer:
+        writer.write({"submission_id": "p1", "title": "Overseeded in fall", "image_filename": "post.jpg"})
+        writer.write({"submission_id": "p2", "title": "No photo", "image_filename": None})
+        writer.write({"submission_id": "p3", "title": "Download failed", "image_filename": "missing.jpg"})
+
+    index = build_archive_index(str(tmp_path / "index"), str(csv_path), str(tips_dir), str(image_dir),
+                                model_path=None)
+    items = index.items.set_index("item_id")
+    assert sorted(items.index) == sorted([str(image_dir / "lawn_a.jpg"), str(image_dir / "lawn_b.jpg"), "p1"]), \
+        "Photos, posts with images and no unreadable images should be indexed, each once"
+    assert items.loc["p1", "source"] == "reddit" and items.loc["p1", "notes"] == "Overseeded in fall"
+    assert items.loc[str(image_dir / "lawn_a.jpg"), "notes"], "Photos should carry their recommendations"
+
+    similar = index.similar(rng.random((1, index.vectors.shape[1]), dtype=np.float32), k=3)[0]
+    assert any(item["source"] == "reddit" and item["score"] is None for item in similar), \
+        "Posts have no score"
@@ -0,0 +1,52 @@
+import pytest
+from src.storage import TIPS_SCHEMA, ColumnarWriter, new_part_path, read_columns
+
+
+def _tip(i):
+    return {"submission_id": f"post{i}", "created_utc": float(i), "title": f"Tip {i}", "body": "mow high",
+            "image_filename": f"lawn_{i}.jpg" if i % 2 == 0 else None, "relevant_words": ["mow"],
+            "sentiment_score": i % 5 - 2}
+
+
+def test_columnar_writer_appends_batches(tmp_path):
+    """Test that rows written in several record batches read back with projection and filters."""
+
+    path = str(tmp_path / "tips.parquet")
+    with ColumnarWriter(path, TIPS_SCHEMA, batch_size=16) as writer:
+        for i in range(50):
+            writer.write(_tip(i))
+
+    assert writer.rows_written == 50
+
+    filenames = read_columns(path, columns=["image_filename"], filters=[("image_filename", "!=", "")])
+    assert list(filenames.columns) == ["image_filename"], "Only the projected column should be loaded"
+    assert len(filenames) == 25, "Rows without an image should be filtered out"
+
+    positive = read_columns(path, filters=[("sentiment_score", ">", 0)])
+    assert (positive["sentiment_score"] > 0).all() and len(positive) == 20
+    assert list(positive["relevant_words"].iloc[0]) == ["mow"]
+
+
+def test_columnar_writer_abort(tmp_path):
+    """Test that a failed write leaves no file behind."""
+
+    path = tmp_path / "tips.parquet"
+    with pytest.raises(RuntimeError):
+        with ColumnarWriter(str(path), TIPS_SCHEMA) as writer:
+            writer.write(_tip(1))
+            raise RuntimeError("scrape failed")
+
+    assert not path.exists() and not list(tmp_path.iterdir())
+
+
+def test_dataset_parts_accumulate(tmp_path):
+    """Test that each run's part file adds to the dataset instead of replacing the earlier rows."""
+
+    dataset_dir = str(tmp_path / "tips")
+    for run in range(2):
+        with ColumnarWriter(new_part_path(dataset_dir), TIPS_SCHEMA) as writer:
+            for i in range(run * 10, run * 10 + 10):
+                writer.write(_tip(i))
+
+    tips = read_columns(dataset_dir, columns=["submission_id"])
+    assert sorted(tips["submission_id"]) == sorted(f"post{i}" for i in range(20)), "Both runs should be readable"
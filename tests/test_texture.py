@@ -0,0 +1,27 @@
+import pytest
+import numpy as np
+from src.feature_extraction import texture_descriptor, TEXTURE_FEATURE_NAMES
+
+
+def test_texture_descriptor_fixed_length():
+    """Test that the texture descriptor has the same length for any image size."""
+
+    small = (np.random.rand(64, 48) * 255).astype(np.uint8)
+    large = (np.random.rand(300, 500) * 255).astype(np.uint8)
+
+    small_descriptor = texture_descriptor(small)
+    large_descriptor = texture_descriptor(large)
+
+    assert small_descriptor.shape == (len(TEXTURE_FEATURE_NAMES),), "Descriptor length should match the feature names"
+    assert large_descriptor.shape == small_descriptor.shape, "Descriptor length should not depend on image size"
+    assert np.all(np.isfinite(large_descriptor)), "Descriptor values should be finite"
+
+
+def test_texture_descriptor_flat_image():
+    """Test that a flat image has zero contrast and full homogeneity."""
+
+    flat = np.full((32, 32), 128, dtype=np.uint8)
+    features = dict(zip(TEXTURE_FEATURE_NAMES, texture_descriptor(flat)))
+
+    assert features["glcm_contrast"] == 0, "A flat image should have no contrast"
+    assert features["glcm_homogeneity"] == pytest.approx(1.0), "A flat image should be fully homogeneous"
@@ -0,0 +1,61 @@
+import cv2
+from PIL import Image
+import numpy as np
+from src.feature_extraction import DEFAULT_SCHEMA
+from src.recommendation import recommend_services
+from src.tiling import analyze_tiled, load_reduced, tile_origins
+
+
+def _lawn_with_bare_patch(path, size=(1024, 1536)):
+    """Write a noisy green lawn photo with a brown patch in the top-left corner."""
+    rng = np.random.default_rng(0)
+    img = np.empty(size + (3,), dtype=np.uint8)
+    img[..., 0] = rng.integers(20, 60, size)
+    img[..., 1] = rng.integers(120, 180, size)
+    img[..., 2] = rng.integers(20, 60, size)
+    img[:256, :256] = (40, 80, 120)
+    cv2.imwrite(str(path), img, [cv2.IMWRITE_JPEG_QUALITY, 95])
+
+
+def test_tile_origins_cover_the_length():
+    """Test that tiles cover the whole length without running past its end."""
+
+    assert tile_origins(100, 256) == [0]
+    assert tile_origins(600, 256) == [0, 256, 344]
+
+
+def test_load_reduced_decodes_at_lower_scale(tmp_path):
+    """Test that a large JPEG is decoded at reduced scale with the matching scale factor."""
+
+    image_path = tmp_path / "yard.jpg"
+    _lawn_with_bare_patch(image_path)
+    img, scale = load_reduced(str(image_path), max_side=700)
+    assert img.shape[:2] == (512, 768) and scale == 2.0, "The photo should be decoded at half scale"
+
+
+def test_load_reduced_scale_follows_exif_orientation(tmp_path):
+    """Test that the scale of a portrait phone photo (landscape pixels, EXIF orientation 6) is measured upright."""
+
+    image_path = tmp_path / "portrait.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Rotate 90 degrees clockwise to display
+    Image.new("RGB", (1536, 1024), (40, 150, 40)).save(image_path, exif=exif)
+
+    img, scale = load_reduced(str(image_path), max_side=700)
+    assert img.shape[:2] == (768, 512), "The photo should be decoded upright at half scale"
+    assert scale == 2.0, "The scale should map the upright decode back to the upright photo"
+
+
+def test_analyze_tiled_finds_bare_patch(tmp_path):
+    """Test that the tiled analysis localizes the bare patch and feeds it to the recommendations."""
+
+    image_path = tmp_path / "yard.jpg"
+    _lawn_with_bare_patch(image_path)
+    analysis = analyze_tiled(str(image_path), max_side=1024, levels=2, workers=2)
+
+    assert analysis.features.shape == (len(DEFAULT_SCHEMA),)
+    assert [grid.shape[:2] for grid in analysis.pyramid] == [(4, 6), (2, 3)]
+    bare = [region for region in analysis.regions if region.label == "bare_patch"]
+    assert [region.box for region in bare] == [(0, 0, 256, 256)], "Only the brown corner should be bare"
+    assert analysis.features[DEFAULT_SCHEMA.index("object_bare_patch")] == 1
+    assert "Grading & Overseeding" in recommend_services(80, [], regions=analysis.regions)
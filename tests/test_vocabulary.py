@@ -0,0 +1,35 @@
+import pytest
+from src.vocabulary import Vocabulary, load_word_list
+
+
+def test_vocabulary_process_updates_incrementally():
+    """Test that processing a post filters, scores and grows the vocabulary like the list-based code did."""
+
+    vocabulary = Vocabulary(filler_words=["the", "mulch"], landscaping_terms=["mulch", "sod", "edging"])
+
+    relevant_words, score = vocabulary.process("Great sod but the edging looks bad bad")
+
+    assert relevant_words == ["sod", "edging"], "Relevant words should keep post order"
+    assert score == -1, "Sentiment should count positive minus negative words"
+    assert "looks" in vocabulary.landscaping_terms, "Every word of the post should become a term"
+    assert vocabulary.term_counts["bad"] == 2, "Term counts should accumulate"
+
+    relevant_words, _ = vocabulary.process("fresh mulch")
+    assert relevant_words == [], "Filler words should still be filtered"
+
+
+def test_vocabulary_save_only_when_changed(tmp_path):
+    """Test that word lists are written in bulk, sorted, and only after changes."""
+
+    filler_path, terms_path = str(tmp_path / "filler.txt"), str(tmp_path / "terms.txt")
+    vocabulary = Vocabulary(["um"], ["sod"])
+
+    vocabulary.save(filler_path, terms_path)
+    assert not (tmp_path / "terms.txt").exists(), "An unchanged vocabulary should not be written"
+
+    vocabulary.process("Zoysia sod")
+    vocabulary.save(filler_path, terms_path)
+
+    assert load_word_list(terms_path) == ["sod", "zoysia"]
+    assert Vocabulary.load(filler_path, terms_path).filler_words == {"um"}
+    assert not list(tmp_path.glob("*.tmp")), "No temporary files should be left behind"